@@ -67,6 +67,7 @@ manifest_schema = {
         "diagram": {"type": ["boolean", "string"]},
         "readme": {"type": ["boolean", "string"]},
         "custom_data": {"$ref": "#/$defs/custom_data"},
+        "query_budget": {"$ref": "#/$defs/query_budget"},
     },
     "required": [
         "sdk_version",
@@ -224,5 +225,26 @@ manifest_schema = {
             "required": ["namespace", "access"],
             "additionalProperties": False,
         },
+        "query_budget": {
+            "type": "object",
+            "properties": {
+                "max_queries": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "description": "Maximum number of queries per handler invocation",
+                },
+                "max_db_time_ms": {
+                    "type": "number",
+                    "exclusiveMinimum": 0,
+                    "description": "Maximum database time per handler invocation, in milliseconds",
+                },
+                "on_exceed": {
+                    "type": "string",
+                    "enum": ["warn", "fail"],
+                    "description": "'warn' to log and count overruns, 'fail' to stop the handler",
+                },
+            },
+            "additionalProperties": False,
+        },
     },
 }
@@ -140,3 +140,31 @@ def test_manifest_variable_rejects_extra_fields(handler_manifest_example: dict)
     ]
     with pytest.raises(jsonschema.ValidationError):
         validate_manifest_file(handler_manifest_example)
+
+
+def test_manifest_with_query_budget(handler_manifest_example: dict) -> None:
+    """Test that a query budget validates."""
+    handler_manifest_example["query_budget"] = {
+        "max_queries": 50,
+        "max_db_time_ms": 250,
+        "on_exceed": "fail",
+    }
+    validate_manifest_file(handler_manifest_example)
+
+
+@pytest.mark.parametrize(
+    "query_budget",
+    [
+        {"max_queries": 0},
+        {"max_db_time_ms": 0},
+        {"on_exceed": "ignore"},
+        {"max_queries": 10, "per_event": True},
+    ],
+)
+def test_manifest_rejects_invalid_query_budget(
+    handler_manifest_example: dict, query_budget: dict
+) -> None:
+    """Test that invalid query budgets are rejected."""
+    handler_manifest_example["query_budget"] = query_budget
+    with pytest.raises(jsonschema.ValidationError):
+        validate_manifest_file(handler_manifest_example)
@@ -28,7 +28,10 @@ if "mypy" not in sys.argv[0]:
     _original_bulk_create = models.QuerySet.bulk_create
 
     def _wrapped_bulk_create(self: Any, objs: Any, *args: Any, **kwargs: Any) -> Any:
-        """Wrapper that adds write-permission, size, and field-size checks."""
+        """Wrapper that adds write-permission, size, and field-size checks.
+
+        JSON values serialized by the field-size check are written as-is.
+        """
         _check_write_permission()
         objs = list(objs)
         if len(objs) > MAX_BULK_SIZE:
@@ -36,9 +39,9 @@ if "mypy" not in sys.argv[0]:
                 f"bulk_create() received {len(objs):,} objects, "
                 f"exceeding the {MAX_BULK_SIZE:,} limit."
             )
-        for obj in objs:
-            if hasattr(obj, "_check_field_sizes"):
-                obj._check_field_sizes()
+        if hasattr(self.model, "_check_field_sizes"):
+            with self.model._checked_for_bulk_write(objs):
+                return _original_bulk_create(self, objs, *args, **kwargs)
         return _original_bulk_create(self, objs, *args, **kwargs)
 
     models.QuerySet.bulk_create = _wrapped_bulk_create  # type: ignore[method-assign]
@@ -46,8 +49,11 @@ if "mypy" not in sys.argv[0]:
     # --- bulk_update ---
     _original_bulk_update = models.QuerySet.bulk_update
 
-    def _wrapped_bulk_update(self: Any, objs: Any, *args: Any, **kwargs: Any) -> Any:
-        """Wrapper that adds write-permission, size, and field-size checks."""
+    def _wrapped_bulk_update(self: Any, objs: Any, fields: Any, *args: Any, **kwargs: Any) -> Any:
+        """Wrapper that adds write-permission, size, and field-size checks.
+
+        JSON values serialized by the field-size check are written as-is.
+        """
         _check_write_permission()
         objs = list(objs)
         if len(objs) > MAX_BULK_SIZE:
@@ -55,10 +61,13 @@ if "mypy" not in sys.argv[0]:
                 f"bulk_update() received {len(objs):,} objects, "
                 f"exceeding the {MAX_BULK_SIZE:,} limit."
             )
-        for obj in objs:
-            if hasattr(obj, "_check_field_sizes"):
-                obj._check_field_sizes()
-        return _original_bulk_update(self, objs, *args, **kwargs)
+        fields = list(fields)
+        if hasattr(self.model, "_check_field_sizes"):
+            # Only the fields being updated are written, so only those are checked.
+            field_names = {self.model._meta.get_field(name).name for name in fields}
+            with self.model._checked_for_bulk_write(objs, field_names):
+                return _original_bulk_update(self, objs, fields, *args, **kwargs)
+        return _original_bulk_update(self, objs, fields, *args, **kwargs)
 
     models.QuerySet.bulk_update = _wrapped_bulk_update  # type: ignore[method-assign]
 
@@ -4,22 +4,32 @@ from typing import Any
 from django.core.cache import BaseCache
 
 from canvas_sdk.caching.exceptions import CachingException
+from canvas_sdk.caching.local import MISSING, LocalCache
 from canvas_sdk.caching.utils import WriteOnceProperty
 
 
 class Cache:
-    """A Class wrapper for interacting with cache."""
+    """A Class wrapper for interacting with cache.
+
+    With a local cache, reads are served from it when possible, and writes go through to both.
+    """
 
     _connection = WriteOnceProperty[BaseCache]()
     _prefix = WriteOnceProperty[str]()
     _max_timeout_seconds = WriteOnceProperty[int | None]()
+    _local = WriteOnceProperty[LocalCache | None]()
 
     def __init__(
-        self, connection: BaseCache, prefix: str = "", max_timeout_seconds: int | None = None
+        self,
+        connection: BaseCache,
+        prefix: str = "",
+        max_timeout_seconds: int | None = None,
+        local: LocalCache | None = None,
     ) -> None:
         self._connection = connection
         self._prefix = prefix
         self._max_timeout_seconds = max_timeout_seconds
+        self._local = local
 
     def _make_key(self, key: str) -> str:
         return f"{self._prefix}:{key}" if self._prefix else key
@@ -44,7 +54,12 @@ class Cache:
             timeout_seconds: The number of seconds for which the value should be cached.
         """
         key = self._make_key(key)
-        self._connection.set(key, value, self._get_timeout(timeout_seconds))
+        timeout = self._get_timeout(timeout_seconds)
+        self._connection.set(key, value, timeout)
+
+        if self._local is not None:
+            self._local.set(key, value, timeout)
+            self._local.broadcast([key])
 
     def set_many(self, data: dict[str, Any], timeout_seconds: int | None = None) -> list[str]:
         """Set multiple values in the cache simultaneously.
@@ -58,7 +73,18 @@ class Cache:
             the backend. Otherwise, an empty list is returned.
         """
         data = {self._make_key(key): value for key, value in data.items()}
-        return self._connection.set_many(data, self._get_timeout(timeout_seconds))
+        timeout = self._get_timeout(timeout_seconds)
+        failed_keys = self._connection.set_many(data, timeout)
+
+        if self._local is not None:
+            for key, value in data.items():
+                if key in failed_keys:
+                    self._local.delete(key)
+                else:
+                    self._local.set(key, value, timeout)
+            self._local.broadcast(data)
+
+        return failed_keys
 
     def get(self, key: str, default: Any | None = None) -> Any:
         """Fetch a given key from the cache.
@@ -71,7 +97,17 @@ class Cache:
             The cached value, or the default if the key does not exist.
         """
         key = self._make_key(key)
-        return self._connection.get(key, default)
+        if self._local is None:
+            return self._connection.get(key, default)
+
+        value = self._local.get(key)
+        if value is MISSING:
+            value = self._connection.get(key, MISSING)
+            if value is MISSING:
+                return default
+            self._local.set(key, value)
+
+        return value
 
     def get_or_set(
         self, key: str, default: Any | None = None, timeout_seconds: int | None = None
@@ -92,7 +128,16 @@ class Cache:
             The cached value.
         """
         key = self._make_key(key)
-        return self._connection.get_or_set(key, default, self._get_timeout(timeout_seconds))
+        timeout = self._get_timeout(timeout_seconds)
+        if self._local is None:
+            return self._connection.get_or_set(key, default, timeout)
+
+        value = self._local.get(key)
+        if value is MISSING:
+            value = self._connection.get_or_set(key, default, timeout)
+            self._local.set(key, value, timeout)
+
+        return value
 
     def get_many(self, keys: Iterable[str]) -> Any:
         """Fetch multiple values from the cache.
@@ -107,7 +152,25 @@ class Cache:
             A dict mapping each key in 'keys' to its cached value.
         """
         keys = {self._make_key(key) for key in keys}
-        return self._connection.get_many(keys)
+        if self._local is None:
+            return self._connection.get_many(keys)
+
+        values = {}
+        missing_keys = []
+        for key in keys:
+            value = self._local.get(key)
+            if value is MISSING:
+                missing_keys.append(key)
+            else:
+                values[key] = value
+
+        if missing_keys:
+            fetched = self._connection.get_many(missing_keys)
+            for key, value in fetched.items():
+                self._local.set(key, value)
+            values.update(fetched)
+
+        return values
 
     def delete(self, key: str) -> None:
         """Delete a key from the cache.
@@ -118,9 +181,16 @@ class Cache:
         key = self._make_key(key)
         self._connection.delete(key)
 
+        if self._local is not None:
+            self._local.delete(key)
+            self._local.broadcast([key])
+
     def __contains__(self, key: str) -> bool:
         """Return True if the key is in the cache and has not expired."""
         key = self._make_key(key)
+        if self._local is not None and key in self._local:
+            return True
+
         return self._connection.__contains__(key)
 
 
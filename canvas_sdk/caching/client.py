@@ -3,6 +3,7 @@ from django.core.cache import caches as django_caches
 
 from canvas_sdk.caching.base import Cache
 from canvas_sdk.caching.exceptions import CacheConfigurationError
+from canvas_sdk.caching.local import get_local_cache
 
 caches: dict[tuple[str, str], Cache] = {}
 
@@ -17,7 +18,9 @@ def get_cache(
         key = (driver, prefix)
         connection = django_caches[driver]
         if key not in caches:
-            caches[key] = Cache(connection, prefix, max_timeout_seconds)
+            caches[key] = Cache(
+                connection, prefix, max_timeout_seconds, local=get_local_cache(driver)
+            )
         return caches[key]
     except InvalidCacheBackendError as error:
         raise CacheConfigurationError(driver) from error
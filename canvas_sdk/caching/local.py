@@ -0,0 +1,229 @@
+"""
+An in-process tier in front of a shared cache.
+
+Hot keys are served from a small LRU in the process, for a few seconds at most, rather than
+from the cache backend (the database, for plugins) on every read. Writes go through to the
+backend, and can be broadcast over Redis pub/sub so that other processes drop their copies
+right away instead of when they expire.
+"""
+
+import json
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Any
+
+import redis
+from django.conf import settings
+
+from logger import log
+from pubsub.pubsub import Publisher
+
+# The cache drivers with an in-process tier, when it is enabled.
+LOCAL_CACHE_DRIVERS = ("plugins",)
+
+# Returned by LocalCache.get() for keys it doesn't have, as None may be a cached value.
+MISSING = object()
+
+
+class LocalCache:
+    """A thread-safe, size-bounded LRU cache whose entries expire after a timeout.
+
+    Values are stored pickled, like in Django's local-memory backend, so a caller mutating a
+    value it got doesn't change what other callers get.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        timeout_seconds: float,
+        invalidator: "CacheInvalidator | None" = None,
+    ) -> None:
+        self.name = name
+        self.max_entries = max_entries
+        self.timeout_seconds = timeout_seconds
+        self.invalidator = invalidator
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """Fetch a key, or MISSING if it isn't cached or has expired."""
+        if self.invalidator is not None:
+            self.invalidator.ensure_listener()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+
+            self._entries.move_to_end(key)
+
+        return pickle.loads(value)
+
+    def set(self, key: str, value: Any, timeout_seconds: float | None = None) -> None:
+        """Cache a value, for no longer than the local timeout, evicting the least recently used
+        entries past the maximum.
+        """
+        timeout = (
+            self.timeout_seconds
+            if timeout_seconds is None
+            else min(timeout_seconds, self.timeout_seconds)
+        )
+        if timeout <= 0:
+            self.delete(key)
+            return
+
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, pickled)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Remove a key."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        """Remove keys."""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every key."""
+        with self._lock:
+            self._entries.clear()
+
+    def broadcast(self, keys: Iterable[str]) -> None:
+        """Tell other processes that keys were written, if invalidation is enabled."""
+        if self.invalidator is not None:
+            self.invalidator.publish(self.name, keys)
+
+    def __contains__(self, key: str) -> bool:
+        """Return True if the key is cached and has not expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class InvalidationPublisher(Publisher):
+    """Publisher for the keys written to caches with an in-process tier."""
+
+    channel_suffix = "plugin-cache-invalidation"
+
+
+class CacheInvalidator:
+    """Broadcasts the keys written by this process, and evicts the keys written by others."""
+
+    def __init__(self) -> None:
+        self.publisher = InvalidationPublisher()
+        self._listener_lock = threading.Lock()
+        self._listener_pid: int | None = None
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        """Tell this process's messages apart from those of its parent, once forked."""
+        self.origin = uuid.uuid4().hex
+
+    @property
+    def enabled(self) -> bool:
+        """Whether there is a channel to broadcast on."""
+        return self.publisher.client is not None and self.publisher.channel is not None
+
+    def publish(self, driver: str, keys: Iterable[str]) -> None:
+        """Broadcast the keys written to a driver's cache."""
+        keys = list(keys)
+        if not keys:
+            return
+
+        message = json.dumps({"origin": self.origin, "driver": driver, "keys": keys})
+        try:
+            self.publisher.publish(message)
+        except redis.RedisError as e:
+            log.warning(f"Unable to broadcast the invalidation of {len(keys)} cache keys: {e}")
+
+    def handle_message(self, message: str) -> None:
+        """Evict the keys written by another process."""
+        data = json.loads(message)
+        if data["origin"] == self.origin:
+            return
+
+        local_cache = local_caches.get(data["driver"])
+        if local_cache is not None:
+            local_cache.delete_many(data["keys"])
+
+    def ensure_listener(self) -> None:
+        """Start the thread listening for invalidations in this process, if it isn't running."""
+        pid = os.getpid()
+        if self._listener_pid == pid or not self.enabled:
+            return
+
+        with self._listener_lock:
+            if self._listener_pid == pid:
+                return
+            self._listener_pid = pid
+
+        threading.Thread(target=self._listen, name="cache-invalidation", daemon=True).start()
+
+    def _listen(self) -> None:
+        client = self.publisher.client
+        if client is None:
+            return
+
+        while True:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.publisher.channel)
+                # Invalidations sent while unsubscribed were missed, so start over.
+                for local_cache in local_caches.values():
+                    local_cache.clear()
+
+                for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.handle_message(message["data"])
+            except Exception as e:
+                log.warning(f"Cache invalidation listener failed, resubscribing: {e}")
+                time.sleep(1)
+            finally:
+                pubsub.close()
+
+
+invalidator = CacheInvalidator()
+
+local_caches: dict[str, LocalCache] = {}
+
+
+def get_local_cache(driver: str) -> LocalCache | None:
+    """Get the in-process tier of a cache driver, or None if it has none."""
+    if settings.CANVAS_SDK_CACHE_LOCAL_MAX_ENTRIES <= 0 or driver not in LOCAL_CACHE_DRIVERS:
+        return None
+
+    if driver not in local_caches:
+        use_invalidation = settings.CANVAS_SDK_CACHE_INVALIDATION and invalidator.enabled
+        local_caches[driver] = LocalCache(
+            driver,
+            max_entries=settings.CANVAS_SDK_CACHE_LOCAL_MAX_ENTRIES,
+            timeout_seconds=settings.CANVAS_SDK_CACHE_LOCAL_TIMEOUT_SECONDS,
+            invalidator=invalidator if use_invalidation else None,
+        )
+
+    return local_caches[driver]
+
+
+__exports__ = ()
@@ -61,6 +61,26 @@ class JSONResponse(Response):
         )
 
 
+class PaginatedJSONResponse(JSONResponse):
+    """SimpleAPI JSON response class for a page of results.
+
+    The body holds the page's results and the cursor for the next page, which is null on
+    the last page. Pass a KeysetPage's next_cursor, for example:
+
+    page = Patient.objects.keyset_page(request.query_params.get("cursor"))
+    return [PaginatedJSONResponse([{"id": p.id} for p in page.items], page.next_cursor)]
+    """
+
+    def __init__(
+        self,
+        results: Sequence[JSON],
+        next_cursor: str | None,
+        status_code: HTTPStatus = HTTPStatus.OK,
+        headers: Mapping[str, Any] | None = None,
+    ):
+        super().__init__({"results": results, "next": next_cursor}, status_code, headers)
+
+
 class PlainTextResponse(Response):
     """SimpleAPI plain text response class."""
 
@@ -143,6 +163,7 @@ __exports__ = (
     "JSON",
     "Response",
     "JSONResponse",
+    "PaginatedJSONResponse",
     "PlainTextResponse",
     "HTMLResponse",
     "AcceptConnection",
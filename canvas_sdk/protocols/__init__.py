@@ -1,4 +1,10 @@
 from canvas_sdk.protocols.base import BaseProtocol
 from canvas_sdk.protocols.clinical_quality_measure import ClinicalQualityMeasure
+from canvas_sdk.protocols.incremental import IncrementalClinicalQualityMeasure, criterion
 
-__all__ = __exports__ = ("BaseProtocol", "ClinicalQualityMeasure")
+__all__ = __exports__ = (
+    "BaseProtocol",
+    "ClinicalQualityMeasure",
+    "IncrementalClinicalQualityMeasure",
+    "criterion",
+)
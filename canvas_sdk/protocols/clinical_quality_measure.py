@@ -1,11 +1,18 @@
 from __future__ import annotations
 
+from collections.abc import Iterable
 from typing import TYPE_CHECKING, Any, cast
 
 import arrow
 
 from canvas_sdk.events import EventType
 from canvas_sdk.protocols.base import BaseProtocol
+from canvas_sdk.protocols.population import (
+    DEFAULT_CHUNK_SIZE,
+    PatientFacts,
+    ProgressCallback,
+    evaluate_population,
+)
 from canvas_sdk.protocols.timeframe import Timeframe
 from canvas_sdk.v1.data import Patient
 from canvas_sdk.v1.data.condition import Condition
@@ -16,6 +23,8 @@ from canvas_sdk.v1.data.protocol_override import ProtocolOverride
 if TYPE_CHECKING:
     from django.db.models import Model
 
+    from canvas_sdk.value_set.value_set import CombinedValueSet, ValueSet
+
 
 class ClinicalQualityMeasure(BaseProtocol):
     """
@@ -37,6 +46,12 @@ class ClinicalQualityMeasure(BaseProtocol):
         is_abstract: bool = False
         is_predictive: bool = False
 
+    # Value sets that narrow the records loaded by evaluate_population(). Records of a kind
+    # whose value set is None are not loaded.
+    condition_value_set: type[ValueSet] | CombinedValueSet | None = None
+    medication_value_set: type[ValueSet] | CombinedValueSet | None = None
+    lab_value_set: type[ValueSet] | CombinedValueSet | None = None
+
     def __init__(self, *args: Any, **kwargs: Any):
         self._patient_id: str | None = None
         self.now = arrow.utcnow()
@@ -133,5 +148,43 @@ class ClinicalQualityMeasure(BaseProtocol):
 
         return self._patient_id
 
+    def compute_for_patient(self, patient_id: str, facts: PatientFacts) -> Any:
+        """
+        Evaluate the measure for one patient of a population.
+
+        Plugin authors override this to use evaluate_population(). The facts hold the patient's
+        conditions, medications and lab reports matching the measure's value sets, and their
+        active protocol overrides. It may be called from several threads at once, so it should
+        not modify the measure instance.
+        """
+        raise NotImplementedError(
+            f"{self.__class__.__name__} must implement compute_for_patient() to be "
+            "evaluated over a population"
+        )
+
+    def evaluate_population(
+        self,
+        patient_ids: Iterable[str],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_workers: int = 1,
+        on_progress: ProgressCallback | None = None,
+    ) -> dict[str, Any]:
+        """
+        Evaluate the measure over a cohort of patients.
+
+        Patients are processed in chunks of chunk_size, with one query per kind of record per
+        chunk. Up to max_workers chunks are evaluated in parallel, and on_progress is called
+        with the number of patients evaluated so far and the cohort size after each chunk.
+
+        Returns a mapping of patient ID to the result of compute_for_patient().
+        """
+        return evaluate_population(
+            self,
+            patient_ids,
+            chunk_size=chunk_size,
+            max_workers=max_workers,
+            on_progress=on_progress,
+        )
+
 
 __exports__ = ("ClinicalQualityMeasure",)
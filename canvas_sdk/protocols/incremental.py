@@ -0,0 +1,199 @@
+"""
+Incremental evaluation for ClinicalQualityMeasure protocols.
+
+A measure's intermediate results (denominator membership, exclusions, the last qualifying
+result, ...) are declared as criteria that depend on specific kinds of records. Criterion
+values are cached per patient, measure and criterion, and an event only invalidates the
+criteria of its patient that depend on the kind of record it touches.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from django.core.exceptions import ImproperlyConfigured
+
+from canvas_sdk.caching.client import get_cache
+from canvas_sdk.events import EventType
+from canvas_sdk.protocols.clinical_quality_measure import ClinicalQualityMeasure
+from canvas_sdk.protocols.population import FACT_KINDS, load_patient_facts
+from canvas_sdk.v1.plugin_database_context import get_current_plugin
+from settings import CANVAS_SDK_CACHE_TIMEOUT_SECONDS
+
+if TYPE_CHECKING:
+    from canvas_sdk.caching.base import Cache
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+EVENT_FACT_KINDS: dict[EventType, str] = {
+    EventType.CONDITION_ASSESSED: "conditions",
+    EventType.CONDITION_CREATED: "conditions",
+    EventType.CONDITION_RESOLVED: "conditions",
+    EventType.CONDITION_UPDATED: "conditions",
+    EventType.LAB_REPORT_CREATED: "lab_reports",
+    EventType.LAB_REPORT_UPDATED: "lab_reports",
+    EventType.MEDICATION_LIST_ITEM_CREATED: "medications",
+    EventType.MEDICATION_LIST_ITEM_UPDATED: "medications",
+    EventType.PROTOCOL_OVERRIDE_CREATED: "protocol_overrides",
+    EventType.PROTOCOL_OVERRIDE_DELETED: "protocol_overrides",
+    EventType.PROTOCOL_OVERRIDE_UPDATED: "protocol_overrides",
+}
+
+
+def criterion(*kinds: str) -> Callable[[F], F]:
+    """
+    Mark a measure method as a cached criterion depending on the given kinds of records.
+
+    The method receives the patient's PatientFacts, with only the declared kinds loaded, and
+    its return value must be picklable. A criterion with no kinds is never cached.
+    """
+    for kind in kinds:
+        if kind not in FACT_KINDS:
+            raise ValueError(f"Unknown fact kind '{kind}', expected one of {FACT_KINDS}")
+
+    def decorator(func: F) -> F:
+        func.criterion_kinds = kinds  # type: ignore[attr-defined]
+        return func
+
+    return decorator
+
+
+class IncrementalClinicalQualityMeasure(ClinicalQualityMeasure):
+    """
+    A ClinicalQualityMeasure whose criteria are cached and recomputed only when invalidated.
+
+    For example:
+
+    class DiabetesControl(IncrementalClinicalQualityMeasure):
+        condition_value_set = Diabetes
+        lab_value_set = Hba1cLaboratoryTest
+
+        @criterion("conditions")
+        def in_denominator(self, facts: PatientFacts) -> bool:
+            return bool(facts.conditions)
+
+        @criterion("lab_reports")
+        def last_result_date(self, facts: PatientFacts) -> date | None:
+            ...
+
+        def compute(self) -> list[Effect]:
+            criteria = self.evaluate_criteria()
+            ...
+
+    Criterion values should not depend on the current time, as they may be reused by later
+    events; apply the measure's timeframe to them in compute().
+
+    RESPONDS_TO must include every event in EVENT_FACT_KINDS touching the kinds of records the
+    criteria depend on, as those events are what invalidates them.
+    """
+
+    # Bump this when criteria logic changes, so values cached by a previous version are ignored.
+    criteria_version: str = "1"
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        responds_to = getattr(cls, "RESPONDS_TO", None)
+        if responds_to is None:
+            return
+
+        if isinstance(responds_to, str):
+            responds_to = [responds_to]
+
+        kinds = {kind for kinds in cls.criteria().values() for kind in kinds}
+        missing = [
+            EventType.Name(event_type)
+            for event_type, kind in EVENT_FACT_KINDS.items()
+            if kind in kinds and EventType.Name(event_type) not in responds_to
+        ]
+        if missing:
+            raise ImproperlyConfigured(
+                f"{cls.__name__!r} must respond to {', '.join(missing)}, "
+                "as its criteria depend on the records they touch."
+            )
+
+    @classmethod
+    def criteria(cls) -> dict[str, tuple[str, ...]]:
+        """The measure's criteria, mapped to the kinds of records they depend on."""
+        return {
+            name: attribute.criterion_kinds
+            for name in dir(cls)
+            if (attribute := getattr(cls, name, None)) is not None
+            and hasattr(attribute, "criterion_kinds")
+        }
+
+    def _criteria_cache(self) -> Cache:
+        return get_cache(
+            driver="plugins",
+            prefix=get_current_plugin() or "",
+            max_timeout_seconds=CANVAS_SDK_CACHE_TIMEOUT_SECONDS,
+        )
+
+    def _criteria_cache_key(self, patient_id: str, name: str) -> str:
+        return f"cqm_criteria:{self.protocol_key()}:{self.criteria_version}:{patient_id}:{name}"
+
+    def _invalidated_kind(self, patient_id: str | None) -> str | None:
+        """The kind of record the current event touches, if it is about the given patient."""
+        changed_kind = EVENT_FACT_KINDS.get(self.event.type)
+        if changed_kind is None or patient_id is None:
+            return changed_kind
+
+        return changed_kind if patient_id == self.patient_id_from_target() else None
+
+    def evaluate_criteria(self, patient_id: str | None = None) -> dict[str, Any]:
+        """
+        Return the criteria values for a patient, recomputing only those that are stale.
+
+        The patient defaults to the event target's patient. A criterion is recomputed when it
+        has no cached value, when the current event is about the patient and touches the kind
+        of record it depends on, or when it depends on no records at all. Each criterion is
+        cached on its own, so evaluations of concurrent events don't overwrite each other's
+        results.
+        """
+        changed_kind = self._invalidated_kind(patient_id)
+        patient_id = patient_id or self.patient_id_from_target()
+        criteria = self.criteria()
+        cache = self._criteria_cache()
+
+        keys = {
+            self._criteria_cache_key(patient_id, name): name
+            for name, kinds in criteria.items()
+            if kinds and changed_kind not in kinds
+        }
+        # The values are returned under the keys the cache stores them with.
+        cached = cache.get_many(keys)
+        values = {
+            name: cached[stored_key]
+            for key, name in keys.items()
+            if (stored_key := cache._make_key(key)) in cached
+        }
+
+        stale = [name for name in criteria if name not in values]
+        if stale:
+            kinds = {kind for name in stale for kind in criteria[name]}
+            facts = load_patient_facts(self, [patient_id], kinds)[patient_id]
+            computed = {name: getattr(self, name)(facts) for name in stale}
+            values.update(computed)
+
+            cache.set_many(
+                {
+                    self._criteria_cache_key(patient_id, name): value
+                    for name, value in computed.items()
+                    if criteria[name]
+                }
+            )
+
+        return values
+
+    def invalidate_criteria(self, patient_id: str) -> None:
+        """Drop the cached criteria values for a patient."""
+        cache = self._criteria_cache()
+        for name in self.criteria():
+            cache.delete(self._criteria_cache_key(patient_id, name))
+
+
+__exports__ = (
+    "EVENT_FACT_KINDS",
+    "IncrementalClinicalQualityMeasure",
+    "criterion",
+)
@@ -0,0 +1,194 @@
+"""
+Population-mode evaluation for ClinicalQualityMeasure protocols.
+
+Patients are evaluated in chunks. Each chunk loads the records a measure needs with one
+set-based query per model, narrowed by the measure's value sets, instead of issuing
+per-patient queries.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any
+
+from django.db import connection
+from django.db.models import QuerySet
+
+from canvas_sdk.v1.data.condition import Condition
+from canvas_sdk.v1.data.lab import LabReport, LabValue
+from canvas_sdk.v1.data.medication import Medication
+from canvas_sdk.v1.data.protocol_override import ProtocolOverride
+from canvas_sdk.v1.plugin_database_context import (
+    get_access_level,
+    get_current_plugin,
+    get_current_schema,
+    plugin_database_context,
+)
+from logger import log
+
+if TYPE_CHECKING:
+    from canvas_sdk.protocols.clinical_quality_measure import ClinicalQualityMeasure
+
+DEFAULT_CHUNK_SIZE = 500
+
+FACT_KINDS = ("conditions", "medications", "lab_reports", "protocol_overrides")
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class PatientFacts:
+    """The records a measure is evaluated against for a single patient."""
+
+    def __init__(self, patient_id: str) -> None:
+        self.patient_id = patient_id
+        self.conditions: list[Condition] = []
+        self.medications: list[Medication] = []
+        self.lab_reports: list[LabReport] = []
+        self.protocol_overrides: list[ProtocolOverride] = []
+
+    def __repr__(self) -> str:
+        return f"<PatientFacts patient_id={self.patient_id}>"
+
+
+def fact_queryset(
+    measure: ClinicalQualityMeasure, kind: str, patient_ids: Sequence[str] | None = None
+) -> QuerySet | None:
+    """Return the queryset loading one kind of record, for the given patients if any.
+
+    Returns None when the measure does not declare a value set for that kind of record.
+    """
+    queryset: QuerySet
+    if kind == "conditions":
+        if measure.condition_value_set is None:
+            return None
+        queryset = Condition.objects.committed().find(measure.condition_value_set)
+    elif kind == "medications":
+        if measure.medication_value_set is None:
+            return None
+        queryset = Medication.objects.committed().find(measure.medication_value_set)
+    elif kind == "lab_reports":
+        if measure.lab_value_set is None:
+            return None
+        queryset = LabReport.objects.committed().filter(
+            junked=False, values__in=LabValue.objects.find(measure.lab_value_set)
+        )
+    elif kind == "protocol_overrides":
+        queryset = ProtocolOverride.objects.active().filter(protocol_key=measure.protocol_key())
+    else:
+        raise ValueError(f"Unknown fact kind '{kind}'")
+
+    if patient_ids is not None:
+        queryset = queryset.filter(patient__id__in=patient_ids)
+    return queryset
+
+
+def load_patient_facts(
+    measure: ClinicalQualityMeasure,
+    patient_ids: Sequence[str],
+    kinds: Iterable[str] = FACT_KINDS,
+) -> dict[str, PatientFacts]:
+    """Load the records of the given kinds for many patients, with one query per kind."""
+    facts = {patient_id: PatientFacts(patient_id) for patient_id in patient_ids}
+
+    for kind in kinds:
+        queryset = fact_queryset(measure, kind, patient_ids)
+        if queryset is None:
+            continue
+
+        records: dict[str, list[Any]] = defaultdict(list)
+        for record in queryset.select_related("patient").distinct():
+            records[record.patient.id].append(record)
+
+        for patient_id, patient_facts in facts.items():
+            setattr(patient_facts, kind, records.get(patient_id, []))
+
+    return facts
+
+
+def _evaluate_chunk(
+    measure: ClinicalQualityMeasure,
+    patient_ids: Sequence[str],
+    database_context: tuple[str, str | None, str] | None,
+    close_connection: bool,
+) -> dict[str, Any]:
+    """Evaluate a measure for one chunk of patients."""
+    context = plugin_database_context(*database_context) if database_context else nullcontext()
+
+    try:
+        with context:
+            facts = load_patient_facts(measure, patient_ids)
+            return {
+                patient_id: measure.compute_for_patient(patient_id, facts[patient_id])
+                for patient_id in patient_ids
+            }
+    finally:
+        if close_connection:
+            # Worker threads get their own connection, which would otherwise be left open.
+            connection.close()
+
+
+def evaluate_population(
+    measure: ClinicalQualityMeasure,
+    patient_ids: Iterable[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_workers: int = 1,
+    on_progress: ProgressCallback | None = None,
+) -> dict[str, Any]:
+    """Evaluate a measure over a cohort of patients, a chunk at a time.
+
+    Args:
+        measure: The measure to evaluate.
+        patient_ids: The ids of the patients in the cohort.
+        chunk_size: The number of patients loaded and evaluated together.
+        max_workers: The number of chunks evaluated in parallel.
+        on_progress: Called with (patients evaluated, total patients) after each chunk.
+
+    Returns:
+        A mapping of patient id to the result of ``measure.compute_for_patient``.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    patient_ids = list(dict.fromkeys(patient_ids))
+    total = len(patient_ids)
+    chunks = [patient_ids[i : i + chunk_size] for i in range(0, total, chunk_size)]
+
+    plugin_name = get_current_plugin()
+    database_context = (
+        (plugin_name, get_current_schema(), get_access_level()) if plugin_name else None
+    )
+
+    results: dict[str, Any] = {}
+
+    def chunk_done(chunk_results: dict[str, Any]) -> None:
+        results.update(chunk_results)
+        log.debug(f"{measure.protocol_key()}: evaluated {len(results)} of {total} patients")
+        if on_progress:
+            on_progress(len(results), total)
+
+    if max_workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            chunk_done(_evaluate_chunk(measure, chunk, None, close_connection=False))
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_evaluate_chunk, measure, chunk, database_context, True)
+            for chunk in chunks
+        ]
+        for future in as_completed(futures):
+            chunk_done(future.result())
+
+    return results
+
+
+__exports__ = (
+    "DEFAULT_CHUNK_SIZE",
+    "FACT_KINDS",
+    "PatientFacts",
+    "evaluate_population",
+    "load_patient_facts",
+)
@@ -1,6 +1,7 @@
 import pytest
 
 from canvas_sdk.caching.client import caches
+from canvas_sdk.caching.local import local_caches
 
 
 @pytest.fixture(autouse=True)
@@ -17,3 +18,4 @@ def clear_caches() -> None:
         cleared_drivers.add(driver)
 
     caches.clear()
+    local_caches.clear()
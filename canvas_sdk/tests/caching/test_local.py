@@ -0,0 +1,182 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.core.cache import caches as django_caches
+from django.test import override_settings
+
+from canvas_sdk.caching.base import Cache
+from canvas_sdk.caching.client import get_cache
+from canvas_sdk.caching.local import (
+    MISSING,
+    CacheInvalidator,
+    LocalCache,
+    get_local_cache,
+    local_caches,
+)
+
+
+@pytest.fixture
+def connection() -> MagicMock:
+    """A cache backend recording its calls, backed by the local-memory cache."""
+    backend = django_caches["plugins"]
+    backend.clear()
+    connection = MagicMock(wraps=backend)
+    connection.__contains__ = lambda _, key: backend.__contains__(key)
+    return connection
+
+
+@pytest.fixture
+def local() -> LocalCache:
+    """A local cache without invalidation."""
+    return LocalCache("plugins", max_entries=2, timeout_seconds=5)
+
+
+@pytest.fixture
+def cache(connection: MagicMock, local: LocalCache) -> Cache:
+    """A cache with a local tier in front of the backend."""
+    return Cache(connection, "my_plugin", local=local)
+
+
+def test_local_cache_evicts_least_recently_used(local: LocalCache) -> None:
+    """Past the maximum number of entries, the least recently used ones are evicted."""
+    local.set("a", 1)
+    local.set("b", 2)
+    local.get("a")
+    local.set("c", 3)
+
+    assert local.get("a") == 1
+    assert local.get("b") is MISSING
+    assert local.get("c") == 3
+
+
+def test_local_cache_entries_expire(local: LocalCache) -> None:
+    """Entries expire after the local timeout, or the timeout given if shorter."""
+    with patch("canvas_sdk.caching.local.time.monotonic", return_value=100):
+        local.set("a", 1)
+        local.set("b", 2, timeout_seconds=1)
+        local.set("c", 3, timeout_seconds=0)
+
+    with patch("canvas_sdk.caching.local.time.monotonic", return_value=102):
+        assert local.get("a") == 1
+        assert local.get("b") is MISSING
+        assert local.get("c") is MISSING
+
+    with patch("canvas_sdk.caching.local.time.monotonic", return_value=105):
+        assert "a" not in local
+        assert local.get("a") is MISSING
+
+
+def test_local_cache_returns_copies(local: LocalCache) -> None:
+    """Mutating a value from the local cache doesn't change the cached value."""
+    local.set("a", {"items": [1]})
+    local.get("a")["items"].append(2)
+
+    assert local.get("a") == {"items": [1]}
+
+
+def test_hot_reads_are_served_locally(cache: Cache, connection: MagicMock) -> None:
+    """Once read or written, a key is served without going to the backend."""
+    cache.set("written", "value")
+    connection.set("my_plugin:read", "other value")
+
+    for _ in range(3):
+        assert cache.get("written") == "value"
+        assert cache.get("read") == "other value"
+        assert "read" in cache
+
+    assert [call.args[0] for call in connection.get.call_args_list] == ["my_plugin:read"]
+
+
+def test_misses_are_not_cached_locally(cache: Cache, connection: MagicMock) -> None:
+    """Missing keys return the default, and are looked up in the backend every time."""
+    assert cache.get("missing", "default") == "default"
+    assert cache.get("missing") is None
+    assert connection.get.call_count == 2
+
+    connection.set("my_plugin:missing", None)
+    assert cache.get("missing", "default") is None
+
+
+def test_writes_go_through_to_the_backend(cache: Cache, connection: MagicMock) -> None:
+    """Writes reach the backend, and deletes evict the local copy."""
+    cache.set("a", 1)
+    cache.set_many({"b": 2, "c": 3})
+    assert connection.get_many(["my_plugin:a", "my_plugin:b", "my_plugin:c"]) == {
+        "my_plugin:a": 1,
+        "my_plugin:b": 2,
+        "my_plugin:c": 3,
+    }
+
+    cache.delete("a")
+    assert "a" not in cache
+    assert cache.get("a") is None
+
+
+def test_get_many_fetches_only_missing_keys(
+    cache: Cache, connection: MagicMock, local: LocalCache
+) -> None:
+    """Keys cached locally aren't fetched from the backend."""
+    cache.set("a", 1)
+    connection.set("my_plugin:b", 2)
+
+    assert cache.get_many(["a", "b", "c"]) == {"my_plugin:a": 1, "my_plugin:b": 2}
+    connection.get_many.assert_called_once()
+    assert sorted(connection.get_many.call_args.args[0]) == ["my_plugin:b", "my_plugin:c"]
+    assert local.get("my_plugin:b") == 2
+
+
+def test_get_or_set(cache: Cache, connection: MagicMock) -> None:
+    """get_or_set() sets the default once, then serves the key locally."""
+    assert cache.get_or_set("a", lambda: 1) == 1
+    assert cache.get_or_set("a", lambda: 2) == 1
+    connection.get_or_set.assert_called_once()
+
+
+def test_writes_are_broadcast(connection: MagicMock) -> None:
+    """Writes and deletes publish the keys written."""
+    invalidator = MagicMock(spec=CacheInvalidator)
+    cache = Cache(connection, "my_plugin", local=LocalCache("plugins", 10, 5, invalidator))
+
+    cache.set("a", 1)
+    cache.set_many({"b": 2})
+    cache.delete("a")
+
+    assert [list(call.args[1]) for call in invalidator.publish.call_args_list] == [
+        ["my_plugin:a"],
+        ["my_plugin:b"],
+        ["my_plugin:a"],
+    ]
+
+
+def test_invalidations_from_other_processes_evict_keys() -> None:
+    """Keys written by other processes are evicted, but not those written by this one."""
+    with patch("canvas_sdk.caching.local.InvalidationPublisher"):
+        invalidator = CacheInvalidator()
+    invalidator.ensure_listener = MagicMock()  # type: ignore[method-assign]
+    local = LocalCache("plugins", 10, 5, invalidator)
+    local_caches["plugins"] = local
+    local.set("a", 1)
+    local.set("b", 2)
+
+    invalidator.publish("plugins", ["a"])
+    [message] = invalidator.publisher.publish.call_args.args  # type: ignore[attr-defined]
+    invalidator.handle_message(message)
+    assert local.get("a") == 1
+
+    invalidator.handle_message(json.dumps({"origin": "other", "driver": "plugins", "keys": ["a"]}))
+    assert local.get("a") is MISSING
+    assert local.get("b") == 2
+
+
+def test_local_tier_is_optional() -> None:
+    """The plugins cache only gets a local tier when it is enabled."""
+    assert get_local_cache("plugins") is None
+    assert get_cache("plugins", "my_plugin")._local is None
+
+    with override_settings(CANVAS_SDK_CACHE_LOCAL_MAX_ENTRIES=100):
+        assert get_local_cache("default") is None
+        local = get_local_cache("plugins")
+        assert local is not None
+        assert local.max_entries == 100
+        assert get_cache("plugins", "other_plugin")._local is local
@@ -0,0 +1,138 @@
+"""Tests for CustomModel.bulk_ingest."""
+
+from collections.abc import Iterator
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.db import models
+
+from canvas_sdk.v1.data.base import (
+    MAX_BULK_SIZE,
+    MAX_FIELD_SIZE,
+    CustomModel,
+    FieldValueTooLarge,
+    NamespaceWriteDenied,
+)
+from canvas_sdk.v1.plugin_database_context import plugin_database_context
+
+
+class IngestModel(CustomModel):
+    """A mock model for bulk ingest tests."""
+
+    class Meta:
+        app_label = "test"
+        managed = False
+
+    name = models.CharField(max_length=20)
+    payload = models.JSONField(null=True)
+
+
+def rows(count: int) -> Iterator[dict[str, Any]]:
+    """Generate rows as mappings of field names to values."""
+    for i in range(count):
+        yield {"name": f"row-{i}", "payload": {"i": i}}
+
+
+def postgres_connection() -> MagicMock:
+    """A connection that looks like a PostgreSQL one."""
+    return MagicMock(vendor="postgresql", alias="default")
+
+
+class TestBulkIngest:
+    """Tests for chunking, permissions and field size checks."""
+
+    def test_chunks_generator_with_bulk_create(self) -> None:
+        """Rows from a generator are written chunk_size at a time with bulk_create."""
+        with patch.object(models.QuerySet, "bulk_create") as bulk_create:
+            result = IngestModel.bulk_ingest(rows(5), chunk_size=2)
+
+        assert [len(call.args[0]) for call in bulk_create.call_args_list] == [2, 2, 1]
+        assert all(
+            isinstance(obj, IngestModel)
+            for call in bulk_create.call_args_list
+            for obj in call.args[0]
+        )
+        assert result.rows == 5
+        assert result.rows_per_second >= 0
+
+    def test_accepts_instances(self) -> None:
+        """Model instances are written as given."""
+        objs = [IngestModel(name="a"), IngestModel(name="b")]
+
+        with patch.object(models.QuerySet, "bulk_create") as bulk_create:
+            result = IngestModel.bulk_ingest(iter(objs))
+
+        bulk_create.assert_called_once_with(objs)
+        assert result.rows == 2
+
+    def test_empty_input(self) -> None:
+        """Nothing is written for an empty iterable."""
+        with patch.object(models.QuerySet, "bulk_create") as bulk_create:
+            result = IngestModel.bulk_ingest([])
+
+        bulk_create.assert_not_called()
+        assert result.rows == 0
+
+    @pytest.mark.parametrize("chunk_size", [0, MAX_BULK_SIZE + 1])
+    def test_rejects_invalid_chunk_size(self, chunk_size: int) -> None:
+        """chunk_size must be positive and within the bulk limit."""
+        with pytest.raises(ValueError, match="chunk_size"):
+            IngestModel.bulk_ingest(rows(1), chunk_size=chunk_size)
+
+    def test_denied_in_read_only_namespace(self) -> None:
+        """Nothing is consumed or written without write access."""
+        source = rows(3)
+
+        with (
+            plugin_database_context("test_plugin", namespace="test_ns", access_level="read"),
+            patch.object(models.QuerySet, "bulk_create") as bulk_create,
+            pytest.raises(NamespaceWriteDenied),
+        ):
+            IngestModel.bulk_ingest(source)
+
+        bulk_create.assert_not_called()
+        assert len(list(source)) == 3
+
+    def test_copies_chunks_on_postgres(self) -> None:
+        """On PostgreSQL each chunk is written with COPY."""
+        with (
+            patch("canvas_sdk.v1.data.base.connections", {"default": postgres_connection()}),
+            patch.object(IngestModel, "_copy_rows") as copy_rows,
+        ):
+            result = IngestModel.bulk_ingest(rows(3), chunk_size=2)
+
+        assert [len(call.args[1]) for call in copy_rows.call_args_list] == [2, 1]
+        assert result.rows == 3
+
+    def test_checks_field_sizes_on_postgres(self) -> None:
+        """Oversized values are rejected before the chunk is copied."""
+        oversized = [{"name": "big", "payload": {"data": "x" * MAX_FIELD_SIZE}}]
+
+        with (
+            patch("canvas_sdk.v1.data.base.connections", {"default": postgres_connection()}),
+            patch.object(IngestModel, "_copy_rows") as copy_rows,
+            pytest.raises(FieldValueTooLarge, match="payload"),
+        ):
+            IngestModel.bulk_ingest(oversized)
+
+        copy_rows.assert_not_called()
+
+
+def test_copy_rows_writes_every_column_but_dbid() -> None:
+    """_copy_rows issues a single COPY for the model's columns and writes a row per object."""
+    db_connection = postgres_connection()
+    db_connection.ops.quote_name = lambda name: f'"{name}"'
+    cursor = db_connection.cursor.return_value.__enter__.return_value
+    copy = cursor.cursor.copy.return_value.__enter__.return_value
+
+    objs = [IngestModel(name="a", payload={"b": 1}), IngestModel(name="c")]
+    encoded = [obj._check_field_sizes() for obj in objs]
+
+    with patch("canvas_sdk.v1.data.base.transaction.atomic") as atomic:
+        IngestModel._copy_rows(db_connection, objs, encoded)
+
+    atomic.assert_called_once_with(using="default")
+    cursor.cursor.copy.assert_called_once_with('COPY "ingestmodel" ("name", "payload") FROM STDIN')
+    assert copy.write_row.call_count == 2
+    assert copy.write_row.call_args_list[0].args[0] == ["a", '{"b": 1}']
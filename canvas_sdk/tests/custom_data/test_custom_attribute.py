@@ -658,6 +658,113 @@ class TestWithOnly:
         assert "some_relation" in lookups
 
 
+class LazyAttributeHubProxy(AttributeHub):
+    """Proxy whose manager does not prefetch custom attributes by default."""
+
+    objects = CustomAttributeAwareManager(prefetch_attributes=False)
+
+    class Meta:
+        proxy = True
+        app_label = "v1"
+
+
+@pytest.mark.django_db
+class TestOptionalPrefetch:
+    """Tests for opting out of the custom attribute prefetch."""
+
+    @pytest.fixture
+    def hub(self, db: None) -> AttributeHub:
+        """Create an AttributeHub with a custom attribute."""
+        hub = AttributeHub(type="test", id="optional-prefetch-test")
+        hub.save()
+        hub.set_attribute("color", "blue")
+        return hub
+
+    def test_without_attributes_skips_prefetch(
+        self, hub: AttributeHub, django_assert_num_queries: Any
+    ) -> None:
+        """without_attributes() should fetch the hubs with a single query."""
+        with django_assert_num_queries(1):
+            fetched = list(AttributeHubProxy.objects.without_attributes().filter(pk=hub.pk))
+
+        assert "custom_attributes" not in getattr(fetched[0], "_prefetched_objects_cache", {})
+
+    def test_manager_without_default_prefetch(
+        self, hub: AttributeHub, django_assert_num_queries: Any
+    ) -> None:
+        """A manager created with prefetch_attributes=False should not prefetch."""
+        with django_assert_num_queries(1):
+            list(LazyAttributeHubProxy.objects.filter(pk=hub.pk))
+
+        fetched = LazyAttributeHubProxy.objects.with_only("color").get(pk=hub.pk)
+        assert "custom_attributes" in fetched._prefetched_objects_cache
+
+    def test_queryset_with_attributes(self, hub: AttributeHub) -> None:
+        """with_attributes() should add the prefetch when declared on a queryset."""
+        queryset = LazyAttributeHubProxy.objects.filter(pk=hub.pk)
+        fetched = queryset.with_attributes().get()
+
+        cached = fetched._prefetched_objects_cache.get("custom_attributes")
+        assert [attr.name for attr in cached] == ["color"]
+
+
+@pytest.mark.django_db
+class TestWithAttributeValues:
+    """Tests for loading attribute values as annotations."""
+
+    VALUES: dict[str, Any] = {
+        "text": "blue",
+        "int": 42,
+        "bool": False,
+        "decimal": decimal.Decimal("12.3456789012"),
+        "date": datetime.date(2024, 1, 15),
+        "timestamp": datetime.datetime(2024, 1, 15, 10, 30, tzinfo=datetime.UTC),
+        "dict": {"nested": [1, "two"]},
+        "list": ["a", "b"],
+    }
+
+    @pytest.fixture
+    def hub(self, db: None) -> AttributeHub:
+        """Create an AttributeHub with attributes of every type."""
+        hub = AttributeHub(type="test", id="annotated-values-test")
+        hub.save()
+        hub.set_attributes(self.VALUES)
+        return hub
+
+    def test_values_round_trip_in_one_query(self, hub: AttributeHub) -> None:
+        """Every value type should be read back from the annotations in a single query."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            fetched = AttributeHub.objects.with_attribute_values([*self.VALUES, "missing"]).get(
+                pk=hub.pk
+            )
+            values = {name: fetched.get_attribute(name) for name in self.VALUES}
+            assert fetched.get_attribute("missing") is None
+
+        # SQLite may also run a one-off JSON support check on the connection.
+        assert len([q for q in ctx if "attribute" in q["sql"]]) == 1
+        assert values == self.VALUES
+
+    def test_other_attributes_fall_back_to_db(self, hub: AttributeHub) -> None:
+        """Attributes that were not annotated should still be found."""
+        fetched = LazyAttributeHubProxy.objects.with_attribute_values("text").get(pk=hub.pk)
+
+        assert fetched.get_attributes(["text", "int"]) == {"text": "blue", "int": 42}
+
+    def test_chained_with_attribute_values(self, hub: AttributeHub) -> None:
+        """Chained calls should accumulate annotated names."""
+        fetched = (
+            AttributeHub.objects.with_attribute_values("text")
+            .filter(type="test")
+            .with_attribute_values(["int"])
+            .get(pk=hub.pk)
+        )
+
+        assert fetched._annotated_attributes == {"text": "blue", "int": 42}
+
+
 # ===========================================================================
 # Tests for prefetch behaviour on aggregate / non-fetching queries
 # ===========================================================================
@@ -1178,6 +1285,88 @@ class TestDeleteAttribute:
         assert CustomAttribute.objects.filter(hub=hub).count() == 1
 
 
+# ===========================================================================
+# Tests for bulk attribute access
+# ===========================================================================
+
+
+@pytest.mark.django_db
+class TestBulkAttributeAccess:
+    """Tests for get_attributes, bulk_get_attributes and delete_attributes."""
+
+    @pytest.fixture
+    def hub(self, db: None) -> AttributeHub:
+        """Create an AttributeHub with several attributes."""
+        hub = AttributeHub(type="test", id="bulk-test")
+        hub.save()
+        hub.set_attributes({"color": "blue", "size": "large", "weight": 42})
+        return hub
+
+    def test_get_attributes_uses_one_query(
+        self, hub: AttributeHub, django_assert_num_queries: Any
+    ) -> None:
+        """Should fetch all requested attributes in a single query."""
+        hub = AttributeHub.objects.with_only([]).get(pk=hub.pk)
+
+        with django_assert_num_queries(1):
+            values = hub.get_attributes(["color", "weight", "missing"])
+
+        assert values == {"color": "blue", "weight": 42, "missing": None}
+
+    def test_get_attributes_reads_prefetch_cache(
+        self, hub: AttributeHub, django_assert_num_queries: Any
+    ) -> None:
+        """Should not query for attributes that were prefetched."""
+        hub = AttributeHub.objects.with_only(["color", "size"]).get(pk=hub.pk)
+
+        with django_assert_num_queries(0):
+            assert hub.get_attributes(["color", "size"]) == {"color": "blue", "size": "large"}
+
+        with django_assert_num_queries(1):
+            assert hub.get_attributes(["color", "weight"]) == {"color": "blue", "weight": 42}
+
+    def test_bulk_get_attributes_across_hubs(
+        self, hub: AttributeHub, django_assert_num_queries: Any
+    ) -> None:
+        """Should return a nested dict for many hubs from a single query."""
+        other = AttributeHub(type="test", id="bulk-test-other")
+        other.save()
+        other.set_attribute("color", "red")
+
+        with django_assert_num_queries(1):
+            values = AttributeHub.bulk_get_attributes([hub, other], ["color", "weight"])
+
+        assert values == {
+            hub: {"color": "blue", "weight": 42},
+            other: {"color": "red", "weight": None},
+        }
+
+    def test_bulk_get_attributes_all_names(self, hub: AttributeHub) -> None:
+        """Should return every attribute when no names are given."""
+        values = AttributeHub.bulk_get_attributes([hub])
+
+        assert values == {hub: {"color": "blue", "size": "large", "weight": 42}}
+
+    def test_delete_attributes_uses_one_query(
+        self, hub: AttributeHub, django_assert_num_queries: Any
+    ) -> None:
+        """Should delete the named attributes in a single query and return the count."""
+        with django_assert_num_queries(1):
+            deleted = hub.delete_attributes(["color", "weight", "missing"])
+
+        assert deleted == 2
+        assert list(CustomAttribute.objects.filter(hub=hub).values_list("name", flat=True)) == [
+            "size"
+        ]
+
+    def test_delete_attribute_uses_one_query(
+        self, hub: AttributeHub, django_assert_num_queries: Any
+    ) -> None:
+        """Should delete a single attribute without fetching it first."""
+        with django_assert_num_queries(1):
+            assert hub.delete_attribute("color") is True
+
+
 # ---------------------------------------------------------------------------
 # CustomAttributeQuerySet value filtering
 # ---------------------------------------------------------------------------
@@ -1643,6 +1832,18 @@ class TestAttributeHubWritePermission:
         with pytest.raises(NamespaceWriteDenied):
             hub.delete_attribute("key")
 
+    def test_delete_attributes_raises_when_read_only(self) -> None:
+        """delete_attributes should raise NamespaceWriteDenied when access is read-only."""
+        from canvas_sdk.v1.data.base import NamespaceWriteDenied
+        from canvas_sdk.v1.plugin_database_context import _plugin_context
+
+        _plugin_context.schema = "test_ns"
+        _plugin_context.access_level = "read"
+
+        hub = AttributeHub()
+        with pytest.raises(NamespaceWriteDenied):
+            hub.delete_attributes(["key"])
+
     def test_set_attribute_allowed_without_context(self) -> None:
         """set_attribute should not raise when not in a plugin context."""
         hub = AttributeHub()
@@ -9,14 +9,17 @@ Tests verify that:
 
 import threading
 import time
+from collections.abc import Generator
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from unittest.mock import MagicMock, patch
 
 import pytest
 from django.db import connection
+from django.db.backends.signals import connection_created
 
 from canvas_sdk.v1.plugin_database_context import (
     _plugin_context,
+    _search_path_wrapper,
     clear_current_plugin,
     get_access_level,
     get_current_plugin,
@@ -239,20 +242,154 @@ class TestPluginDatabaseContextManagerMocked:
 
     @patch("canvas_sdk.v1.plugin_database_context._is_postgres", return_value=True)
     def test_search_path_restored_to_public(self, mock_is_pg: MagicMock) -> None:
-        """Verify search_path is restored to public after context."""
+        """Verify search_path is restored to public before the next query after context."""
         with patch("django.db.connection") as mock_conn:
             mock_cursor = MagicMock()
             mock_conn.cursor.return_value.__enter__ = MagicMock(return_value=mock_cursor)
             mock_conn.cursor.return_value.__exit__ = MagicMock(return_value=False)
+            mock_conn.in_atomic_block = False
 
             with plugin_database_context("temp_plugin", namespace="org__shared"):
                 pass
 
-            # Last call should reset to public
-            calls = mock_cursor.execute.call_args_list
-            last_call = calls[-1]
+            # Nothing is reset until the connection is used again
+            assert mock_cursor.execute.call_count == 1
+
+            execute = MagicMock()
+            _search_path_wrapper(execute, "SELECT 1", None, False, {"connection": mock_conn})
+
+            last_call = mock_cursor.execute.call_args_list[-1]
             assert "SET search_path" in last_call[0][0]
             assert "public" in last_call[0][0]
+            execute.assert_called_once_with("SELECT 1", None, False, {"connection": mock_conn})
+
+
+class TestSearchPathTracking:
+    """Tests that search_path changes are only made when they change something."""
+
+    @pytest.fixture
+    def mock_conn(self) -> Generator[MagicMock, None, None]:
+        """A mocked PostgreSQL connection outside of a transaction."""
+        with (
+            patch("canvas_sdk.v1.plugin_database_context._is_postgres", return_value=True),
+            patch("django.db.connection") as mock_conn,
+        ):
+            mock_conn.in_atomic_block = False
+            mock_conn.execute_wrappers = []
+            yield mock_conn
+
+    def executed(self, mock_conn: MagicMock) -> list[tuple]:
+        """The statements executed on the connection, with their parameters."""
+        cursor = mock_conn.cursor.return_value.__enter__.return_value
+        return [call.args for call in cursor.execute.call_args_list]
+
+    def query(self, mock_conn: MagicMock) -> None:
+        """Run a query on the connection through the search_path wrapper."""
+        _search_path_wrapper(MagicMock(), "SELECT 1", None, False, {"connection": mock_conn})
+
+    def test_consecutive_contexts_with_same_namespace(self, mock_conn: MagicMock) -> None:
+        """The search_path is set once for consecutive contexts sharing a namespace."""
+        for _ in range(3):
+            with plugin_database_context("my_plugin", namespace="org__shared"):
+                self.query(mock_conn)
+
+        assert self.executed(mock_conn) == [("SET search_path = %s, public", ["org__shared"])]
+        assert mock_conn.execute_wrappers == [_search_path_wrapper]
+
+    def test_changing_namespace(self, mock_conn: MagicMock) -> None:
+        """The search_path is set again when the namespace changes."""
+        with plugin_database_context("plugin_a", namespace="org__a"):
+            self.query(mock_conn)
+        self.query(mock_conn)
+        with plugin_database_context("plugin_b", namespace="org__b"):
+            self.query(mock_conn)
+
+        assert self.executed(mock_conn) == [
+            ("SET search_path = %s, public", ["org__a"]),
+            ("SET search_path = public",),
+            ("SET search_path = %s, public", ["org__b"]),
+        ]
+
+    def test_connection_without_namespace_is_untouched(self, mock_conn: MagicMock) -> None:
+        """Queries on a connection never given a namespace don't change its search_path."""
+        with plugin_database_context("my_plugin"):
+            self.query(mock_conn)
+        self.query(mock_conn)
+
+        assert self.executed(mock_conn) == []
+
+    @pytest.fixture
+    def in_transaction(self, mock_conn: MagicMock) -> MagicMock:
+        """Put the mocked connection in a transaction that keeps its on_commit callbacks."""
+        mock_conn.in_atomic_block = True
+        mock_conn.run_on_commit = []
+        mock_conn.on_commit.side_effect = lambda func: mock_conn.run_on_commit.append(
+            (set(), func, False)
+        )
+        return mock_conn
+
+    def test_search_path_set_in_transaction_is_set_once(self, in_transaction: MagicMock) -> None:
+        """Queries in the transaction the search_path was set in don't set it again."""
+        with plugin_database_context("my_plugin", namespace="org__shared"):
+            self.query(in_transaction)
+            self.query(in_transaction)
+
+        assert self.executed(in_transaction) == [("SET search_path = %s, public", ["org__shared"])]
+
+    def test_search_path_is_kept_after_commit(self, in_transaction: MagicMock) -> None:
+        """A search_path set in a transaction that commits isn't set again afterwards."""
+        with plugin_database_context("my_plugin", namespace="org__shared"):
+            self.query(in_transaction)
+
+        for _, func, _ in in_transaction.run_on_commit:
+            func()
+        in_transaction.run_on_commit = []
+        in_transaction.in_atomic_block = False
+
+        with plugin_database_context("my_plugin", namespace="org__shared"):
+            self.query(in_transaction)
+
+        assert self.executed(in_transaction) == [("SET search_path = %s, public", ["org__shared"])]
+
+    def test_search_path_is_set_again_after_rollback(self, in_transaction: MagicMock) -> None:
+        """A rollback, of the transaction or of a savepoint, undoes the search_path set in it."""
+        with plugin_database_context("my_plugin", namespace="org__shared"):
+            self.query(in_transaction)
+            # Rolling back a savepoint discards the callbacks registered in it.
+            in_transaction.run_on_commit = []
+            self.query(in_transaction)
+
+        in_transaction.run_on_commit = []
+        in_transaction.in_atomic_block = False
+
+        with plugin_database_context("my_plugin", namespace="org__shared"):
+            self.query(in_transaction)
+
+        assert (
+            self.executed(in_transaction) == [("SET search_path = %s, public", ["org__shared"])] * 3
+        )
+
+    def test_failed_change_is_not_recorded(self, mock_conn: MagicMock) -> None:
+        """A search_path change that fails is attempted again."""
+        cursor = mock_conn.cursor.return_value.__enter__.return_value
+        cursor.execute.side_effect = [RuntimeError("connection lost"), None]
+
+        with pytest.raises(RuntimeError), plugin_database_context("p", namespace="org__shared"):
+            pass
+
+        with plugin_database_context("p", namespace="org__shared"):
+            pass
+
+        assert cursor.execute.call_count == 2
+
+    def test_wrapper_installed_on_new_postgres_connections(self) -> None:
+        """Every new PostgreSQL connection gets the search_path wrapper, once."""
+        new_connection = MagicMock(vendor="postgresql", execute_wrappers=[])
+
+        connection_created.send(sender=None, connection=new_connection)
+        connection_created.send(sender=None, connection=new_connection)
+
+        assert new_connection.execute_wrappers == [_search_path_wrapper]
 
 
 class TestPluginDatabaseContextThreadSafetyMocked:
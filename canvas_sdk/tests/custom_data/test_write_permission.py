@@ -7,10 +7,14 @@ Tests verify that:
 4. Operations succeed when not in a plugin context
 """
 
+import datetime
+import json
+from collections.abc import Generator
 from unittest.mock import patch
 
 import pytest
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models
 
 from canvas_sdk.v1.data.base import (
     MAX_FIELD_SIZE,
@@ -258,3 +262,119 @@ class TestFieldSizeValidation:
 
         with patch.object(Model.__bases__[0], "save", return_value=None):
             model.save()  # Should not raise
+
+    def test_save_measures_json_with_field_encoder(self) -> None:
+        """JSON values holding types only the field's encoder handles can be measured."""
+        model = MockModelWithFields()
+        model.json_field = {"when": datetime.date(2024, 1, 1)}
+        field = MockModelWithFields._meta.get_field("json_field")
+
+        with (
+            patch.object(field, "encoder", DjangoJSONEncoder),
+            patch.object(Model.__bases__[0], "save", return_value=None),
+        ):
+            model.save()  # Should not raise
+
+    def test_bulk_create_checks_field_sizes(self) -> None:
+        """bulk_create() should reject oversized values before writing anything."""
+        objs = [MockModelWithFields(), MockModelWithFields(text_field="x" * (MAX_FIELD_SIZE + 1))]
+
+        with (
+            patch("canvas_sdk._original_bulk_create") as bulk_create,
+            pytest.raises(FieldValueTooLarge, match="text_field"),
+        ):
+            MockModelWithFields._default_manager.bulk_create(objs)
+
+        bulk_create.assert_not_called()
+
+    def test_bulk_update_checks_only_updated_fields(self) -> None:
+        """bulk_update() should only check the fields being updated."""
+        obj = MockModelWithFields(
+            text_field="x" * (MAX_FIELD_SIZE + 1), json_field={"data": "x" * MAX_FIELD_SIZE}
+        )
+
+        with patch("canvas_sdk._original_bulk_update") as bulk_update:
+            MockModelWithFields._default_manager.bulk_update([obj], fields=iter(["dbid"]))
+            bulk_update.assert_called_once()
+            assert bulk_update.call_args.args[2] == ["dbid"]
+
+            with pytest.raises(FieldValueTooLarge, match="json_field"):
+                MockModelWithFields._default_manager.bulk_update([obj], ["json_field"])
+
+
+class JSONWriteModel(CustomModel):
+    """A mock model with a table, for tests writing JSON values."""
+
+    class Meta:
+        app_label = "test"
+
+    json_field = models.JSONField(null=True)
+
+
+@pytest.fixture
+def json_write_table() -> Generator[None, None, None]:
+    """Create the JSONWriteModel table for the duration of a test."""
+    with connection.schema_editor() as editor:
+        editor.create_model(JSONWriteModel)
+    yield
+    with connection.schema_editor() as editor:
+        editor.delete_model(JSONWriteModel)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.usefixtures("json_write_table")
+class TestEncodedJSONReuse:
+    """Tests that writes use the JSON serialized while checking field sizes."""
+
+    def test_save_serializes_json_once(self) -> None:
+        """Inserts and updates serialize each JSON value once."""
+        model = JSONWriteModel(json_field={"a": [1, 2]})
+
+        with patch("canvas_sdk.v1.data.base.json.dumps", wraps=json.dumps) as dumps:
+            model.save()
+            model.json_field = {"b": "c"}
+            model.save()
+
+        assert dumps.call_count == 2
+        assert model.json_field == {"b": "c"}
+        assert JSONWriteModel.objects.get(pk=model.pk).json_field == {"b": "c"}  # type: ignore[attr-defined]
+
+    def test_save_uses_field_encoder(self) -> None:
+        """JSON values are serialized with the field's encoder."""
+        model = JSONWriteModel(json_field={"when": datetime.date(2024, 1, 1)})
+
+        with patch.object(
+            JSONWriteModel._meta.get_field("json_field"), "encoder", DjangoJSONEncoder
+        ):
+            model.save()
+
+        assert JSONWriteModel.objects.get(pk=model.pk).json_field == {"when": "2024-01-01"}  # type: ignore[attr-defined]
+
+    def test_save_serializes_values_replaced_after_the_check(self) -> None:
+        """A value replaced after it was checked is serialized again, not written stale."""
+        model = JSONWriteModel(json_field={"a": 1})
+        model._encoded_json = model._check_field_sizes()
+        model.json_field = {"b": 2}
+
+        assert model._encoded_json_expressions() == {}
+
+    def test_bulk_writes_serialize_json_once(self) -> None:
+        """bulk_create() and bulk_update() serialize each JSON value once."""
+        models_ = [JSONWriteModel(json_field={"n": n}) for n in range(3)]
+
+        with patch("canvas_sdk.v1.data.base.json.dumps", wraps=json.dumps) as dumps:
+            JSONWriteModel.objects.bulk_create(models_)  # type: ignore[attr-defined]
+            assert dumps.call_count == 3
+
+            saved = list(JSONWriteModel.objects.order_by("pk"))  # type: ignore[attr-defined]
+            for model in saved:
+                model.json_field = {"n": model.json_field["n"] + 10}
+            JSONWriteModel.objects.bulk_update(saved, ["json_field"])  # type: ignore[attr-defined]
+            assert dumps.call_count == 6
+
+        assert [model.json_field for model in models_] == [{"n": 0}, {"n": 1}, {"n": 2}]
+        assert [
+            model.json_field
+            for model in JSONWriteModel.objects.order_by("pk")  # type: ignore[attr-defined]
+        ] == [{"n": 10}, {"n": 11}, {"n": 12}]
+        assert not any("_encoded_json" in model.__dict__ for model in models_ + saved)
@@ -1,18 +1,23 @@
 import inspect
 from typing import Any
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
+import pytest
+from django.db import connections
 from django.db.models import Q
 
+from canvas_sdk.test_utils.factories import PatientFactory
 from canvas_sdk.v1.data.base import (
     BaseQuerySet,
     CommittableQuerySetMixin,
     ForPatientQuerySetMixin,
+    InvalidCursor,
     QuerySetProtocol,
     TimeframeLookupQuerySetMixin,
     ValueSetLookupByNameQuerySetMixin,
     ValueSetLookupQuerySetMixin,
 )
+from canvas_sdk.v1.data.patient import Patient
 
 
 def test_queryset_protocol_does_not_define_methods_at_runtime() -> None:
@@ -136,3 +141,170 @@ def test_timeframe_lookup_mixin_within_calls_filter_with_range() -> None:
     call_kwargs = mock_qs.filter.call_args[1]
     assert "note__datetime_of_service__range" in call_kwargs
     assert call_kwargs["note__datetime_of_service__range"] == ("2024-01-01", "2024-12-31")
+
+
+@pytest.mark.django_db
+def test_stream_yields_instances_and_rows() -> None:
+    """Verify stream() yields every instance, or rows when combined with values_list()."""
+    patients = PatientFactory.create_batch(5)
+    ids = sorted(patient.id for patient in patients)
+
+    streamed = Patient.objects.filter(id__in=ids).order_by("id").stream(chunk_size=2)
+
+    assert [patient.id for patient in streamed] == ids
+    rows = Patient.objects.filter(id__in=ids).order_by("id").values_list("id", flat=True)
+    assert list(rows.stream(chunk_size=2)) == ids  # type: ignore[attr-defined]
+
+
+def test_stream_rejects_invalid_chunk_size() -> None:
+    """Verify stream() requires a positive chunk size."""
+    with pytest.raises(ValueError, match="chunk_size"):
+        next(Patient.objects.all().stream(chunk_size=0))
+
+
+def test_stream_falls_back_to_iterator_without_server_side_cursors() -> None:
+    """Verify stream() uses iterator() directly when not on PostgreSQL."""
+    qs = Patient.objects.all()
+
+    with (
+        patch.object(type(qs), "iterator", return_value=iter([1, 2])) as iterator,
+        patch.object(type(qs), "keyset_page") as keyset_page,
+    ):
+        assert list(qs.stream(chunk_size=10)) == [1, 2]
+
+    iterator.assert_called_once_with(chunk_size=10)
+    keyset_page.assert_not_called()
+
+
+@pytest.fixture
+def postgres_streaming() -> Any:
+    """Make stream() take its PostgreSQL path on the test database."""
+    with patch.object(connections["default"], "vendor", "postgresql"):
+        yield
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_reads_pages_outside_a_transaction(postgres_streaming: None) -> None:
+    """Verify stream() reads page by page on PostgreSQL, without holding a transaction open."""
+    patients = PatientFactory.create_batch(5)
+    ids = sorted(patient.id for patient in patients)
+    qs = Patient.objects.filter(id__in=ids).order_by("id")
+
+    with patch.object(type(qs), "iterator") as iterator:
+        streamed = []
+        for patient in qs.stream(chunk_size=2):
+            assert not connections["default"].in_atomic_block
+            streamed.append(patient.id)
+
+    assert streamed == ids
+    iterator.assert_not_called()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_keeps_writes_when_the_caller_breaks_early(postgres_streaming: None) -> None:
+    """Verify writes made while streaming are kept when the caller stops early."""
+    PatientFactory.create_batch(3)
+
+    stream = Patient.objects.order_by("dbid").stream(chunk_size=2)
+    for patient in stream:
+        patient.first_name = "Streamed"
+        patient.save()
+        break
+    stream.close()
+
+    assert Patient.objects.filter(first_name="Streamed").count() == 1
+    assert not connections["default"].in_atomic_block
+
+
+@pytest.mark.django_db
+def test_stream_falls_back_to_iterator_inside_a_transaction(postgres_streaming: None) -> None:
+    """Verify stream() uses the server-side cursor of iterator() within a transaction."""
+    qs = Patient.objects.all()
+
+    with patch.object(type(qs), "iterator", return_value=iter([1, 2])) as iterator:
+        assert list(qs.stream(chunk_size=10)) == [1, 2]
+
+    iterator.assert_called_once_with(chunk_size=10)
+
+
+@pytest.mark.django_db
+class TestKeysetPage:
+    """Tests for keyset pagination on BaseQuerySet."""
+
+    @pytest.fixture
+    def patients(self) -> list[Patient]:
+        """Seven patients, ordered by primary key."""
+        return sorted(PatientFactory.create_batch(7), key=lambda patient: patient.dbid)
+
+    def pages(self, queryset: Any, **kwargs: Any) -> list[list[Any]]:
+        """Follow next cursors from the first page to the last."""
+        pages = []
+        cursor = None
+        while True:
+            page = queryset.keyset_page(cursor, **kwargs)
+            pages.append(page.items)
+            if page.next_cursor is None:
+                return pages
+            cursor = page.next_cursor
+
+    def test_pages_by_primary_key(self, patients: list[Patient]) -> None:
+        """Pages follow each other by primary key when no ordering is given."""
+        pages = self.pages(Patient.objects.all(), page_size=3)
+
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert [patient.dbid for page in pages for patient in page] == [
+            patient.dbid for patient in patients
+        ]
+
+    def test_pages_with_descending_ordering_and_ties(self, patients: list[Patient]) -> None:
+        """Ties on the ordering columns are broken by the primary key."""
+        Patient.objects.filter(dbid__in=[p.dbid for p in patients[:4]]).update(last_name="Same")
+
+        pages = self.pages(Patient.objects.all(), page_size=2, ordering=("-last_name", "-created"))
+        expected = Patient.objects.order_by("-last_name", "-created", "-pk")
+
+        assert [patient.dbid for page in pages for patient in page] == [
+            patient.dbid for patient in expected
+        ]
+
+    def test_pages_values_rows(self, patients: list[Patient]) -> None:
+        """values() rows including the ordering columns can be paginated."""
+        pages = self.pages(Patient.objects.values("dbid", "created"), page_size=4)
+
+        assert [row["dbid"] for page in pages for row in page] == [
+            patient.dbid for patient in patients
+        ]
+
+    def test_uses_queryset_ordering(self, patients: list[Patient]) -> None:
+        """The queryset's own ordering is used by default."""
+        page = Patient.objects.order_by("-dbid").keyset_page(page_size=2)
+
+        assert [patient.dbid for patient in page.items] == [
+            patients[-1].dbid,
+            patients[-2].dbid,
+        ]
+
+    def test_last_page_has_no_cursor(self, patients: list[Patient]) -> None:
+        """A page holding the remaining results has no next cursor."""
+        page = Patient.objects.keyset_page(page_size=7)
+
+        assert len(page.items) == 7
+        assert page.next_cursor is None
+
+    @pytest.mark.parametrize("cursor", ["not a cursor", "bm90IGpzb24"])
+    def test_rejects_malformed_cursor(self, cursor: str) -> None:
+        """Malformed cursors raise InvalidCursor."""
+        with pytest.raises(InvalidCursor):
+            Patient.objects.keyset_page(cursor)
+
+    def test_rejects_cursor_for_other_ordering(self, patients: list[Patient]) -> None:
+        """A cursor can only be used with the ordering it was issued for."""
+        cursor = Patient.objects.keyset_page(page_size=2).next_cursor
+
+        with pytest.raises(InvalidCursor):
+            Patient.objects.keyset_page(cursor, ordering=("-dbid",))
+
+    def test_rejects_invalid_page_size(self) -> None:
+        """page_size must be positive."""
+        with pytest.raises(ValueError, match="page_size"):
+            Patient.objects.keyset_page(page_size=0)
@@ -1,7 +1,10 @@
+import json
+from base64 import b64decode
+
 import pytest
 from pydantic import ValidationError
 
-from canvas_sdk.effects.simple_api import Broadcast
+from canvas_sdk.effects.simple_api import Broadcast, PaginatedJSONResponse
 
 
 @pytest.mark.parametrize(
@@ -30,3 +33,16 @@ def test_broadcast_effect_invalid_channel(channel: str) -> None:
     """Test the BroadcastEffect with an invalid channel."""
     with pytest.raises(ValidationError, match="Invalid channel"):
         Broadcast(channel=channel, message={"key": "value"}).apply()
+
+
+@pytest.mark.parametrize("next_cursor", ["abc123", None])
+def test_paginated_json_response(next_cursor: str | None) -> None:
+    """Test that PaginatedJSONResponse emits the results and the next cursor."""
+    effect = PaginatedJSONResponse([{"id": 1}, {"id": 2}], next_cursor).apply()
+    payload = json.loads(effect.payload)
+
+    assert payload["headers"] == {"Content-Type": "application/json"}
+    assert json.loads(b64decode(payload["body"])) == {
+        "results": [{"id": 1}, {"id": 2}],
+        "next": next_cursor,
+    }
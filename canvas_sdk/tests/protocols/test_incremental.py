@@ -0,0 +1,162 @@
+import uuid
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+from canvas_sdk.effects import Effect
+from canvas_sdk.events import EventType
+from canvas_sdk.protocols import IncrementalClinicalQualityMeasure, criterion
+from canvas_sdk.protocols.incremental import EVENT_FACT_KINDS
+from canvas_sdk.protocols.population import PatientFacts
+
+calls: list[str] = []
+
+
+class CountingMeasure(IncrementalClinicalQualityMeasure):
+    """A test measure recording which criteria are evaluated."""
+
+    RESPONDS_TO = [
+        EventType.Name(event_type)
+        for event_type, kind in EVENT_FACT_KINDS.items()
+        if kind in ("conditions", "lab_reports")
+    ]
+
+    @criterion("conditions")
+    def in_denominator(self, facts: PatientFacts) -> bool:
+        """A criterion depending on conditions."""
+        calls.append("in_denominator")
+        return True
+
+    @criterion("lab_reports")
+    def last_result(self, facts: PatientFacts) -> int:
+        """A criterion depending on lab reports."""
+        calls.append("last_result")
+        return calls.count("last_result")
+
+    @criterion()
+    def always(self, facts: PatientFacts) -> str:
+        """A criterion depending on no records."""
+        calls.append("always")
+        return "always"
+
+    def compute(self) -> list[Effect]:
+        """Not used."""
+        return []
+
+
+@pytest.fixture
+def patient_id(monkeypatch: pytest.MonkeyPatch) -> str:
+    """Isolate each test's cache entries and skip database access."""
+    calls.clear()
+    monkeypatch.setattr(
+        "canvas_sdk.protocols.incremental.load_patient_facts",
+        lambda measure, patient_ids, kinds: {p: PatientFacts(p) for p in patient_ids},
+    )
+    return uuid.uuid4().hex
+
+
+def evaluate(
+    event_type: Any, patient_id: str, target_patient_id: str | None = None
+) -> dict[str, Any]:
+    """Evaluate the test measure's criteria for an event of the given type.
+
+    The event is about the given patient, unless another target patient is given.
+    """
+    measure = CountingMeasure(event=MagicMock(type=event_type))
+    measure._patient_id = target_patient_id or patient_id
+    return measure.evaluate_criteria(patient_id)
+
+
+def test_criteria_are_discovered() -> None:
+    """Decorated methods are reported with the kinds of records they depend on."""
+    assert CountingMeasure.criteria() == {
+        "always": (),
+        "in_denominator": ("conditions",),
+        "last_result": ("lab_reports",),
+    }
+
+
+def test_first_evaluation_computes_every_criterion(patient_id: str) -> None:
+    """Without cached values, every criterion is computed."""
+    values = evaluate(EventType.PATIENT_UPDATED, patient_id)
+
+    assert sorted(calls) == ["always", "in_denominator", "last_result"]
+    assert values["in_denominator"] is True
+
+
+def test_event_only_recomputes_affected_criteria(patient_id: str) -> None:
+    """A lab report event only recomputes criteria that depend on lab reports."""
+    evaluate(EventType.PATIENT_UPDATED, patient_id)
+    calls.clear()
+
+    values = evaluate(EventType.LAB_REPORT_UPDATED, patient_id)
+
+    assert sorted(calls) == ["always", "last_result"]
+    assert values == {"always": "always", "in_denominator": True, "last_result": 1}
+
+
+def test_unrelated_event_reuses_cached_criteria(patient_id: str) -> None:
+    """Events that touch none of the measure's records reuse cached values."""
+    first = evaluate(EventType.PATIENT_UPDATED, patient_id)
+    calls.clear()
+
+    assert evaluate(EventType.LAB_ORDER_CREATED, patient_id) == first
+    assert calls == ["always"]
+
+
+def test_invalidate_criteria(patient_id: str) -> None:
+    """Invalidated criteria are all recomputed on the next evaluation."""
+    evaluate(EventType.PATIENT_UPDATED, patient_id)
+    CountingMeasure(event=MagicMock()).invalidate_criteria(patient_id)
+    calls.clear()
+
+    evaluate(EventType.PATIENT_UPDATED, patient_id)
+
+    assert sorted(calls) == ["always", "in_denominator", "last_result"]
+
+
+def test_criterion_rejects_unknown_kinds() -> None:
+    """Criteria must depend on kinds of records the measure can load."""
+    with pytest.raises(ValueError, match="Unknown fact kind"):
+        criterion("vitals")
+
+
+def test_event_about_another_patient_reuses_cached_criteria(patient_id: str) -> None:
+    """An event only invalidates the criteria of the patient it is about."""
+    first = evaluate(EventType.PATIENT_UPDATED, patient_id)
+    calls.clear()
+
+    assert evaluate(EventType.LAB_REPORT_UPDATED, patient_id, uuid.uuid4().hex) == first
+    assert calls == ["always"]
+
+
+def test_only_recomputed_criteria_are_written(patient_id: str) -> None:
+    """Criteria are cached separately, so an evaluation doesn't overwrite the others."""
+    evaluate(EventType.PATIENT_UPDATED, patient_id)
+    measure = CountingMeasure(event=MagicMock(type=EventType.LAB_REPORT_UPDATED))
+    measure._patient_id = patient_id
+    cache = measure._criteria_cache()
+    # Another event recomputes in_denominator meanwhile.
+    cache.set(measure._criteria_cache_key(patient_id, "in_denominator"), False)
+
+    with patch.object(cache, "set_many", wraps=cache.set_many) as set_many:
+        values = measure.evaluate_criteria()
+
+    [written] = [list(call.args[0]) for call in set_many.call_args_list]
+    assert written == [measure._criteria_cache_key(patient_id, "last_result")]
+    assert values["in_denominator"] is False
+    assert cache.get(measure._criteria_cache_key(patient_id, "in_denominator")) is False
+
+
+def test_measure_must_respond_to_the_events_of_its_criteria() -> None:
+    """Measures must subscribe to the events invalidating their criteria."""
+    with pytest.raises(ImproperlyConfigured, match="LAB_REPORT_CREATED, LAB_REPORT_UPDATED"):
+
+        class UnsubscribedMeasure(IncrementalClinicalQualityMeasure):
+            RESPONDS_TO = EventType.Name(EventType.PATIENT_UPDATED)
+
+            @criterion("lab_reports")
+            def last_result(self, facts: PatientFacts) -> int:
+                return 1
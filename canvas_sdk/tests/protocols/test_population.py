@@ -0,0 +1,145 @@
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+
+from canvas_sdk.effects import Effect
+from canvas_sdk.protocols import ClinicalQualityMeasure
+from canvas_sdk.protocols.population import PatientFacts, evaluate_population, fact_queryset
+from canvas_sdk.test_utils.factories import (
+    CanvasUserFactory,
+    LabValueCodingFactory,
+    MedicationFactory,
+    PatientFactory,
+    ProtocolOverrideFactory,
+)
+from canvas_sdk.v1.data.medication import MedicationCoding
+from canvas_sdk.value_set.value_set import ValueSet
+
+
+class StatinMedication(ValueSet):
+    """A test medication value set."""
+
+    RXNORM = {"617312"}
+
+
+class LdlLaboratoryTest(ValueSet):
+    """A test laboratory value set."""
+
+    LOINC = {"13457-7"}
+
+
+class StatinMeasure(ClinicalQualityMeasure):
+    """A test measure counting matching records per patient."""
+
+    medication_value_set = StatinMedication
+    lab_value_set = LdlLaboratoryTest
+
+    def compute(self) -> list[Effect]:
+        """Not used in population mode."""
+        return []
+
+    def compute_for_patient(self, patient_id: str, facts: PatientFacts) -> Any:
+        """Summarize the loaded facts."""
+        return (
+            len(facts.conditions),
+            len(facts.medications),
+            len(facts.lab_reports),
+            len(facts.protocol_overrides),
+        )
+
+
+@pytest.mark.django_db
+def test_evaluate_population_loads_facts_by_value_set() -> None:
+    """Records are loaded per patient and narrowed by the measure's value sets."""
+    patient = PatientFactory.create()
+    other_patient = PatientFactory.create()
+
+    statin = MedicationFactory.create(patient=patient)
+    MedicationCoding.objects.create(
+        medication=statin, system="http://www.nlm.nih.gov/research/umls/rxnorm", code="617312"
+    )
+    unrelated = MedicationFactory.create(patient=patient)
+    MedicationCoding.objects.create(
+        medication=unrelated, system="http://www.nlm.nih.gov/research/umls/rxnorm", code="1"
+    )
+    LabValueCodingFactory.create(
+        value__report__patient=other_patient,
+        value__report__committer=CanvasUserFactory.create(),
+        system="http://loinc.org",
+        code="13457-7",
+    )
+    LabValueCodingFactory.create(
+        value__report__patient=other_patient, system="http://loinc.org", code="13457-7"
+    )
+    ProtocolOverrideFactory.create(patient=other_patient, protocol_key="StatinMeasure")
+    ProtocolOverrideFactory.create(patient=other_patient, protocol_key="OtherMeasure")
+
+    results = StatinMeasure(event=MagicMock()).evaluate_population([patient.id, other_patient.id])
+
+    assert results == {patient.id: (0, 1, 0, 0), other_patient.id: (0, 0, 1, 1)}
+
+
+@pytest.mark.django_db
+def test_fact_queryset_filters_by_patient() -> None:
+    """The records are narrowed to the given patients, when there are any."""
+    patient = PatientFactory.create()
+    other_patient = PatientFactory.create()
+    ProtocolOverrideFactory.create(patient=patient, protocol_key="StatinMeasure")
+    ProtocolOverrideFactory.create(patient=other_patient, protocol_key="StatinMeasure")
+    measure = StatinMeasure(event=MagicMock())
+
+    for_patient = fact_queryset(measure, "protocol_overrides", [patient.id])
+    for_everyone = fact_queryset(measure, "protocol_overrides")
+
+    assert for_patient is not None and for_everyone is not None
+    assert [override.patient.id for override in for_patient] == [patient.id]
+    assert for_everyone.count() == 2
+
+
+@pytest.mark.django_db
+def test_evaluate_population_queries_per_chunk(django_assert_num_queries: Any) -> None:
+    """Each chunk issues one query per kind of record, independent of its size."""
+    patient_ids = [PatientFactory.create().id for _ in range(4)]
+    progress = MagicMock()
+
+    with django_assert_num_queries(6):
+        results = StatinMeasure(event=MagicMock()).evaluate_population(
+            patient_ids, chunk_size=2, on_progress=progress
+        )
+
+    assert set(results) == set(patient_ids)
+    assert [c.args for c in progress.call_args_list] == [(2, 4), (4, 4)]
+
+
+def test_evaluate_population_in_parallel(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Chunks are evaluated on worker threads and their results combined."""
+    monkeypatch.setattr(
+        "canvas_sdk.protocols.population.load_patient_facts",
+        lambda measure, patient_ids: {p: PatientFacts(p) for p in patient_ids},
+    )
+    monkeypatch.setattr("canvas_sdk.protocols.population.connection", MagicMock())
+    progress = MagicMock()
+
+    results = evaluate_population(
+        StatinMeasure(event=MagicMock()),
+        [str(i) for i in range(10)],
+        chunk_size=3,
+        max_workers=4,
+        on_progress=progress,
+    )
+
+    assert results == {str(i): (0, 0, 0, 0) for i in range(10)}
+    assert progress.call_count == 4
+    assert progress.call_args.args == (10, 10)
+
+
+def test_compute_for_patient_is_required_for_population_mode() -> None:
+    """Measures that don't implement compute_for_patient cannot be evaluated in bulk."""
+
+    class SinglePatientMeasure(ClinicalQualityMeasure):
+        def compute(self) -> list[Effect]:
+            return []
+
+    with pytest.raises(NotImplementedError):
+        SinglePatientMeasure(event=MagicMock()).evaluate_population(["patient"])
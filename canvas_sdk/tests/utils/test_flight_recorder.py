@@ -0,0 +1,115 @@
+"""Tests for the slow-event flight recorder in canvas_sdk.utils.flight_recorder."""
+
+import json
+from collections.abc import Generator
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.db import connection
+
+from canvas_sdk.utils import flight_recorder
+from canvas_sdk.utils.flight_recorder import EventRecord, FlightRecorder, record_event
+from canvas_sdk.utils.http import Http
+from canvas_sdk.utils.metrics import StatsDClientProxy, measure
+from canvas_sdk.utils.query_budget import inspect_queries
+
+
+@pytest.fixture
+def recorder() -> Generator[FlightRecorder, None, None]:
+    """Record every event for a test."""
+    previous = flight_recorder.recorder
+    flight_recorder.configure(size=3, min_duration_ms=0, dump_threshold_ms=0)
+    yield flight_recorder.recorder
+    flight_recorder.recorder = previous
+
+
+def _record(event: str, duration_ms: float) -> EventRecord:
+    return EventRecord(event, duration_ms=duration_ms)
+
+
+def test_nothing_recorded_when_disabled() -> None:
+    """With the recorder off, no record is made."""
+    with record_event("PATIENT_CREATED") as record:
+        assert record is None
+        assert flight_recorder.current_record() is None
+
+
+def test_keeps_recent_slow_events_slowest_first() -> None:
+    """Only slow events are kept, up to the size of the buffer, and listed slowest first."""
+    recorder = FlightRecorder(size=3, min_duration_ms=100)
+
+    for event, duration_ms in [("a", 500), ("b", 50), ("c", 200), ("d", 300), ("e", 150)]:
+        recorder.add(_record(event, duration_ms))
+
+    assert [record["event"] for record in recorder.records()] == ["d", "c", "e"]
+
+
+@patch("canvas_sdk.utils.flight_recorder.log")
+def test_slow_handlers_are_dumped_right_away(mock_log: MagicMock) -> None:
+    """An event with a handler over the dump threshold is logged when it ends."""
+    recorder = FlightRecorder(size=3, dump_threshold_ms=1000)
+    record = _record("PATIENT_CREATED", 1500)
+    record.add_handler("handler", "my_plugin", 1200, "success", 3, 10)
+
+    recorder.add(record)
+
+    mock_log.warning.assert_called_once()
+    message = mock_log.warning.call_args.args[0]
+    assert message.startswith("Slow event PATIENT_CREATED: a handler took more than 1000ms: ")
+    assert json.loads(message.split("1000ms: ")[1])["handlers"][0]["plugin"] == "my_plugin"
+
+
+@patch("canvas_sdk.utils.flight_recorder.log")
+def test_dump(mock_log: MagicMock) -> None:
+    """A dump logs every record kept."""
+    recorder = FlightRecorder(size=3, min_duration_ms=0)
+    recorder.add(_record("a", 10))
+    recorder.add(_record("b", 20))
+
+    recorder.dump()
+
+    messages = [call.args[0] for call in mock_log.info.call_args_list]
+    assert messages[0] == "Flight recorder: 2 slow events recorded"
+    assert [json.loads(m.split(": ", 1)[1])["event"] for m in messages[1:]] == ["b", "a"]
+
+
+@pytest.mark.django_db
+@patch("requests.Session.get")
+def test_records_measurements_of_an_event(mock_get: MagicMock, recorder: FlightRecorder) -> None:
+    """Handler measurements, query shapes and HTTP calls end up on the event's record."""
+    mock_get.return_value.status_code = 200
+    client = MagicMock(spec=StatsDClientProxy)
+
+    with record_event("PATIENT_CREATED", target="patient-1"):
+        with (
+            measure(
+                "handler", extra_tags={"plugin": "my_plugin"}, track_queries=True, client=client
+            ),
+            inspect_queries("handler"),
+            connection.cursor() as cursor,
+        ):
+            for i in range(3):
+                cursor.execute("SELECT %s", [i])
+        Http("https://example.com").get("/path?patient=abc")
+
+    [record] = recorder.records()
+    assert record["event"] == "PATIENT_CREATED"
+    assert record["target"] == "patient-1"
+    assert record["duration_ms"] > 0
+
+    [handler] = record["handlers"]
+    assert handler["plugin"] == "my_plugin"
+    assert handler["name"] == "handler"
+    assert handler["status"] == "success"
+    assert handler["query_count"] == 3
+
+    assert record["query_shapes"] == [{"shape": "SELECT %s", "count": 3}]
+
+    [call] = record["http_calls"]
+    assert call["method"] == "GET"
+    assert call["url"] == "https://example.com/path"
+    assert call["status_code"] == 200
+
+    [served] = recorder.records(include_target=False)
+    assert "target" not in served
+    assert served["event"] == "PATIENT_CREATED"
@@ -1,11 +1,27 @@
 """Tests for the measure() context manager in canvas_sdk.utils.metrics."""
 
 import os
-from unittest.mock import MagicMock, patch
+import threading
+import tracemalloc
+from collections.abc import Generator
+from datetime import timedelta
+from unittest.mock import MagicMock, call, patch
 
 import pytest
-
-from canvas_sdk.utils.metrics import PipelineProxy, StatsDClientProxy, measure
+from django.db import connection
+from django.test import override_settings
+
+from canvas_sdk.utils.metrics import (
+    MAX_QUERY_SAMPLES,
+    AggregatingPipelineProxy,
+    AggregatingStatsDClientProxy,
+    PipelineProxy,
+    QueryCounter,
+    StatsDClientProxy,
+    current_process,
+    measure,
+    tags_to_line_protocol,
+)
 
 
 def _make_client() -> tuple[MagicMock, MagicMock]:
@@ -89,53 +105,132 @@ def test_duration_arithmetic(mock_time: MagicMock) -> None:
 # ---------------------------------------------------------------------------
 
 
-@patch("canvas_sdk.utils.metrics.connection")
-@patch("canvas_sdk.utils.metrics.time")
-def test_track_queries_captures_metrics(mock_time: MagicMock, mock_conn: MagicMock) -> None:
+def _run_queries(count: int) -> None:
+    """Run `count` queries on the default database."""
+    with connection.cursor() as cursor:
+        for i in range(count):
+            cursor.execute("SELECT %s", [i])
+
+
+@pytest.mark.django_db
+def test_track_queries_captures_metrics() -> None:
     """track_queries should record query count and total duration."""
-    mock_time.perf_counter_ns.side_effect = [0, 0]
-    mock_conn.queries = [{"time": "0.010"}, {"time": "0.025"}]
     client, pipeline = _make_client()
 
     with measure("block", track_queries=True, client=client):
-        pass
-
-    # Should enable debug cursor on entry and disable on exit
-    assert mock_conn.force_debug_cursor is False  # final state after cleanup
-    mock_conn.queries_log.clear.assert_called_once()
+        _run_queries(2)
 
     expected_tags = {"name": "block", "status": "success"}
     pipeline.timing.assert_any_call("plugins.query_count", delta=2, tags=expected_tags)
-    pipeline.timing.assert_any_call("plugins.query_duration_ms", delta=35.0, tags=expected_tags)
+
+    duration_call = [
+        c for c in pipeline.timing.call_args_list if c.args[0] == "plugins.query_duration_ms"
+    ]
+    assert len(duration_call) == 1
+    assert duration_call[0].kwargs["delta"] > 0
 
 
-@patch("canvas_sdk.utils.metrics.connection")
-@patch("canvas_sdk.utils.metrics.time")
-def test_track_queries_duration_arithmetic(mock_time: MagicMock, mock_conn: MagicMock) -> None:
-    """Query durations in seconds should be summed and converted to ms."""
-    mock_time.perf_counter_ns.side_effect = [0, 0]
-    mock_conn.queries = [{"time": "0.001"}, {"time": "0.002"}, {"time": "0.0035"}]
+@pytest.mark.django_db
+def test_track_queries_does_not_use_debug_cursor() -> None:
+    """Queries should be counted without Django logging them, and the wrapper removed after."""
     client, pipeline = _make_client()
+    connection.queries_log.clear()
 
     with measure("block", track_queries=True, client=client):
-        pass
+        assert connection.force_debug_cursor is False
+        _run_queries(3)
+
+    assert len(connection.queries_log) == 0
+    assert connection.execute_wrappers == []
 
-    duration_call = [
-        c for c in pipeline.timing.call_args_list if c.args[0] == "plugins.query_duration_ms"
-    ]
-    assert len(duration_call) == 1
-    assert duration_call[0].kwargs["delta"] == pytest.approx(6.5)
+
+def test_query_counter_duration_arithmetic() -> None:
+    """Query durations in nanoseconds should be summed."""
+    counter = QueryCounter()
+    execute = MagicMock()
+
+    with patch(
+        "canvas_sdk.utils.metrics.time.perf_counter_ns",
+        side_effect=[0, 1_000_000, 0, 2_000_000, 0, 3_500_000],
+    ):
+        for _ in range(3):
+            counter(execute, "SELECT 1", None, False, {})
+
+    assert counter.count == 3
+    assert counter.duration_ns == 6_500_000
+    assert counter.samples == []
+
+
+@patch("canvas_sdk.utils.metrics.random.random", side_effect=[0.1, 0.9, 0.1])
+def test_query_counter_samples_sql(mock_random: MagicMock) -> None:
+    """Only the sampled queries should have their SQL kept, up to MAX_QUERY_SAMPLES."""
+    counter = QueryCounter(sample_rate=0.5)
+
+    for sql in ("SELECT 1", "SELECT 2", "SELECT 3"):
+        counter(MagicMock(), sql, None, False, {})
+
+    assert [sql for sql, _ in counter.samples] == ["SELECT 1", "SELECT 3"]
+
+    counter.samples = [("SELECT 0", 0.0)] * MAX_QUERY_SAMPLES
+    counter(MagicMock(), "SELECT 4", None, False, {})
+    assert len(counter.samples) == MAX_QUERY_SAMPLES
+    assert mock_random.call_count == 3
+
+
+@pytest.mark.django_db
+@patch("canvas_sdk.utils.metrics.log")
+def test_track_queries_logs_sampled_sql(mock_log: MagicMock) -> None:
+    """Sampled queries should be logged with the measure name, without their parameters."""
+    client, pipeline = _make_client()
+
+    with measure("block", track_queries=True, query_sample_rate=1.0, client=client):
+        _run_queries(1)
+
+    mock_log.info.assert_called_once()
+    message = mock_log.info.call_args.args[0]
+    assert message.startswith("Sampled query while running block")
+    assert message.endswith("SELECT %s")
+
+
+@pytest.mark.django_db
+@patch("canvas_sdk.utils.metrics.log")
+@patch.dict(os.environ, {"PLUGIN_QUERY_SAMPLE_RATE": "1"})
+def test_query_sample_rate_respects_env_var(mock_log: MagicMock) -> None:
+    """The sample rate should be configurable via env var."""
+    client, pipeline = _make_client()
+
+    with measure("block", track_queries=True, client=client):
+        _run_queries(2)
+
+    assert mock_log.info.call_count == 2
+
+
+@pytest.mark.django_db
+@patch("canvas_sdk.utils.metrics.log")
+def test_track_queries_does_not_sample_by_default(mock_log: MagicMock) -> None:
+    """No SQL should be logged unless sampling is enabled."""
+    client, pipeline = _make_client()
+
+    with measure("block", track_queries=True, client=client):
+        _run_queries(2)
+
+    mock_log.info.assert_not_called()
 
 
 @patch("canvas_sdk.utils.metrics.time")
 def test_track_queries_false_does_not_touch_connection(mock_time: MagicMock) -> None:
-    """When track_queries is False, connection should not be accessed."""
+    """When track_queries is False, connections should not be accessed."""
     mock_time.perf_counter_ns.side_effect = [0, 0]
     client, pipeline = _make_client()
 
-    with patch("canvas_sdk.utils.metrics.connection"), measure("block", client=client):
+    with (
+        patch("canvas_sdk.utils.metrics.connections") as mock_connections,
+        measure("block", client=client),
+    ):
         pass
 
+    mock_connections.all.assert_not_called()
+
     # No query-related timing calls
     metric_names = [c.args[0] for c in pipeline.timing.call_args_list]
     assert "plugins.query_count" not in metric_names
@@ -192,10 +287,10 @@ def test_track_plugins_usage_non_plugin_caller(mock_time: MagicMock) -> None:
 # ---------------------------------------------------------------------------
 
 
-@patch("canvas_sdk.utils.metrics.psutil")
+@patch("canvas_sdk.utils.metrics.current_process")
 @patch("canvas_sdk.utils.metrics.time")
 def test_track_memory_usage_captures_rss_delta(
-    mock_time: MagicMock, mock_psutil: MagicMock
+    mock_time: MagicMock, mock_current_process: MagicMock
 ) -> None:
     """track_memory_usage should record the RSS delta in bytes."""
     mock_time.perf_counter_ns.side_effect = [0, 0]
@@ -205,7 +300,7 @@ def test_track_memory_usage_captures_rss_delta(
         MagicMock(rss=100 * mb),
         MagicMock(rss=101 * mb),
     ]
-    mock_psutil.Process.return_value = mock_process
+    mock_current_process.return_value = mock_process
     client, pipeline = _make_client()
 
     with measure("block", track_memory_usage=True, client=client):
@@ -216,10 +311,10 @@ def test_track_memory_usage_captures_rss_delta(
 
 
 @patch("canvas_sdk.utils.metrics.log")
-@patch("canvas_sdk.utils.metrics.psutil")
+@patch("canvas_sdk.utils.metrics.current_process")
 @patch("canvas_sdk.utils.metrics.time")
 def test_memory_excessive_growth_logs_warning_with_name(
-    mock_time: MagicMock, mock_psutil: MagicMock, mock_log: MagicMock
+    mock_time: MagicMock, mock_current_process: MagicMock, mock_log: MagicMock
 ) -> None:
     """RSS growth above threshold should trigger a warning using the measure name."""
     mock_time.perf_counter_ns.side_effect = [0, 0]
@@ -229,7 +324,7 @@ def test_memory_excessive_growth_logs_warning_with_name(
         MagicMock(rss=100 * mb),
         MagicMock(rss=110 * mb),  # 10 MB growth, default threshold is 5 MB
     ]
-    mock_psutil.Process.return_value = mock_process
+    mock_current_process.return_value = mock_process
     client, pipeline = _make_client()
 
     with measure("my_handler.compute", track_memory_usage=True, client=client):
@@ -242,10 +337,10 @@ def test_memory_excessive_growth_logs_warning_with_name(
 
 
 @patch("canvas_sdk.utils.metrics.log")
-@patch("canvas_sdk.utils.metrics.psutil")
+@patch("canvas_sdk.utils.metrics.current_process")
 @patch("canvas_sdk.utils.metrics.time")
 def test_memory_excessive_growth_logs_plugin_name_from_extra_tags(
-    mock_time: MagicMock, mock_psutil: MagicMock, mock_log: MagicMock
+    mock_time: MagicMock, mock_current_process: MagicMock, mock_log: MagicMock
 ) -> None:
     """RSS growth warning should include both plugin name and measure name."""
     mock_time.perf_counter_ns.side_effect = [0, 0]
@@ -255,7 +350,7 @@ def test_memory_excessive_growth_logs_plugin_name_from_extra_tags(
         MagicMock(rss=100 * mb),
         MagicMock(rss=110 * mb),  # 10 MB growth, default threshold is 5 MB
     ]
-    mock_psutil.Process.return_value = mock_process
+    mock_current_process.return_value = mock_process
     client, pipeline = _make_client()
 
     with measure(
@@ -274,10 +369,10 @@ def test_memory_excessive_growth_logs_plugin_name_from_extra_tags(
 
 
 @patch("canvas_sdk.utils.metrics.log")
-@patch("canvas_sdk.utils.metrics.psutil")
+@patch("canvas_sdk.utils.metrics.current_process")
 @patch("canvas_sdk.utils.metrics.time")
 def test_memory_below_threshold_no_warning(
-    mock_time: MagicMock, mock_psutil: MagicMock, mock_log: MagicMock
+    mock_time: MagicMock, mock_current_process: MagicMock, mock_log: MagicMock
 ) -> None:
     """RSS growth below threshold should not trigger a warning."""
     mock_time.perf_counter_ns.side_effect = [0, 0]
@@ -287,7 +382,7 @@ def test_memory_below_threshold_no_warning(
         MagicMock(rss=100 * mb),
         MagicMock(rss=101 * mb),  # 1 MB growth, below 5 MB threshold
     ]
-    mock_psutil.Process.return_value = mock_process
+    mock_current_process.return_value = mock_process
     client, pipeline = _make_client()
 
     with measure("block", track_memory_usage=True, client=client):
@@ -297,11 +392,11 @@ def test_memory_below_threshold_no_warning(
 
 
 @patch("canvas_sdk.utils.metrics.log")
-@patch("canvas_sdk.utils.metrics.psutil")
+@patch("canvas_sdk.utils.metrics.current_process")
 @patch("canvas_sdk.utils.metrics.time")
 @patch.dict(os.environ, {"PLUGIN_MEMORY_GROWTH_THRESHOLD_MB": "2"})
 def test_memory_threshold_respects_env_var(
-    mock_time: MagicMock, mock_psutil: MagicMock, mock_log: MagicMock
+    mock_time: MagicMock, mock_current_process: MagicMock, mock_log: MagicMock
 ) -> None:
     """The warning threshold should be configurable via env var."""
     mock_time.perf_counter_ns.side_effect = [0, 0]
@@ -311,10 +406,277 @@ def test_memory_threshold_respects_env_var(
         MagicMock(rss=100 * mb),
         MagicMock(rss=103 * mb),  # 3 MB growth, above 2 MB threshold
     ]
-    mock_psutil.Process.return_value = mock_process
+    mock_current_process.return_value = mock_process
     client, pipeline = _make_client()
 
     with measure("block", track_memory_usage=True, client=client):
         pass
 
     mock_log.warning.assert_called_once()
+
+
+def test_current_process_is_cached() -> None:
+    """The psutil Process should be created once per process."""
+    process = current_process()
+
+    assert current_process() is process
+    assert process.pid == os.getpid()
+
+    # After a fork, the child gets a Process of its own.
+    with (
+        patch("canvas_sdk.utils.metrics.os.getpid", return_value=-1),
+        patch("canvas_sdk.utils.metrics.psutil.Process") as mock_process,
+    ):
+        assert current_process() is mock_process.return_value
+
+
+@patch("canvas_sdk.utils.metrics.current_process")
+@patch("canvas_sdk.utils.metrics.random.random", return_value=0.5)
+@patch("canvas_sdk.utils.metrics.time")
+def test_memory_sample_rate_skips_unsampled_blocks(
+    mock_time: MagicMock, mock_random: MagicMock, mock_current_process: MagicMock
+) -> None:
+    """Blocks outside the sample should not read the RSS or record it."""
+    mock_time.perf_counter_ns.side_effect = [0, 0]
+    client, pipeline = _make_client()
+
+    with measure("block", track_memory_usage=True, memory_sample_rate=0.25, client=client):
+        pass
+
+    mock_current_process.assert_not_called()
+    metric_names = [c.args[0] for c in pipeline.timing.call_args_list]
+    assert "plugins.rss_delta_in_bytes" not in metric_names
+
+
+@patch("canvas_sdk.utils.metrics.current_process")
+@patch("canvas_sdk.utils.metrics.random.random", return_value=0.1)
+@patch("canvas_sdk.utils.metrics.time")
+@patch.dict(os.environ, {"PLUGIN_MEMORY_SAMPLE_RATE": "0.25"})
+def test_memory_sample_rate_respects_env_var(
+    mock_time: MagicMock, mock_random: MagicMock, mock_current_process: MagicMock
+) -> None:
+    """The memory sample rate should be configurable via env var."""
+    mock_time.perf_counter_ns.side_effect = [0, 0]
+    mock_current_process.return_value.memory_info.return_value = MagicMock(rss=0)
+    client, pipeline = _make_client()
+
+    with measure("block", track_memory_usage=True, client=client):
+        pass
+
+    mock_random.assert_called_once()
+    metric_names = [c.args[0] for c in pipeline.timing.call_args_list]
+    assert "plugins.rss_delta_in_bytes" in metric_names
+
+
+# ---------------------------------------------------------------------------
+# tracemalloc deep mode
+# ---------------------------------------------------------------------------
+
+
+@patch("canvas_sdk.utils.metrics.log")
+@patch.dict(os.environ, {"PLUGIN_TRACEMALLOC_PLUGINS": "other_plugin, my_plugin"})
+def test_tracemalloc_reports_top_allocation_sites(mock_log: MagicMock) -> None:
+    """Plugins under investigation should have their top allocation sites logged."""
+    client, pipeline = _make_client()
+    assert not tracemalloc.is_tracing()
+
+    with measure(
+        "handler", track_memory_usage=True, extra_tags={"plugin": "my_plugin"}, client=client
+    ):
+        assert tracemalloc.is_tracing()
+        retained = [bytearray(1024) for _ in range(100)]
+
+    assert not tracemalloc.is_tracing()
+
+    message = mock_log.info.call_args.args[0]
+    assert message.startswith("Plugin tracemalloc:")
+    assert "my_plugin (handler)" in message
+    assert f"{__file__}:" in message
+
+    traced = [
+        c.kwargs["delta"]
+        for c in pipeline.timing.call_args_list
+        if c.args[0] == "plugins.traced_memory_delta_in_bytes"
+    ]
+    assert traced[0] >= 100 * 1024
+    del retained
+
+
+@patch.dict(os.environ, {"PLUGIN_TRACEMALLOC_PLUGINS": "my_plugin"})
+def test_tracemalloc_only_for_listed_plugins() -> None:
+    """Other plugins should not be traced."""
+    client, pipeline = _make_client()
+
+    with measure(
+        "handler", track_memory_usage=True, extra_tags={"plugin": "other_plugin"}, client=client
+    ):
+        assert not tracemalloc.is_tracing()
+
+
+@patch.dict(os.environ, {"PLUGIN_TRACEMALLOC_PLUGINS": "my_plugin"})
+def test_tracemalloc_left_running_if_started_elsewhere() -> None:
+    """Tracing started outside of measure() should not be stopped by it."""
+    client, pipeline = _make_client()
+    tracemalloc.start()
+    try:
+        with measure(
+            "handler", track_memory_usage=True, extra_tags={"plugin": "my_plugin"}, client=client
+        ):
+            pass
+
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+# ---------------------------------------------------------------------------
+# Tags and aggregation
+# ---------------------------------------------------------------------------
+
+
+def test_tags_to_line_protocol_escapes_and_caches() -> None:
+    """Tag strings should be escaped, and cached for tag sets seen before."""
+    tags = {"plugin": "my plugin", "handler": "a,b=c:d"}
+    expected = r"plugin=my\ plugin,handler=a\,b\=c__d"
+
+    assert tags_to_line_protocol(tags) == expected
+    with patch("canvas_sdk.utils.metrics._format_tags") as format_tags:
+        assert tags_to_line_protocol(dict(tags)) == expected
+    format_tags.assert_not_called()
+
+
+def test_tags_to_line_protocol_unhashable_values() -> None:
+    """Unhashable tag values should still be formatted."""
+    assert tags_to_line_protocol({"ids": ["a", "b"]}) == r"ids=['a'\,\ 'b']"
+
+
+@pytest.fixture
+def aggregator() -> Generator[AggregatingStatsDClientProxy, None, None]:
+    """An aggregating client with metrics enabled, whose flusher thread isn't started."""
+    with (
+        override_settings(
+            METRICS_ENABLED=True, METRICS_FLUSH_INTERVAL_SECONDS=60, METRICS_PERCENTILES=[]
+        ),
+        patch.object(AggregatingStatsDClientProxy, "_ensure_flusher"),
+    ):
+        yield AggregatingStatsDClientProxy()
+
+
+@patch("canvas_sdk.utils.metrics.Pipeline")
+def test_aggregator_combines_metrics_until_flushed(
+    mock_pipeline: MagicMock, aggregator: AggregatingStatsDClientProxy
+) -> None:
+    """Counters should be summed, gauges keep the last value and timings be sent together."""
+    tags = {"name": "block"}
+
+    for delta in (1.0, 3.0):
+        pipeline = aggregator.pipeline()
+        pipeline.incr("plugins.executions", tags=tags)
+        pipeline.timing("plugins.timings", delta, tags=tags)
+        pipeline.gauge("plugins.loaded", delta, tags=tags)
+        pipeline.send()
+
+    mock_pipeline.assert_not_called()
+
+    aggregator.flush()
+
+    statsd_pipeline = mock_pipeline.return_value
+    statsd_pipeline.incr.assert_called_once_with("plugins.executions,name=block", 2)
+    statsd_pipeline.gauge.assert_called_once_with("plugins.loaded,name=block", 3.0)
+    assert statsd_pipeline.timing.call_args_list == [
+        call("plugins.timings,name=block", 1.0),
+        call("plugins.timings,name=block", 3.0),
+    ]
+    statsd_pipeline.send.assert_called_once()
+
+    mock_pipeline.reset_mock()
+    aggregator.flush()
+    mock_pipeline.return_value.incr.assert_not_called()
+
+
+@patch("canvas_sdk.utils.metrics.Pipeline")
+def test_aggregator_keeps_tag_sets_apart(
+    mock_pipeline: MagicMock, aggregator: AggregatingStatsDClientProxy
+) -> None:
+    """Metrics with different tags should be aggregated separately."""
+    aggregator.incr("plugins.executions", tags={"name": "a"})
+    aggregator.incr("plugins.executions", tags={"name": "b"}, count=2)
+    aggregator.timing("plugins.timings", timedelta(milliseconds=5), tags={"name": "a"})
+    aggregator.flush()
+
+    statsd_pipeline = mock_pipeline.return_value
+    assert statsd_pipeline.incr.call_args_list == [
+        call("plugins.executions,name=a", 1),
+        call("plugins.executions,name=b", 2),
+    ]
+    statsd_pipeline.timing.assert_called_once_with("plugins.timings,name=a", 5.0)
+
+
+@patch("canvas_sdk.utils.metrics.Pipeline")
+def test_aggregator_computes_percentiles(
+    mock_pipeline: MagicMock, aggregator: AggregatingStatsDClientProxy
+) -> None:
+    """Configured percentiles of each timing should be sent as gauges."""
+    for delta in range(1, 101):
+        aggregator.timing("plugins.timings", float(delta), tags={"name": "block"})
+
+    with override_settings(METRICS_PERCENTILES=[50, 95, 100]):
+        aggregator.flush()
+
+    assert mock_pipeline.return_value.gauge.call_args_list == [
+        call("plugins.timings.p50,name=block", 50.0),
+        call("plugins.timings.p95,name=block", 95.0),
+        call("plugins.timings.p100,name=block", 100.0),
+    ]
+
+
+def test_aggregator_sends_right_away_without_interval() -> None:
+    """With no flush interval, metrics should be sent as they are recorded."""
+    aggregator = AggregatingStatsDClientProxy()
+    aggregator.client = MagicMock()
+
+    with override_settings(METRICS_ENABLED=True, METRICS_FLUSH_INTERVAL_SECONDS=0):
+        aggregator.incr("plugins.executions", tags={"name": "block"})
+        assert not isinstance(aggregator.pipeline(), AggregatingPipelineProxy)
+
+    aggregator.client.incr.assert_called_once_with("plugins.executions,name=block", 1, 1)
+
+
+def test_aggregator_sends_sampled_increments_right_away(
+    aggregator: AggregatingStatsDClientProxy,
+) -> None:
+    """Sampled increments can't be summed, so they should be sent as they are recorded."""
+    aggregator.client = MagicMock()
+
+    aggregator.incr("plugins.executions", tags={"name": "block"}, rate=0)
+
+    aggregator.client.incr.assert_called_once_with("plugins.executions,name=block", 1, 0)
+
+
+def test_aggregator_disabled_metrics() -> None:
+    """Nothing should be buffered when metrics are disabled."""
+    aggregator = AggregatingStatsDClientProxy()
+
+    with (
+        override_settings(METRICS_ENABLED=False),
+        patch.object(AggregatingStatsDClientProxy, "_ensure_flusher") as ensure_flusher,
+    ):
+        aggregator.incr("plugins.executions", tags={})
+        aggregator.timing("plugins.timings", 1.0, tags={})
+
+    ensure_flusher.assert_not_called()
+
+
+def test_aggregator_flushes_on_interval() -> None:
+    """A background thread should send the buffered metrics on the interval."""
+    aggregator = AggregatingStatsDClientProxy()
+    flushed = threading.Event()
+
+    with (
+        override_settings(METRICS_ENABLED=True, METRICS_FLUSH_INTERVAL_SECONDS=0.01),
+        patch.object(aggregator, "flush", side_effect=lambda: flushed.set()),
+        patch("canvas_sdk.utils.metrics.atexit"),
+    ):
+        aggregator.incr("plugins.executions", tags={})
+        assert flushed.wait(timeout=5)
+        aggregator._stopped.set()
@@ -0,0 +1,164 @@
+"""Tests for the OpenMetrics exposition in canvas_sdk.utils.openmetrics."""
+
+import json
+from collections.abc import Generator
+from datetime import timedelta
+from unittest.mock import patch
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+from django.test import override_settings
+
+from canvas_sdk.utils import openmetrics
+from canvas_sdk.utils.metrics import AggregatingStatsDClientProxy, StatsDClientProxy
+from canvas_sdk.utils.openmetrics import (
+    CONTENT_TYPE,
+    OpenMetricsRegistry,
+    start_openmetrics_server,
+)
+
+
+def test_counters_and_gauges() -> None:
+    """Counters are summed per label set, and gauges keep their last value."""
+    registry = OpenMetricsRegistry()
+    registry.inc("plugins.executions", {"status": "success", "name": "a"})
+    registry.inc("plugins.executions", {"name": "a", "status": "success"}, 2)
+    registry.inc("plugins.executions", {"name": "b", "status": "error"})
+    registry.set("plugins.loaded", {}, 4)
+    registry.set("plugins.loaded", {}, 5)
+
+    assert registry.render() == (
+        "# TYPE plugins_executions counter\n"
+        'plugins_executions_total{name="a",status="success"} 3\n'
+        'plugins_executions_total{name="b",status="error"} 1\n'
+        "# TYPE plugins_loaded gauge\n"
+        "plugins_loaded 5\n"
+        "# EOF\n"
+    )
+
+
+def test_histograms_use_configured_buckets() -> None:
+    """Timings are counted into cumulative buckets, with their count and sum."""
+    registry = OpenMetricsRegistry(buckets=[100, 10])
+    for value in (5.0, 10.0, 50.0, 500.0):
+        registry.observe("plugins.timings", {"name": "a"}, value)
+
+    assert registry.render() == (
+        "# TYPE plugins_timings histogram\n"
+        'plugins_timings_bucket{name="a",le="10.0"} 2\n'
+        'plugins_timings_bucket{name="a",le="100.0"} 3\n'
+        'plugins_timings_bucket{name="a",le="+Inf"} 4\n'
+        'plugins_timings_count{name="a"} 4\n'
+        'plugins_timings_sum{name="a"} 565.0\n'
+        "# EOF\n"
+    )
+
+
+def test_histograms_of_known_metrics_use_their_own_buckets() -> None:
+    """Query counts aren't durations, so they have buckets of their own."""
+    registry = OpenMetricsRegistry(buckets=[1000])
+    registry.observe("plugins.query_count", {}, 3)
+
+    assert 'plugins_query_count_bucket{le="5.0"} 1' in registry.render()
+
+
+def test_label_values_are_escaped() -> None:
+    """Backslashes, quotes and newlines in label values are escaped."""
+    registry = OpenMetricsRegistry()
+    registry.inc("plugins.n_plus_one", {"call_site": 'a"b\\c\nd'})
+
+    assert 'plugins_n_plus_one_total{call_site="a\\"b\\\\c\\nd"} 1' in registry.render()
+
+
+def test_collectors_are_called_on_render() -> None:
+    """Collected gauges are computed on every render, and failing collectors are skipped."""
+    registry = OpenMetricsRegistry()
+    depth = iter([1, 2])
+    registry.add_collector(lambda: [("plugin_runner.queue_depth", {}, next(depth))])
+    registry.add_collector(lambda: 1 / 0)  # type: ignore[arg-type,return-value]
+
+    assert "plugin_runner_queue_depth 1\n" in registry.render()
+    assert "plugin_runner_queue_depth 2\n" in registry.render()
+
+
+@pytest.fixture
+def registry() -> Generator[OpenMetricsRegistry, None, None]:
+    """An enabled registry in place of the shared one."""
+    registry = OpenMetricsRegistry()
+    registry.enabled = True
+    with patch("canvas_sdk.utils.metrics.openmetrics_registry", registry):
+        yield registry
+
+
+@pytest.mark.parametrize("flush_interval", [0, 60])
+def test_statsd_clients_record_metrics(registry: OpenMetricsRegistry, flush_interval: int) -> None:
+    """Metrics sent to StatsD are recorded once, even with StatsD disabled."""
+    with (
+        override_settings(METRICS_ENABLED=False, METRICS_FLUSH_INTERVAL_SECONDS=flush_interval),
+        patch.object(AggregatingStatsDClientProxy, "_ensure_flusher"),
+    ):
+        for client in (StatsDClientProxy(), AggregatingStatsDClientProxy()):
+            pipeline = client.pipeline()
+            pipeline.incr("plugins.executions", tags={"name": "a"})
+            pipeline.timing("plugins.timings", timedelta(milliseconds=20), tags={"name": "a"})
+            pipeline.gauge("plugins.loaded", 3, tags={})
+
+    rendered = registry.render()
+    assert 'plugins_executions_total{name="a"} 2' in rendered
+    assert 'plugins_timings_bucket{name="a",le="25.0"} 2' in rendered
+    assert "plugins_loaded 3" in rendered
+
+
+def test_nothing_recorded_when_disabled() -> None:
+    """Metrics aren't recorded unless the endpoint is enabled."""
+    registry = OpenMetricsRegistry()
+    with (
+        patch("canvas_sdk.utils.metrics.openmetrics_registry", registry),
+        override_settings(METRICS_ENABLED=False),
+    ):
+        StatsDClientProxy().incr("plugins.executions", tags={})
+
+    assert registry.render() == "# EOF\n"
+
+
+def test_server_serves_metrics() -> None:
+    """The endpoint serves the shared registry's metrics on /metrics."""
+    shared = OpenMetricsRegistry()
+    with (
+        patch.object(openmetrics, "registry", shared),
+        patch.object(openmetrics.OpenMetricsRequestHandler, "registry", shared),
+    ):
+        server = start_openmetrics_server(0, host="127.0.0.1", buckets=[1, 2])
+        try:
+            assert shared.enabled
+            assert shared.buckets == (1, 2)
+            shared.inc("plugins.executions", {})
+
+            url = f"http://127.0.0.1:{server.server_port}"
+            with urlopen(f"{url}/metrics") as response:
+                assert response.headers["Content-Type"] == CONTENT_TYPE
+                assert response.read().decode() == (
+                    "# TYPE plugins_executions counter\nplugins_executions_total 1\n# EOF\n"
+                )
+
+            with pytest.raises(HTTPError, match="404"):
+                urlopen(f"{url}/other")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def test_server_serves_json_routes() -> None:
+    """Paths added with add_json_route are served as JSON."""
+    with patch.dict(openmetrics.JSON_ROUTES, clear=True):
+        openmetrics.add_json_route("/debug/things", lambda: [{"name": "thing"}])
+        server = start_openmetrics_server(0, host="127.0.0.1")
+        try:
+            url = f"http://127.0.0.1:{server.server_port}/debug/things"
+            with urlopen(url) as response:
+                assert response.headers["Content-Type"] == "application/json"
+                assert json.loads(response.read()) == [{"name": "thing"}]
+        finally:
+            server.shutdown()
+            server.server_close()
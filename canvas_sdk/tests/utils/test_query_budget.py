@@ -0,0 +1,199 @@
+"""Tests for query budgets and N+1 detection in canvas_sdk.utils.query_budget."""
+
+from collections.abc import Callable
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.db import connection
+
+from canvas_sdk.utils.metrics import PipelineProxy, StatsDClientProxy
+from canvas_sdk.utils.query_budget import (
+    QueryBudget,
+    QueryBudgetExceeded,
+    QueryInspector,
+    fingerprint,
+    inspect_queries,
+)
+
+
+def _make_client() -> tuple[MagicMock, MagicMock]:
+    """Return a (mock_client, mock_pipeline) pair wired together."""
+    pipeline = MagicMock(spec=PipelineProxy)
+    client = MagicMock(spec=StatsDClientProxy)
+    client.pipeline.return_value = pipeline
+    return client, pipeline
+
+
+def _run_queries(count: int) -> None:
+    """Run `count` queries of the same shape."""
+    with connection.cursor() as cursor:
+        for i in range(count):
+            cursor.execute("SELECT %s", [i])
+
+
+def _plugin_function(body: Callable[[], None]) -> Callable[[], None]:
+    """Return a function that calls `body` from a module that looks like plugin code."""
+    scope: dict = {"__name__": "my_plugin.handlers.handler", "__is_plugin__": True, "body": body}
+    exec("def compute():\n    body()\n", scope)
+    return scope["compute"]
+
+
+# ---------------------------------------------------------------------------
+# Fingerprints
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.parametrize(
+    "first,second",
+    [
+        ('SELECT "id" FROM "t" WHERE "id" = %s', 'SELECT "id" FROM "t" WHERE "id" = %s'),
+        ('SELECT * FROM "t" WHERE "id" IN (%s)', 'SELECT * FROM "t" WHERE "id" IN (%s, %s, %s)'),
+        ('INSERT INTO "t" VALUES (%s, %s)', 'INSERT INTO "t" VALUES (%s, %s), (%s, %s)'),
+        ("SELECT * FROM t WHERE name = 'a' LIMIT 1", "SELECT * FROM t WHERE name = 'b' LIMIT 21"),
+    ],
+)
+def test_fingerprint_collapses_parameters(first: str, second: str) -> None:
+    """Statements differing only in their parameters share a fingerprint."""
+    assert fingerprint(first) == fingerprint(second)
+
+
+def test_fingerprint_keeps_identifiers() -> None:
+    """Statements on different tables or columns have different fingerprints."""
+    assert fingerprint('SELECT * FROM "v1_patient"') != fingerprint('SELECT * FROM "v1_note"')
+    assert fingerprint('SELECT "a1" FROM "t"') != fingerprint('SELECT "a2" FROM "t"')
+
+
+# ---------------------------------------------------------------------------
+# Counting and N+1 detection
+# ---------------------------------------------------------------------------
+
+
+@pytest.mark.django_db
+def test_counts_and_times_queries() -> None:
+    """The inspector counts queries and sums their database time."""
+    client, pipeline = _make_client()
+
+    with inspect_queries("block", client=client) as inspector:
+        _run_queries(3)
+
+    assert inspector.query_count == 3
+    assert inspector.db_time_ms > 0
+    assert inspector.shapes == {"SELECT %s": 3}
+    client.pipeline.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_wrapper_is_removed_on_exit() -> None:
+    """Queries after the block are not inspected."""
+    with inspect_queries("block") as inspector:
+        _run_queries(1)
+    _run_queries(1)
+
+    assert inspector.query_count == 1
+    assert inspector not in connection.execute_wrappers
+
+
+@pytest.mark.django_db
+@patch("canvas_sdk.utils.query_budget.log")
+def test_repeated_shapes_are_reported_with_call_site(mock_log: MagicMock) -> None:
+    """A shape repeated past the threshold is logged and counted with its plugin call site."""
+    client, pipeline = _make_client()
+    compute = _plugin_function(lambda: _run_queries(12))
+
+    with inspect_queries("handler", extra_tags={"plugin": "my_plugin"}, client=client):
+        compute()
+
+    mock_log.warning.assert_called_once()
+    message = mock_log.warning.call_args.args[0]
+    assert "Possible N+1 queries: 12 queries" in message
+    assert "my_plugin (handler)" in message
+    assert "my_plugin.handlers.handler:2 (compute)" in message
+
+    pipeline.incr.assert_called_once_with(
+        "plugins.n_plus_one",
+        tags={
+            "name": "handler",
+            "plugin": "my_plugin",
+            "call_site": "my_plugin.handlers.handler:2 (compute)",
+        },
+    )
+    pipeline.send.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_shapes_below_threshold_are_not_reported() -> None:
+    """Repeats below the threshold are not reported."""
+    inspector = QueryInspector(n_plus_one_threshold=5)
+
+    with connection.execute_wrapper(inspector):
+        _run_queries(4)
+
+    assert inspector.repeated == {}
+
+
+# ---------------------------------------------------------------------------
+# Budgets
+# ---------------------------------------------------------------------------
+
+
+def test_budget_from_manifest() -> None:
+    """A manifest's query_budget block becomes a QueryBudget."""
+    assert QueryBudget.from_manifest(None) is None
+    assert QueryBudget.from_manifest({"max_queries": 5}) == QueryBudget(max_queries=5)
+    assert QueryBudget.from_manifest({"max_db_time_ms": 100, "on_exceed": "fail"}) == QueryBudget(
+        max_db_time_ms=100, enforce=True
+    )
+
+
+@pytest.mark.django_db
+@patch("canvas_sdk.utils.query_budget.log")
+def test_budget_overrun_warns(mock_log: MagicMock) -> None:
+    """A budget that isn't enforced lets queries run, and reports the overrun."""
+    client, pipeline = _make_client()
+
+    with inspect_queries("handler", budget=QueryBudget(max_queries=2), client=client):
+        _run_queries(3)
+
+    mock_log.warning.assert_called_once()
+    message = mock_log.warning.call_args.args[0]
+    assert "Query budget exceeded while running handler: 3 queries" in message
+    pipeline.incr.assert_called_once_with(
+        "plugins.query_budget_exceeded", tags={"name": "handler", "limit": "queries"}
+    )
+
+
+@pytest.mark.django_db
+@patch("canvas_sdk.utils.query_budget.log")
+def test_enforced_query_count_budget_fails(mock_log: MagicMock) -> None:
+    """An enforced budget stops the query that goes over it."""
+    client, pipeline = _make_client()
+    budget = QueryBudget(max_queries=2, enforce=True)
+
+    with (
+        pytest.raises(QueryBudgetExceeded, match="more than 2 queries"),
+        inspect_queries("handler", budget=budget, client=client),
+    ):
+        _run_queries(3)
+
+    pipeline.incr.assert_called_once_with(
+        "plugins.query_budget_exceeded", tags={"name": "handler", "limit": "queries"}
+    )
+
+
+@pytest.mark.django_db
+def test_enforced_db_time_budget_fails() -> None:
+    """An enforced database time budget stops the handler after the query that breaks it."""
+    inspector = QueryInspector(QueryBudget(max_db_time_ms=1.0, enforce=True))
+    execute = MagicMock(return_value="result")
+
+    with patch("canvas_sdk.utils.query_budget.time.perf_counter_ns", side_effect=[0, 500_000]):
+        assert inspector(execute, "SELECT 1", None, False, {}) == "result"
+
+    with (
+        patch("canvas_sdk.utils.query_budget.time.perf_counter_ns", side_effect=[0, 600_000]),
+        pytest.raises(QueryBudgetExceeded, match="database time"),
+    ):
+        inspector(execute, "SELECT 1", None, False, {})
+
+    assert execute.call_count == 2
+    assert inspector.exceeded() == ["db_time"]
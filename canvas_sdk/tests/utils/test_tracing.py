@@ -0,0 +1,151 @@
+"""Tests for the span-based tracing in canvas_sdk.utils.tracing."""
+
+import json
+from collections.abc import Generator
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.db import connection
+
+from canvas_sdk.utils import tracing
+from canvas_sdk.utils.http import Http
+from canvas_sdk.utils.tracing import JSONFileExporter, Span, current_span, span, trace_queries
+
+
+class MemoryExporter:
+    """An exporter keeping the traces it receives."""
+
+    def __init__(self) -> None:
+        self.traces: list[list[Span]] = []
+
+    def export(self, spans: list[Span]) -> None:
+        """Keep the spans of a trace."""
+        self.traces.append(list(spans))
+
+
+@pytest.fixture
+def exporter() -> Generator[MemoryExporter, None, None]:
+    """Turn tracing on for a test."""
+    exporter = MemoryExporter()
+    tracing.set_exporter(exporter)
+    yield exporter
+    tracing.set_exporter(None)
+
+
+def test_no_spans_without_an_exporter() -> None:
+    """With tracing off, spans are not recorded."""
+    with span("event") as event_span:
+        assert event_span is None
+        assert current_span() is None
+
+
+def test_spans_are_linked_and_exported_with_their_root(exporter: MemoryExporter) -> None:
+    """Children share their root's trace and point to their parent; the root exports them."""
+    with span("event", {"event": "PATIENT_CREATED"}) as root:
+        with span("compute", {"plugin": "my_plugin"}) as compute, span("db.query"):
+            pass
+        assert current_span() is root
+        assert exporter.traces == []
+
+    assert current_span() is None
+    [trace] = exporter.traces
+    assert [s.name for s in trace] == ["event", "compute", "db.query"]
+    assert root is not None and compute is not None
+    assert {s.trace_id for s in trace} == {root.trace_id}
+    assert [s.parent_id for s in trace] == [None, root.span_id, compute.span_id]
+    assert trace[1].attributes == {"plugin": "my_plugin"}
+    assert all(s.duration_ns > 0 for s in trace)
+
+
+def test_errors_are_recorded(exporter: MemoryExporter) -> None:
+    """A span ended by an exception is marked as an error."""
+    with pytest.raises(ValueError), span("event"), span("compute"):
+        raise ValueError
+
+    [trace] = exporter.traces
+    assert [(s.status, s.attributes["error"]) for s in trace] == [
+        ("error", "ValueError"),
+        ("error", "ValueError"),
+    ]
+
+
+def test_fast_traces_are_not_exported(exporter: MemoryExporter) -> None:
+    """Traces shorter than the minimum duration are not exported."""
+    tracing.set_exporter(exporter, min_duration_ms=60_000)
+
+    with span("event"):
+        pass
+
+    assert exporter.traces == []
+
+
+def test_spans_past_the_limit_are_dropped(exporter: MemoryExporter) -> None:
+    """A trace keeps a bounded number of spans, and counts the others."""
+    with patch.object(tracing, "MAX_SPANS_PER_TRACE", 3), span("event"):
+        for _ in range(5):
+            with span("db.query"):
+                pass
+
+    [trace] = exporter.traces
+    assert len(trace) == 3
+    assert trace[0].attributes["dropped_spans"] == 3
+
+
+def test_exporter_errors_are_logged(exporter: MemoryExporter) -> None:
+    """A failing exporter doesn't fail the traced code."""
+    with (
+        patch.object(exporter, "export", side_effect=OSError),
+        patch("canvas_sdk.utils.tracing.log") as mock_log,
+        span("event"),
+    ):
+        pass
+
+    mock_log.exception.assert_called_once()
+
+
+def test_json_file_exporter(tmp_path: Path) -> None:
+    """The file exporter writes each trace as a line of JSON."""
+    path = tmp_path / "traces.jsonl"
+    tracing.set_exporter(JSONFileExporter(str(path)))
+    try:
+        for name in ("first", "second"):
+            with span(name), span("compute", {"plugin": "my_plugin"}):
+                pass
+    finally:
+        tracing.set_exporter(None)
+
+    first, second = (json.loads(line) for line in path.read_text().splitlines())
+    assert [s["name"] for s in first] == ["first", "compute"]
+    assert first[1]["parent_id"] == first[0]["span_id"]
+    assert first[1]["attributes"] == {"plugin": "my_plugin"}
+    assert second[0]["name"] == "second"
+
+
+@pytest.mark.django_db
+def test_query_spans(exporter: MemoryExporter) -> None:
+    """Queries run during a trace get a span with their statement, without their parameters."""
+    with span("event"), trace_queries(), connection.cursor() as cursor:
+        cursor.execute("SELECT %s", ["secret"])
+
+    [trace] = exporter.traces
+    [query] = [s for s in trace if s.name == "db.query"]
+    assert query.attributes == {"db.alias": "default", "db.statement": "SELECT %s"}
+    assert query.parent_id == trace[0].span_id
+
+
+@patch("requests.Session.get")
+def test_http_spans(mock_get: MagicMock, exporter: MemoryExporter) -> None:
+    """Http requests get a span with their method, URL and status code."""
+    mock_get.return_value.status_code = 200
+
+    with span("event"):
+        Http("https://example.com").get("/path?patient=abc")
+
+    [_, request] = exporter.traces[0]
+    assert request.name == "http.request"
+    assert request.attributes == {
+        "http.method": "GET",
+        "http.url": "https://example.com/path",
+        "http.status_code": 200,
+    }
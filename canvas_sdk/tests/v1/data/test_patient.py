@@ -1,13 +1,17 @@
 from unittest.mock import MagicMock, patch
 
 import pytest
+from pytest_django import DjangoAssertNumQueries
 
+from canvas_sdk.test_utils.factories import PatientFactory
 from canvas_sdk.v1.data.patient import (
     DEFAULT_AVATAR_URL,
     Patient,
     PatientIdentificationCard,
     PatientMetadata,
     PatientPhoto,
+    PatientSetting,
+    PatientSettingConstants,
 )
 
 
@@ -100,3 +104,96 @@ def test_patient_photo_url_returns_default_avatar_when_no_photo() -> None:
     patient = MagicMock(spec=Patient)
     patient.photo = None
     assert Patient.photo_url.fget(patient) == DEFAULT_AVATAR_URL  # type: ignore[attr-defined]
+
+
+@pytest.mark.django_db
+class TestPatientSettings:
+    """Tests for bulk loading and caching of patient settings."""
+
+    @pytest.fixture
+    def patients(self) -> list[Patient]:
+        """Two patients, the first with a preferred pharmacy and a timezone."""
+        first, second = PatientFactory.create_batch(2)
+        PatientSetting.objects.create(
+            patient=first,
+            name=PatientSettingConstants.PHARMACY,
+            value={"ncpdp_id": "1234567"},
+        )
+        PatientSetting.objects.create(
+            patient=first,
+            name=PatientSettingConstants.PREFERRED_SCHEDULING_TIMEZONE,
+            value="America/New_York",
+        )
+        return [first, second]
+
+    def test_get_setting_is_not_memoized(self, patients: list[Patient]) -> None:
+        """Without loaded settings, get_setting returns the current value on every call."""
+        patient = Patient.objects.get(pk=patients[0].pk)
+
+        assert patient.get_setting(PatientSettingConstants.PHARMACY) == {"ncpdp_id": "1234567"}
+        assert patient.get_setting("missing") is None
+
+        PatientSetting.objects.filter(
+            patient=patient, name=PatientSettingConstants.PHARMACY
+        ).update(value={"ncpdp_id": "7654321"})
+        PatientSetting.objects.create(patient=patient, name="missing", value="set")
+
+        assert patient.get_setting(PatientSettingConstants.PHARMACY) == {"ncpdp_id": "7654321"}
+        assert patient.get_setting("missing") == "set"
+        assert "_settings_cache" not in patient.__dict__
+
+    def test_load_settings(
+        self, patients: list[Patient], django_assert_num_queries: DjangoAssertNumQueries
+    ) -> None:
+        """load_settings loads every setting for many patients with one query."""
+        first, second = list(
+            Patient.objects.filter(pk__in=[p.pk for p in patients]).order_by("dbid")
+        )
+
+        with django_assert_num_queries(1):
+            Patient.load_settings([first, second])
+
+        with django_assert_num_queries(0):
+            assert first.preferred_pharmacy == {"ncpdp_id": "1234567"}
+            assert (
+                first.get_setting(PatientSettingConstants.PREFERRED_SCHEDULING_TIMEZONE)
+                == "America/New_York"
+            )
+            assert second.get_setting(PatientSettingConstants.PHARMACY) is None
+            assert second.get_setting("missing") is None
+
+    def test_load_settings_by_name(
+        self, patients: list[Patient], django_assert_num_queries: DjangoAssertNumQueries
+    ) -> None:
+        """load_settings with names caches only those names, including absent ones."""
+        first, second = list(
+            Patient.objects.filter(pk__in=[p.pk for p in patients]).order_by("dbid")
+        )
+
+        with django_assert_num_queries(1):
+            Patient.load_settings([first, second], names=[PatientSettingConstants.PHARMACY])
+
+        with django_assert_num_queries(0):
+            assert first.preferred_pharmacy == {"ncpdp_id": "1234567"}
+            assert second.get_setting(PatientSettingConstants.PHARMACY) is None
+
+        with django_assert_num_queries(1):
+            assert (
+                first.get_setting(PatientSettingConstants.PREFERRED_SCHEDULING_TIMEZONE)
+                == "America/New_York"
+            )
+
+    def test_with_settings(
+        self, patients: list[Patient], django_assert_num_queries: DjangoAssertNumQueries
+    ) -> None:
+        """with_settings loads settings alongside the patients."""
+        with django_assert_num_queries(2):
+            first, second = list(
+                Patient.objects.filter(pk__in=[p.pk for p in patients])
+                .with_settings()
+                .order_by("dbid")
+            )
+
+        with django_assert_num_queries(0):
+            assert first.preferred_pharmacy == {"ncpdp_id": "1234567"}
+            assert second.get_setting(PatientSettingConstants.PHARMACY) is None
@@ -0,0 +1,151 @@
+from collections.abc import Generator
+from unittest.mock import patch
+
+import pytest
+from django.core.signals import request_started
+from django.db import DEFAULT_DB_ALIAS, models
+from django.test import override_settings
+
+from canvas_sdk.v1.data import CustomAttribute, Patient
+from canvas_sdk.v1.data.base import CustomModel
+from canvas_sdk.v1.database_router import (
+    ReplicaRouter,
+    read_your_writes,
+    reset_routing_state,
+    use_primary,
+)
+
+REPLICAS = ["replica_0", "replica_1"]
+
+
+class RoutedModel(CustomModel):
+    """A mock custom model for routing tests."""
+
+    class Meta:
+        app_label = "test"
+        managed = False
+
+    name = models.CharField(max_length=20)
+
+
+class UnmanagedModel(models.Model):
+    """A model that isn't SDK data."""
+
+    class Meta:
+        app_label = "test"
+        managed = False
+
+
+@pytest.fixture
+def router() -> Generator[ReplicaRouter, None, None]:
+    """A router with two replicas, and a fresh routing state outside of any transaction."""
+    reset_routing_state()
+    with (
+        override_settings(DATABASE_REPLICAS=REPLICAS, CANVAS_SDK_DB_READ_YOUR_WRITES=True),
+        patch("canvas_sdk.v1.database_router.connections") as connections,
+    ):
+        connections.__getitem__.return_value.in_atomic_block = False
+        yield ReplicaRouter()
+    reset_routing_state()
+
+
+def test_reads_go_to_one_replica_per_event(router: ReplicaRouter) -> None:
+    """Every read of an event goes to the same replica."""
+    replica = router.db_for_read(Patient)
+
+    assert replica in REPLICAS
+    assert router.db_for_read(CustomAttribute) == replica
+    assert router.db_for_read(RoutedModel) == replica
+
+
+def test_replica_is_chosen_again_for_the_next_event(router: ReplicaRouter) -> None:
+    """A new event chooses its replica again."""
+    with patch("canvas_sdk.v1.database_router.random.choice", side_effect=REPLICAS):
+        assert router.db_for_read(Patient) == "replica_0"
+        request_started.send(sender=None)
+        assert router.db_for_read(Patient) == "replica_1"
+
+
+@pytest.mark.parametrize("model", [Patient, CustomAttribute, RoutedModel])
+def test_writes_go_to_primary(router: ReplicaRouter, model: type[models.Model]) -> None:
+    """Writes of SDK data, including namespaced custom data, go to the primary."""
+    assert router.db_for_write(model) == DEFAULT_DB_ALIAS
+
+
+def test_other_models_are_not_routed(router: ReplicaRouter) -> None:
+    """Models that aren't SDK data are left to the default routing."""
+    assert router.db_for_read(UnmanagedModel) is None
+    assert router.db_for_write(UnmanagedModel) is None
+
+
+def test_no_replicas_configured() -> None:
+    """Without replicas, reads are left to the default routing."""
+    with override_settings(DATABASE_REPLICAS=[]):
+        assert ReplicaRouter().db_for_read(Patient) is None
+
+
+def test_reads_follow_writes_to_primary(router: ReplicaRouter) -> None:
+    """Once an event writes, its reads go to the primary until the next event."""
+    assert router.db_for_read(Patient) in REPLICAS
+
+    router.db_for_write(RoutedModel)
+    assert router.db_for_read(Patient) == DEFAULT_DB_ALIAS
+
+    request_started.send(sender=None)
+    assert router.db_for_read(Patient) in REPLICAS
+
+
+def test_read_your_writes_can_be_disabled_per_event(router: ReplicaRouter) -> None:
+    """With read-your-writes disabled for an event, its reads stay on the replica."""
+    read_your_writes(False)
+
+    router.db_for_write(RoutedModel)
+    assert router.db_for_read(Patient) in REPLICAS
+
+    request_started.send(sender=None)
+    router.db_for_write(RoutedModel)
+    assert router.db_for_read(Patient) == DEFAULT_DB_ALIAS
+
+
+def test_read_your_writes_setting(router: ReplicaRouter) -> None:
+    """The setting decides the flag at the start of each event."""
+    with override_settings(CANVAS_SDK_DB_READ_YOUR_WRITES=False):
+        router.db_for_write(RoutedModel)
+        assert router.db_for_read(Patient) in REPLICAS
+
+        read_your_writes()
+        router.db_for_write(RoutedModel)
+        assert router.db_for_read(Patient) == DEFAULT_DB_ALIAS
+
+
+def test_use_primary(router: ReplicaRouter) -> None:
+    """use_primary() sends the rest of the event's reads to the primary."""
+    use_primary()
+
+    assert router.db_for_read(Patient) == DEFAULT_DB_ALIAS
+
+
+def test_reads_inside_primary_transaction(router: ReplicaRouter) -> None:
+    """Reads inside a transaction on the primary stay on the primary."""
+    with patch("canvas_sdk.v1.database_router.connections") as connections:
+        connections.__getitem__.return_value.in_atomic_block = True
+        assert router.db_for_read(Patient) == DEFAULT_DB_ALIAS
+
+    assert router.db_for_read(Patient) in REPLICAS
+
+
+def test_allow_relation(router: ReplicaRouter) -> None:
+    """Objects from the primary and the replicas can be related."""
+    patient, attribute = Patient(), CustomAttribute()
+    patient._state.db, attribute._state.db = "replica_0", DEFAULT_DB_ALIAS
+
+    assert router.allow_relation(patient, attribute) is True
+
+    attribute._state.db = "other"
+    assert router.allow_relation(patient, attribute) is None
+
+
+def test_replicas_are_never_migrated(router: ReplicaRouter) -> None:
+    """Migrations only run against the primary."""
+    assert router.allow_migrate("replica_0", "v1") is False
+    assert router.allow_migrate(DEFAULT_DB_ALIAS, "v1") is None
@@ -0,0 +1,62 @@
+import pytest
+
+from canvas_sdk.value_set.hcc2018 import HCC_HIERARCHY, HCCConditions, HCCScore
+
+
+def test_score_for_counts_each_hcc_once() -> None:
+    """Test that codes sharing an HCC category contribute a single RAF value."""
+    score = HCCConditions.score_for(["E1121", "E1122", "B20", "not-a-code"])
+
+    assert score.hccs == {
+        "Diabetes with Chronic Complications": 0.368,
+        "HIV/AIDS": 0.470,
+    }
+    assert score.raf == pytest.approx(0.838)
+
+
+def test_score_for_drops_amputation_status_under_traumatic_amputation() -> None:
+    """Test that a traumatic amputation outranks the amputation status it implies."""
+    score = HCCConditions.score_for(["S48011A", "G546"])
+
+    assert score.hccs == {"Traumatic Amputations and Complications": 0.265}
+    assert score.raf == pytest.approx(0.265)
+
+
+def test_score_for_without_hcc_codes() -> None:
+    """Test that codes without an HCC category score zero."""
+    assert HCCConditions.score_for(["not-a-code"]) == HCCScore(raf=0, hccs={})
+
+
+def test_score_panel_matches_single_code_lookups() -> None:
+    """Test that panel scoring agrees with the per-code lookups."""
+    scores = HCCConditions.score_panel({"patient-1": ["E119"], "patient-2": []})
+
+    assert scores["patient-1"].raf == HCCConditions.raf_for("E119")
+    assert scores["patient-1"].hccs == {HCCConditions.label_hdcc_for("E119"): 0.118}
+    assert scores["patient-2"] == HCCScore(raf=0, hccs={})
+
+
+def test_score_for_ignores_codes_without_an_hcc() -> None:
+    """Test that codes whose label has no HCC category don't score."""
+    assert HCCConditions.label_hdcc_for("G931") == ""
+
+    score = HCCConditions.score_for(["G931", "E119"])
+
+    assert score.hccs == {"Diabetes without Complication": 0.118}
+    assert score.raf == pytest.approx(0.118)
+
+
+def test_score_for_applies_the_hcc_hierarchy() -> None:
+    """Test that categories outranked by a more severe one present don't count."""
+    score = HCCConditions.score_for(["E1122", "E119", "B20"])
+
+    assert score.hccs == {"Diabetes with Chronic Complications": 0.368, "HIV/AIDS": 0.470}
+    assert score.raf == pytest.approx(0.838)
+
+
+def test_hcc_hierarchy_uses_known_categories() -> None:
+    """Test that the hierarchy names the categories used in the labels."""
+    categories = {label["HCC"] for label in HCCConditions.LABELS.values()}
+
+    for hcc, outranked in HCC_HIERARCHY.items():
+        assert {hcc, *outranked} <= categories
@@ -0,0 +1,56 @@
+from unittest.mock import patch
+
+import pytest
+
+from canvas_sdk.value_set.custom import DiabetesWithoutComplication
+from canvas_sdk.value_set.hcc2018 import HCCConditions
+from canvas_sdk.value_set.index import ValueSetIndex, get_value_set_index
+from canvas_sdk.value_set.v2022.condition import Diabetes
+
+
+def test_lookup_by_system_name() -> None:
+    """Test that a code is mapped to every value set containing it."""
+    index = ValueSetIndex(modules=("canvas_sdk.value_set.custom", "canvas_sdk.value_set.hcc2018"))
+
+    assert index.lookup("ICD10CM", "E119") == (DiabetesWithoutComplication, HCCConditions)
+    assert index.lookup("ICD10CM", "not-a-code") == ()
+
+
+def test_lookup_by_system_url() -> None:
+    """Test that code system URLs are resolved, including URLs shared by several systems."""
+    index = ValueSetIndex(modules=("canvas_sdk.value_set.custom",))
+
+    assert index.lookup("ICD-10", "E119") == index.lookup("ICD10CM", "E119")
+    assert index.lookup("ICD-10", "E119") == (DiabetesWithoutComplication,)
+
+
+def test_lookup_many() -> None:
+    """Test that many codings can be looked up at once."""
+    index = ValueSetIndex(modules=("canvas_sdk.value_set.custom", "canvas_sdk.value_set.hcc2018"))
+
+    result = index.lookup_many([("ICD10CM", "E119"), ("SNOMEDCT", "not-a-code")])
+
+    assert result == {
+        ("ICD10CM", "E119"): (DiabetesWithoutComplication, HCCConditions),
+        ("SNOMEDCT", "not-a-code"): (),
+    }
+    assert index.value_sets_for(result) == {DiabetesWithoutComplication, HCCConditions}
+
+
+def test_shared_index_covers_all_value_set_modules() -> None:
+    """Test that the shared index is built once and includes packaged value sets."""
+    index = get_value_set_index()
+
+    assert get_value_set_index() is index
+    assert Diabetes in index.lookup("http://snomed.info/sct", "44054006")
+
+
+def test_only_value_set_modules_can_be_indexed() -> None:
+    """Test that the index refuses to import modules other than the value set modules."""
+    with (
+        patch("canvas_sdk.value_set.index.importlib.import_module") as mock_import_module,
+        pytest.raises(ValueError),
+    ):
+        ValueSetIndex(modules=("canvas_sdk.value_set.custom", "os"))
+
+    mock_import_module.assert_not_called()
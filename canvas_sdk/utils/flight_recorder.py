@@ -0,0 +1,200 @@
+"""
+A flight recorder of the runner's slowest recent events.
+
+While an event is handled, the measurements that are otherwise only sent to StatsD are kept
+on its record: the duration, status and query counts of each handler, the shapes of the
+queries they ran and the HTTP calls they made. Once the event ends, its record is kept in a
+bounded buffer if the event was slow, so it can be dumped when investigating slow events.
+"""
+
+import json
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from typing import Any
+
+from logger import log
+
+# The most query shapes and HTTP calls kept on a record.
+MAX_QUERY_SHAPES = 10
+MAX_HTTP_CALLS = 50
+
+
+@dataclass
+class EventRecord:
+    """What happened while handling one event."""
+
+    event: str
+    target: str | None = None
+    started_at: float = field(default_factory=time.time)
+    duration_ms: float = 0.0
+    handlers: list[dict[str, Any]] = field(default_factory=list)
+    query_shapes: Counter[str] = field(default_factory=Counter)
+    http_calls: list[dict[str, Any]] = field(default_factory=list)
+
+    def add_handler(
+        self,
+        name: str,
+        plugin: str | None,
+        duration_ms: float,
+        status: str,
+        query_count: int,
+        query_duration_ms: float,
+    ) -> None:
+        """Add the measurements of a handler invocation."""
+        self.handlers.append(
+            {
+                "plugin": plugin,
+                "name": name,
+                "duration_ms": round(duration_ms, 3),
+                "status": status,
+                "query_count": query_count,
+                "query_duration_ms": round(query_duration_ms, 3),
+            }
+        )
+
+    def add_http_call(
+        self, method: str, url: str, status_code: int | None, duration_ms: float
+    ) -> None:
+        """Add an HTTP call made while handling the event."""
+        if len(self.http_calls) < MAX_HTTP_CALLS:
+            self.http_calls.append(
+                {
+                    "method": method,
+                    "url": url,
+                    "status_code": status_code,
+                    "duration_ms": round(duration_ms, 3),
+                }
+            )
+
+    def slowest_handler_ms(self) -> float:
+        """Return the duration of the slowest handler, or 0 if none ran."""
+        return max((handler["duration_ms"] for handler in self.handlers), default=0.0)
+
+    def to_dict(self, include_target: bool = True) -> dict[str, Any]:
+        """Return the record as a JSON-serializable dict.
+
+        Args:
+            include_target: Whether to include the ID of the event's target, e.g. a patient ID.
+        """
+        record = {
+            "event": self.event,
+            "target": self.target,
+            "started_at": datetime.fromtimestamp(self.started_at, UTC).isoformat(),
+            "duration_ms": round(self.duration_ms, 3),
+            "handlers": self.handlers,
+            "query_shapes": [
+                {"shape": shape, "count": count}
+                for shape, count in self.query_shapes.most_common(MAX_QUERY_SHAPES)
+            ],
+            "http_calls": self.http_calls,
+        }
+        if not include_target:
+            del record["target"]
+        return record
+
+
+class FlightRecorder:
+    """A bounded buffer of the records of recent slow events.
+
+    Only events taking at least min_duration_ms are kept, up to `size` of them, and events
+    with a handler slower than dump_threshold_ms are also logged as soon as they end.
+    """
+
+    def __init__(
+        self, size: int = 50, min_duration_ms: float = 100, dump_threshold_ms: float = 0
+    ) -> None:
+        self.size = size
+        self.min_duration_ms = min_duration_ms
+        self.dump_threshold_ms = dump_threshold_ms
+        self._records: deque[EventRecord] = deque(maxlen=size or None)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether events are being recorded."""
+        return self.size > 0
+
+    def add(self, record: EventRecord) -> None:
+        """Keep the record of an event that ended, if it was slow."""
+        if self.dump_threshold_ms and record.slowest_handler_ms() > self.dump_threshold_ms:
+            log.warning(
+                f"Slow event {record.event}: a handler took more than "
+                f"{self.dump_threshold_ms:g}ms: {json.dumps(record.to_dict(), default=str)}"
+            )
+
+        if record.duration_ms < self.min_duration_ms:
+            return
+
+        with self._lock:
+            self._records.append(record)
+
+    def records(self, include_target: bool = True) -> list[dict[str, Any]]:
+        """Return the records kept, slowest first, with or without the IDs of event targets."""
+        with self._lock:
+            records = list(self._records)
+        return [
+            record.to_dict(include_target)
+            for record in sorted(records, key=lambda record: record.duration_ms, reverse=True)
+        ]
+
+    def dump(self) -> None:
+        """Log the records kept, slowest first."""
+        records = self.records()
+        log.info(f"Flight recorder: {len(records)} slow events recorded")
+        for record in records:
+            log.info(f"Flight recorder: {json.dumps(record, default=str)}")
+
+
+recorder = FlightRecorder(size=0)
+
+_current_record: ContextVar[EventRecord | None] = ContextVar("current_record", default=None)
+
+
+def configure(size: int, min_duration_ms: float, dump_threshold_ms: float) -> None:
+    """Replace the recorder, e.g. with the runner's settings."""
+    global recorder
+    recorder = FlightRecorder(size, min_duration_ms, dump_threshold_ms)
+
+
+def current_record() -> EventRecord | None:
+    """Return the record of the event being handled, if it is recorded."""
+    return _current_record.get()
+
+
+@contextmanager
+def record_event(
+    event: str, target: str | None = None
+) -> Generator[EventRecord | None, None, None]:
+    """A context manager recording the handling of an event, when the recorder is enabled.
+
+    Args:
+        event: The name of the event.
+        target: The ID of the event's target.
+
+    Yields:
+        The record of the event, or None when the recorder is disabled.
+    """
+    if not recorder.enabled:
+        yield None
+        return
+
+    record = EventRecord(event, target)
+    previous = _current_record.get()
+    # Restored by value, as event handlers are generators that may resume in another context.
+    _current_record.set(record)
+    start = time.perf_counter_ns()
+    try:
+        yield record
+    finally:
+        record.duration_ms = (time.perf_counter_ns() - start) / 1_000_000
+        _current_record.set(previous)
+        recorder.add(record)
+
+
+__exports__ = ()
@@ -1,14 +1,18 @@
 import concurrent
+import contextvars
 import functools
 import logging
 import os
+import time
 import urllib.parse
 from collections.abc import Callable, Iterable, Mapping
 from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Literal, Protocol, TypeVar
+from typing import Any, Literal, Protocol, TypeVar, cast
 
 import requests
 
+from canvas_sdk.utils import tracing
+from canvas_sdk.utils.flight_recorder import current_record
 from canvas_sdk.utils.metrics import measured
 
 F = TypeVar("F", bound=Callable)
@@ -16,6 +20,41 @@ F = TypeVar("F", bound=Callable)
 logger = logging.getLogger("plugin_runner_logger")
 
 
+def _traced_request(method: str) -> Callable[[F], F]:
+    """Record each request sent by an Http method as a span and on the flight recorder.
+
+    The query string of the URL is left out, as it may hold patient data.
+    """
+
+    def decorator(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(self: "Http", url: str, *args: Any, **kwargs: Any) -> Any:
+            record = current_record()
+            if tracing.get_exporter() is None and record is None:
+                return fn(self, url, *args, **kwargs)
+
+            full_url = urllib.parse.urljoin(self._base_url, url).split("?")[0]
+            status_code = None
+            start = time.perf_counter_ns()
+            try:
+                with tracing.span(
+                    "http.request", {"http.method": method, "http.url": full_url}
+                ) as request_span:
+                    response = fn(self, url, *args, **kwargs)
+                    status_code = response.status_code
+                    if request_span is not None:
+                        request_span.set_attribute("http.status_code", status_code)
+            finally:
+                if record is not None:
+                    duration_ms = (time.perf_counter_ns() - start) / 1_000_000
+                    record.add_http_call(method, full_url, status_code, duration_ms)
+            return response
+
+        return cast(F, wrapper)
+
+    return decorator
+
+
 class _BatchableRequest:
     """Representation of a request that will be executed in parallel with other requests."""
 
@@ -133,6 +172,7 @@ class Http:
         super().__setattr__(name, value)
 
     @measured(track_plugins_usage=True)
+    @_traced_request("GET")
     def get(
         self,
         url: str,
@@ -148,6 +188,7 @@ class Http:
         )
 
     @measured(track_plugins_usage=True)
+    @_traced_request("POST")
     def post(
         self,
         url: str,
@@ -165,6 +206,7 @@ class Http:
         )
 
     @measured(track_plugins_usage=True)
+    @_traced_request("PUT")
     def put(
         self,
         url: str,
@@ -182,6 +224,7 @@ class Http:
         )
 
     @measured(track_plugins_usage=True)
+    @_traced_request("PATCH")
     def patch(
         self,
         url: str,
@@ -199,6 +242,7 @@ class Http:
         )
 
     @measured(track_plugins_usage=True)
+    @_traced_request("DELETE")
     def delete(
         self,
         url: str,
@@ -234,7 +278,12 @@ class Http:
             )
 
         with ThreadPoolExecutor() as executor:
-            futures = [executor.submit(request.fn(self)) for request in batch_requests]
+            # Each request runs in a copy of the caller's context, so that it is recorded in the
+            # caller's trace and flight recorder record.
+            futures = [
+                executor.submit(contextvars.copy_context().run, request.fn(self))
+                for request in batch_requests
+            ]
 
             concurrent.futures.wait(futures, timeout=timeout)
 
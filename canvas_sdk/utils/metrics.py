@@ -1,18 +1,25 @@
+import atexit
+import math
 import os
+import random
+import threading
 import time
-from collections.abc import Callable, Generator
-from contextlib import contextmanager
+import tracemalloc
+from collections.abc import Callable, Generator, Iterable
+from contextlib import ExitStack, contextmanager
 from datetime import timedelta
-from functools import wraps
+from functools import lru_cache, wraps
 from typing import Any, TypeVar, cast, overload
 
 import psutil
 from django.conf import settings
-from django.db import connection
+from django.db import connections
 from statsd.client.base import StatsClientBase
 from statsd.client.udp import Pipeline
 from statsd.defaults.env import statsd as default_statsd_client
 
+from canvas_sdk.utils.flight_recorder import current_record
+from canvas_sdk.utils.openmetrics import registry as openmetrics_registry
 from logger import log
 
 LINE_PROTOCOL_TRANSLATION = str.maketrans(
@@ -25,15 +32,30 @@ LINE_PROTOCOL_TRANSLATION = str.maketrans(
 )
 
 
+def _format_tags(tags: Iterable[tuple[str, Any]]) -> str:
+    return ",".join(
+        f"{tag_name}={str(tag_value).translate(LINE_PROTOCOL_TRANSLATION)}"
+        for tag_name, tag_value in tags
+    )
+
+
+@lru_cache(maxsize=4096)
+def _cached_tags(tags: tuple[tuple[str, Any], ...]) -> str:
+    return _format_tags(tags)
+
+
 def tags_to_line_protocol(tags: dict[str, Any]) -> str:
     """Generate a tags string compatible with the InfluxDB line protocol.
 
+    Tag sets repeat across calls, so their strings are cached.
+
     See: https://docs.influxdata.com/influxdb/v1.1/write_protocols/line_protocol_tutorial/
     """
-    return ",".join(
-        f"{tag_name}={str(tag_value).translate(LINE_PROTOCOL_TRANSLATION)}"
-        for tag_name, tag_value in tags.items()
-    )
+    try:
+        return _cached_tags(tuple(tags.items()))
+    except TypeError:
+        # Unhashable tag values can't be cached.
+        return _format_tags(tags.items())
 
 
 def get_qualified_name(fn: Callable) -> str:
@@ -41,8 +63,15 @@ def get_qualified_name(fn: Callable) -> str:
     return f"{fn.__module__}.{fn.__qualname__}"
 
 
+def _milliseconds(delta: float | timedelta) -> float:
+    return delta.total_seconds() * 1000 if isinstance(delta, timedelta) else delta
+
+
 class StatsDClientProxy:
-    """Proxy for a StatsD client."""
+    """Proxy for a StatsD client.
+
+    Metrics are also recorded for OpenMetrics scrapers, when the endpoint is enabled.
+    """
 
     def __init__(self) -> None:
         self.client = default_statsd_client
@@ -55,6 +84,9 @@ class StatsDClientProxy:
             value (float): The value to report.
             tags (dict[str, str]): Dictionary of tags to attach to the metric.
         """
+        if openmetrics_registry.enabled:
+            openmetrics_registry.set(metric_name, tags, value)
+
         if not settings.METRICS_ENABLED:
             return
 
@@ -69,6 +101,9 @@ class StatsDClientProxy:
             delta (float | timedelta): The value to report.
             tags (dict[str, str]): Dictionary of tags to attach to the metric.
         """
+        if openmetrics_registry.enabled:
+            openmetrics_registry.observe(metric_name, tags, _milliseconds(delta))
+
         if not settings.METRICS_ENABLED:
             return
 
@@ -84,6 +119,9 @@ class StatsDClientProxy:
             rate (int): The sample rate.
             tags (dict[str, str]): Dictionary of tags to attach to the metric.
         """
+        if openmetrics_registry.enabled:
+            openmetrics_registry.inc(metric_name, tags, count)
+
         if not settings.METRICS_ENABLED:
             return
 
@@ -110,7 +148,278 @@ class PipelineProxy(StatsDClientProxy):
         self.client.send()
 
 
-statsd_client = StatsDClientProxy()
+def _percentile(ordered: list[float], percentile: int) -> float:
+    """Return a percentile of sorted values, using the nearest-rank method."""
+    return ordered[max(0, math.ceil(percentile / 100 * len(ordered)) - 1)]
+
+
+class AggregatingStatsDClientProxy(StatsDClientProxy):
+    """Proxy for a StatsD client that aggregates metrics in process and sends them periodically.
+
+    Counters are summed and gauges keep their last value, per metric and tags. Timings are
+    kept as they are, so StatsD still computes their statistics, but are sent in as few
+    packets as possible. The percentiles in settings.METRICS_PERCENTILES are also computed for
+    each timing and sent as gauges named after it, e.g. `plugins.timings.p95`.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._stopped = threading.Event()
+        self._flusher_pid: int | None = None
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        """Drop the buffered metrics, e.g. a forked child's copy of its parent's."""
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = {}
+        self._gauges: dict[str, float] = {}
+        self._timings: dict[tuple[str, str], list[float]] = {}
+
+    def gauge(self, metric_name: str, value: float, tags: dict[str, str]) -> None:
+        """Buffers a gauge metric, keeping the last value.
+
+        Args:
+            metric_name (str): The name of the metric.
+            value (float): The value to report.
+            tags (dict[str, str]): Dictionary of tags to attach to the metric.
+        """
+        if settings.METRICS_FLUSH_INTERVAL_SECONDS <= 0:
+            return super().gauge(metric_name, value, tags)
+
+        if openmetrics_registry.enabled:
+            openmetrics_registry.set(metric_name, tags, value)
+
+        if not settings.METRICS_ENABLED:
+            return
+
+        key = f"{metric_name},{tags_to_line_protocol(tags)}"
+        with self._lock:
+            self._gauges[key] = value
+        self._ensure_flusher()
+
+    def timing(self, metric_name: str, delta: float | timedelta, tags: dict[str, str]) -> None:
+        """Buffers a timing metric.
+
+        Args:
+            metric_name (str): The name of the metric.
+            delta (float | timedelta): The value to report.
+            tags (dict[str, str]): Dictionary of tags to attach to the metric.
+        """
+        if settings.METRICS_FLUSH_INTERVAL_SECONDS <= 0:
+            return super().timing(metric_name, delta, tags)
+
+        delta = _milliseconds(delta)
+        if openmetrics_registry.enabled:
+            openmetrics_registry.observe(metric_name, tags, delta)
+
+        if not settings.METRICS_ENABLED:
+            return
+
+        key = (metric_name, tags_to_line_protocol(tags))
+        with self._lock:
+            self._timings.setdefault(key, []).append(delta)
+        self._ensure_flusher()
+
+    def incr(self, metric_name: str, tags: dict[str, str], count: int = 1, rate: int = 1) -> None:
+        """Buffers an increment metric, summing the increments.
+
+        Args:
+            metric_name (str): The name of the metric.
+            count (int): The increment to report.
+            rate (int): The sample rate. Sampled increments are sent right away.
+            tags (dict[str, str]): Dictionary of tags to attach to the metric.
+        """
+        if settings.METRICS_FLUSH_INTERVAL_SECONDS <= 0 or rate != 1:
+            return super().incr(metric_name, tags, count, rate)
+
+        if openmetrics_registry.enabled:
+            openmetrics_registry.inc(metric_name, tags, count)
+
+        if not settings.METRICS_ENABLED:
+            return
+
+        key = f"{metric_name},{tags_to_line_protocol(tags)}"
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + count
+        self._ensure_flusher()
+
+    def pipeline(self) -> "PipelineProxy":
+        """Returns a pipeline adding to the aggregated metrics."""
+        if settings.METRICS_FLUSH_INTERVAL_SECONDS <= 0:
+            return super().pipeline()
+
+        return AggregatingPipelineProxy(self)
+
+    def flush(self) -> None:
+        """Sends the buffered metrics to StatsD."""
+        with self._lock:
+            counters, gauges, timings = self._counters, self._gauges, self._timings
+            self._counters, self._gauges, self._timings = {}, {}, {}
+
+        pipeline = Pipeline(self.client)
+
+        for key, count in counters.items():
+            pipeline.incr(key, count)
+
+        for key, value in gauges.items():
+            pipeline.gauge(key, value)
+
+        for (metric_name, statsd_tags), values in timings.items():
+            for value in values:
+                pipeline.timing(f"{metric_name},{statsd_tags}", value)
+
+            if settings.METRICS_PERCENTILES:
+                ordered = sorted(values)
+                for percentile in settings.METRICS_PERCENTILES:
+                    pipeline.gauge(
+                        f"{metric_name}.p{percentile},{statsd_tags}",
+                        _percentile(ordered, percentile),
+                    )
+
+        pipeline.send()
+
+    def _ensure_flusher(self) -> None:
+        """Start the thread flushing the metrics in this process, if it isn't running."""
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+
+        threading.Thread(target=self._run_flusher, name="metrics-flusher", daemon=True).start()
+        atexit.register(self.flush)
+
+    def _run_flusher(self) -> None:
+        while not self._stopped.wait(settings.METRICS_FLUSH_INTERVAL_SECONDS):
+            try:
+                self.flush()
+            except Exception:
+                log.exception("Unable to send metrics to StatsD")
+
+
+class AggregatingPipelineProxy(PipelineProxy):
+    """Pipeline for an aggregating client, whose metrics are sent when the client flushes."""
+
+    def __init__(self, aggregator: AggregatingStatsDClientProxy) -> None:
+        self.aggregator = aggregator
+
+    def gauge(self, metric_name: str, value: float, tags: dict[str, str]) -> None:
+        """Adds a gauge metric to the aggregated metrics."""
+        self.aggregator.gauge(metric_name, value, tags)
+
+    def timing(self, metric_name: str, delta: float | timedelta, tags: dict[str, str]) -> None:
+        """Adds a timing metric to the aggregated metrics."""
+        self.aggregator.timing(metric_name, delta, tags)
+
+    def incr(self, metric_name: str, tags: dict[str, str], count: int = 1, rate: int = 1) -> None:
+        """Adds an increment metric to the aggregated metrics."""
+        self.aggregator.incr(metric_name, tags, count, rate)
+
+    def send(self) -> None:
+        """Does nothing, as the aggregated metrics are sent periodically."""
+
+
+statsd_client = AggregatingStatsDClientProxy()
+
+# The most statements whose SQL is kept by a single measured block.
+MAX_QUERY_SAMPLES = 10
+
+_process: psutil.Process | None = None
+
+# The number of blocks currently tracing allocations, and whether tracing was started for them.
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_started = False
+
+
+def current_process() -> psutil.Process:
+    """Return the psutil Process of the current process, reusing it across calls."""
+    global _process
+
+    # A forked child must not reuse its parent's Process.
+    if _process is None or _process.pid != os.getpid():
+        _process = psutil.Process()
+
+    return _process
+
+
+def _tracemalloc_plugins() -> set[str]:
+    """Return the plugins whose allocations are traced, from PLUGIN_TRACEMALLOC_PLUGINS."""
+    return {name.strip() for name in os.getenv("PLUGIN_TRACEMALLOC_PLUGINS", "").split(",")}
+
+
+def _start_tracing() -> tracemalloc.Snapshot:
+    """Start tracing allocations, if they aren't already, and take a snapshot."""
+    global _tracemalloc_users, _tracemalloc_started
+
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_started = True
+        _tracemalloc_users += 1
+
+    return tracemalloc.take_snapshot()
+
+
+def _stop_tracing(before: tracemalloc.Snapshot) -> list[tracemalloc.StatisticDiff]:
+    """Take a snapshot, returning the allocation sites that grew since `before`.
+
+    Tracing stops once no block needs it, unless it was started by someone else.
+    """
+    global _tracemalloc_users, _tracemalloc_started
+
+    after = tracemalloc.take_snapshot()
+
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            tracemalloc.stop()
+            _tracemalloc_started = False
+
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    return [stat for stat in stats if stat.size_diff > 0]
+
+
+class QueryCounter:
+    """An execute wrapper counting and timing queries, keeping the SQL of a sample of them.
+
+    Only the statement templates are kept, never their parameters.
+    """
+
+    def __init__(self, sample_rate: float = 0.0) -> None:
+        self.count = 0
+        self.duration_ns = 0
+        self.sample_rate = sample_rate
+        self.samples: list[tuple[str, float]] = []
+
+    def __call__(
+        self,
+        execute: Callable[..., Any],
+        sql: str,
+        params: Any,
+        many: bool,
+        context: dict[str, Any],
+    ) -> Any:
+        """Run a query, adding it to the counters."""
+        start = time.perf_counter_ns()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ns = time.perf_counter_ns() - start
+            self.count += 1
+            self.duration_ns += duration_ns
+
+            if (
+                self.sample_rate
+                and len(self.samples) < MAX_QUERY_SAMPLES
+                and random.random() < self.sample_rate
+            ):
+                self.samples.append((sql, duration_ns / 1_000_000))
 
 
 @contextmanager
@@ -121,6 +430,8 @@ def measure(
     track_plugins_usage: bool = False,
     track_queries: bool = False,
     track_memory_usage: bool = False,
+    query_sample_rate: float | None = None,
+    memory_sample_rate: float | None = None,
 ) -> Generator[PipelineProxy, None, None]:
     """A context manager for collecting metrics about a context block.
 
@@ -131,6 +442,12 @@ def measure(
         track_plugins_usage: Whether to track plugin usage (Adds plugin and handler tags if the caller was a plugin).
         track_queries: Whether to track queries (Adds query count and duration metrics).
         track_memory_usage: Whether to track memory usage (Adds memory usage metrics).
+        query_sample_rate: The fraction of tracked queries whose SQL is logged. Defaults to the
+            PLUGIN_QUERY_SAMPLE_RATE environment variable, or 0.
+        memory_sample_rate: The fraction of blocks whose memory usage is tracked. Defaults to
+            the PLUGIN_MEMORY_SAMPLE_RATE environment variable, or 1. Allocations of the plugins
+            listed in PLUGIN_TRACEMALLOC_PLUGINS are traced in every block, and their top
+            allocation sites are logged.
 
     Yields:
         A pipeline for collecting additional metrics in the same batch.
@@ -146,14 +463,26 @@ def measure(
             extra_tags["plugin"] = caller.split(".")[0]
             extra_tags["handler"] = caller
 
+    query_tracking = ExitStack()
     if track_queries:
-        connection.force_debug_cursor = True
-        connection.queries_log.clear()
-
+        if query_sample_rate is None:
+            query_sample_rate = float(os.getenv("PLUGIN_QUERY_SAMPLE_RATE", 0))
+        query_counter = QueryCounter(query_sample_rate)
+        for db in connections.all():
+            query_tracking.enter_context(db.execute_wrapper(query_counter))
+
+    track_rss = False
+    tracemalloc_before = None
     if track_memory_usage:
-        pid = os.getpid()
-        process = psutil.Process(pid)
-        rss_before = process.memory_info().rss
+        if memory_sample_rate is None:
+            memory_sample_rate = float(os.getenv("PLUGIN_MEMORY_SAMPLE_RATE", 1))
+        if memory_sample_rate >= 1 or random.random() < memory_sample_rate:
+            track_rss = True
+            process = current_process()
+            rss_before = process.memory_info().rss
+
+        if (extra_tags or {}).get("plugin") in _tracemalloc_plugins():
+            tracemalloc_before = _start_tracing()
 
     tags = {
         "name": name,
@@ -170,28 +499,56 @@ def measure(
     else:
         tags = {**tags, "status": "success"}
     finally:
+        query_tracking.close()
         duration_ms = (time.perf_counter_ns() - timing_start) / 1_000_000
         pipeline.timing("plugins.timings", duration_ms, tags=tags)
         pipeline.incr("plugins.executions", tags=tags)
         if track_queries:
-            query_count = len(connection.queries)
-            query_duration_seconds = sum(float(q["time"]) for q in connection.queries)
-            query_duration_ms = query_duration_seconds * 1000
-            pipeline.timing("plugins.query_count", delta=query_count, tags=tags)
+            query_duration_ms = query_counter.duration_ns / 1_000_000
+            pipeline.timing("plugins.query_count", delta=query_counter.count, tags=tags)
             pipeline.timing("plugins.query_duration_ms", delta=query_duration_ms, tags=tags)
-            connection.force_debug_cursor = False
-        if track_memory_usage:
+            for sql, sql_duration_ms in query_counter.samples:
+                log.info(f"Sampled query while running {name} ({sql_duration_ms:.2f}ms): {sql}")
+
+            record = current_record()
+            if record is not None:
+                record.add_handler(
+                    name,
+                    plugin=(extra_tags or {}).get("plugin"),
+                    duration_ms=duration_ms,
+                    status=tags["status"],
+                    query_count=query_counter.count,
+                    query_duration_ms=query_duration_ms,
+                )
+        plugin_name = (extra_tags or {}).get("plugin")
+        identifier = f"{plugin_name} ({name})" if plugin_name else name
+
+        if track_rss:
             rss_after = process.memory_info().rss
             rss_diff = rss_after - rss_before
             pipeline.timing("plugins.rss_delta_in_bytes", delta=rss_diff, tags=tags)
 
             if rss_diff > int(os.getenv("PLUGIN_MEMORY_GROWTH_THRESHOLD_MB", 5)) * 1024 * 1024:
-                plugin_name = (extra_tags or {}).get("plugin")
-                identifier = f"{plugin_name} ({name})" if plugin_name else name
                 log.warning(
                     f"Plugin RSS: Excessive memory growth of {(rss_diff / 1024 / 1024):.2f}MB while running {identifier}"
                 )
 
+        if tracemalloc_before is not None:
+            allocations = _stop_tracing(tracemalloc_before)
+            traced_diff = sum(stat.size_diff for stat in allocations)
+            pipeline.timing("plugins.traced_memory_delta_in_bytes", delta=traced_diff, tags=tags)
+
+            top = allocations[: int(os.getenv("PLUGIN_TRACEMALLOC_TOP", 10))]
+            log.info(
+                f"Plugin tracemalloc: {(traced_diff / 1024):.1f}KiB allocated while running "
+                f"{identifier}, top allocation sites:\n"
+                + "\n".join(
+                    f"  {stat.traceback}: {(stat.size_diff / 1024):+.1f}KiB "
+                    f"({stat.count_diff:+d} blocks)"
+                    for stat in top
+                )
+            )
+
         pipeline.send()
 
 
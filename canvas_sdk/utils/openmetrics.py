@@ -0,0 +1,229 @@
+"""
+OpenMetrics exposition of the runner's metrics.
+
+When the endpoint is started, every metric sent through canvas_sdk.utils.metrics is also
+recorded here: increments as counters, gauges as gauges and timings as histograms. Prometheus
+can then scrape the runner directly, in the OpenMetrics text format.
+"""
+
+import json
+import re
+import threading
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from logger import log
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Histogram buckets of the timings, keyed by metric name. Other timings use the buckets given
+# to OpenMetricsRegistry, which are in milliseconds.
+METRIC_BUCKETS: dict[str, tuple[float, ...]] = {
+    "plugins.query_count": (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+    "plugins.rss_delta_in_bytes": tuple(
+        size * 1024 * 1024 for size in (0, 0.5, 1, 2, 5, 10, 25, 50, 100)
+    ),
+    "plugins.traced_memory_delta_in_bytes": tuple(
+        size * 1024 * 1024 for size in (0, 0.5, 1, 2, 5, 10, 25, 50, 100)
+    ),
+}
+
+DEFAULT_BUCKETS = (5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0, 5000.0, 10000.0)
+
+Labels = tuple[tuple[str, str], ...]
+
+# Called on every scrape, each returning (metric name, labels, value) samples of gauges.
+Collector = Callable[[], Iterable[tuple[str, dict[str, Any], float]]]
+
+_INVALID_NAME_CHARACTERS = re.compile(r"[^a-zA-Z0-9_:]")
+
+
+def _metric_name(name: str) -> str:
+    """Turn a StatsD metric name, e.g. plugins.timings, into an OpenMetrics one."""
+    return _INVALID_NAME_CHARACTERS.sub("_", name)
+
+
+def _labels(tags: dict[str, Any]) -> Labels:
+    return tuple(sorted((_metric_name(key), str(value)) for key, value in tags.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Observations counted into buckets, with their count and sum."""
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add an observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_counts(self) -> list[tuple[str, int]]:
+        """Return the (upper bound, cumulative count) of each bucket, ending with +Inf."""
+        bounds = [_format_value(float(bound)) for bound in self.buckets] + ["+Inf"]
+        total = 0
+        cumulative = []
+        for bound, count in zip(bounds, self.counts, strict=True):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+
+class OpenMetricsRegistry:
+    """The metrics exposed to OpenMetrics scrapers."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        self.enabled = False
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[Labels, float]] = {}
+        self._gauges: dict[str, dict[Labels, float]] = {}
+        self._histograms: dict[str, dict[Labels, Histogram]] = {}
+        self._collectors: list[Collector] = []
+
+    def inc(self, name: str, tags: dict[str, Any], count: float = 1) -> None:
+        """Increment a counter."""
+        labels = _labels(tags)
+        with self._lock:
+            counter = self._counters.setdefault(name, {})
+            counter[labels] = counter.get(labels, 0) + count
+
+    def set(self, name: str, tags: dict[str, Any], value: float) -> None:
+        """Set a gauge."""
+        labels = _labels(tags)
+        with self._lock:
+            self._gauges.setdefault(name, {})[labels] = value
+
+    def observe(self, name: str, tags: dict[str, Any], value: float) -> None:
+        """Add an observation to a histogram."""
+        labels = _labels(tags)
+        with self._lock:
+            histograms = self._histograms.setdefault(name, {})
+            histogram = histograms.get(labels)
+            if histogram is None:
+                histogram = histograms[labels] = Histogram(METRIC_BUCKETS.get(name, self.buckets))
+            histogram.observe(value)
+
+    def add_collector(self, collector: Collector) -> None:
+        """Add a function returning gauge samples computed at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Return the metrics in the OpenMetrics text format."""
+        lines: list[str] = []
+
+        collected: dict[str, dict[Labels, float]] = {}
+        for collector in self._collectors:
+            try:
+                for name, tags, value in collector():
+                    collected.setdefault(name, {})[_labels(tags)] = value
+            except Exception:
+                log.exception("Unable to collect metrics for OpenMetrics")
+
+        with self._lock:
+            for name, samples in sorted(self._counters.items()):
+                metric = _metric_name(name)
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in samples.items():
+                    lines.append(f"{metric}_total{_format_labels(labels)} {_format_value(value)}")
+
+            for name, samples in sorted({**self._gauges, **collected}.items()):
+                metric = _metric_name(name)
+                lines.append(f"# TYPE {metric} gauge")
+                for labels, value in samples.items():
+                    lines.append(f"{metric}{_format_labels(labels)} {_format_value(value)}")
+
+            for name, histograms in sorted(self._histograms.items()):
+                metric = _metric_name(name)
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in histograms.items():
+                    for bound, count in histogram.cumulative_counts():
+                        bucket_labels = _format_labels(labels, f'le="{bound}"')
+                        lines.append(f"{metric}_bucket{bucket_labels} {count}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+                    lines.append(
+                        f"{metric}_sum{_format_labels(labels)} {_format_value(histogram.sum)}"
+                    )
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+registry = OpenMetricsRegistry()
+
+
+# Other paths served alongside /metrics, each returning a JSON document (e.g. debugging data).
+JSON_ROUTES: dict[str, Callable[[], Any]] = {}
+
+
+def add_json_route(path: str, handler: Callable[[], Any]) -> None:
+    """Serve the JSON returned by a function on a path of the OpenMetrics endpoint."""
+    JSON_ROUTES[path] = handler
+
+
+class OpenMetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serves the registry's metrics on /metrics, and the JSON routes."""
+
+    registry = registry
+
+    def do_GET(self) -> None:
+        """Respond with the metrics or a JSON route, or 404 for any other path."""
+        path = self.path.split("?")[0]
+        if path in JSON_ROUTES:
+            body = json.dumps(JSON_ROUTES[path](), default=str).encode()
+            content_type = "application/json"
+        elif path == "/metrics":
+            body = self.registry.render().encode()
+            content_type = CONTENT_TYPE
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Don't log every scrape."""
+
+
+def start_openmetrics_server(
+    port: int, host: str = "0.0.0.0", buckets: Iterable[float] | None = None
+) -> ThreadingHTTPServer:
+    """Start recording metrics, and serve them on http://host:port/metrics from a thread."""
+    if buckets:
+        registry.buckets = tuple(sorted(buckets))
+    registry.enabled = True
+
+    server = ThreadingHTTPServer((host, port), OpenMetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="openmetrics", daemon=True).start()
+
+    log.info(f"Serving OpenMetrics on {host}:{server.server_port}/metrics")
+    return server
+
+
+__exports__ = ()
@@ -0,0 +1,212 @@
+"""
+Per-handler query budgets and N+1 detection.
+
+Queries are inspected with a database execute wrapper, so nothing is logged by Django and
+no SQL is kept beyond one entry per distinct statement shape.
+"""
+
+import inspect
+import os
+import re
+import time
+from collections import Counter
+from collections.abc import Callable, Generator
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+from typing import Any, NamedTuple
+
+from django.db import connections
+
+from canvas_sdk.utils.flight_recorder import current_record
+from canvas_sdk.utils.metrics import StatsDClientProxy, statsd_client
+from canvas_sdk.utils.plugins import find_plugin_ancestor
+from logger import log
+
+# The number of identical statement shapes in one handler invocation that is reported as N+1.
+N_PLUS_ONE_THRESHOLD = int(os.getenv("PLUGIN_N_PLUS_ONE_THRESHOLD", 10))
+
+# How far up the stack to look for the plugin code that issued a query.
+CALL_SITE_MAX_DEPTH = 60
+
+_PLACEHOLDER_LISTS = re.compile(r"%s(?:\s*,\s*%s)+")
+_VALUES_ROWS = re.compile(r"\(%s\.\.\.\)(?:\s*,\s*\(%s\.\.\.\))+")
+_STRING_LITERALS = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERALS = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a handler goes over a query budget that is enforced."""
+
+
+class QueryBudget(NamedTuple):
+    """The queries a plugin's handlers may run per invocation."""
+
+    max_queries: int | None = None
+    max_db_time_ms: float | None = None
+    enforce: bool = False
+
+    @classmethod
+    def from_manifest(cls, config: dict[str, Any] | None) -> "QueryBudget | None":
+        """Build a budget from a manifest's `query_budget` block, if it has one."""
+        if not config:
+            return None
+
+        return cls(
+            max_queries=config.get("max_queries"),
+            max_db_time_ms=config.get("max_db_time_ms"),
+            enforce=config.get("on_exceed", "warn") == "fail",
+        )
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """Return the shape of a statement, with literals and placeholder lists collapsed.
+
+    Statements that only differ in their parameters, or in the length of an IN list or of
+    a multi-row VALUES clause, share a fingerprint.
+    """
+    shape = _STRING_LITERALS.sub("?", sql)
+    shape = _NUMBER_LITERALS.sub("?", shape)
+    shape = _PLACEHOLDER_LISTS.sub("%s...", shape)
+    shape = shape.replace("(%s)", "(%s...)")
+    return _VALUES_ROWS.sub("(%s...)", shape)
+
+
+def _call_site() -> str | None:
+    """Return the plugin code, as module:line (function), that the current query came from."""
+    frame = find_plugin_ancestor(inspect.currentframe(), max_depth=CALL_SITE_MAX_DEPTH)
+    if frame is None:
+        return None
+
+    module = frame.f_globals.get("__name__")
+    return f"{module}:{frame.f_lineno} ({frame.f_code.co_qualname})"
+
+
+class QueryInspector:
+    """An execute wrapper counting, timing and fingerprinting the queries of an invocation."""
+
+    def __init__(
+        self,
+        budget: QueryBudget | None = None,
+        n_plus_one_threshold: int = N_PLUS_ONE_THRESHOLD,
+    ) -> None:
+        self.budget = budget
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.query_count = 0
+        self.db_time_ms = 0.0
+        self.shapes: Counter[str] = Counter()
+        self.repeated: dict[str, str | None] = {}
+
+    def __call__(
+        self,
+        execute: Callable[..., Any],
+        sql: str,
+        params: Any,
+        many: bool,
+        context: dict[str, Any],
+    ) -> Any:
+        """Run a query, checking it against the budget and tracking its shape."""
+        # Only an enforced budget can interrupt the queries.
+        budget = self.budget if self.budget and self.budget.enforce else None
+        self.query_count += 1
+
+        if budget and budget.max_queries is not None and self.query_count > budget.max_queries:
+            raise QueryBudgetExceeded(
+                f"Query budget exceeded: more than {budget.max_queries} queries"
+            )
+
+        shape = fingerprint(sql)
+        self.shapes[shape] += 1
+        if self.shapes[shape] == self.n_plus_one_threshold:
+            # Only the first time a shape repeats enough is its call site looked up.
+            self.repeated[shape] = _call_site()
+
+        start = time.perf_counter_ns()
+        try:
+            result = execute(sql, params, many, context)
+        finally:
+            self.db_time_ms += (time.perf_counter_ns() - start) / 1_000_000
+
+        if budget and budget.max_db_time_ms is not None and self.db_time_ms > budget.max_db_time_ms:
+            raise QueryBudgetExceeded(
+                f"Query budget exceeded: {self.db_time_ms:.1f}ms of database time, "
+                f"more than {budget.max_db_time_ms}ms"
+            )
+
+        return result
+
+    def exceeded(self) -> list[str]:
+        """Return the limits of the budget that were exceeded ("queries", "db_time")."""
+        if self.budget is None:
+            return []
+
+        exceeded = []
+        if self.budget.max_queries is not None and self.query_count > self.budget.max_queries:
+            exceeded.append("queries")
+        if self.budget.max_db_time_ms is not None and self.db_time_ms > self.budget.max_db_time_ms:
+            exceeded.append("db_time")
+        return exceeded
+
+
+@contextmanager
+def inspect_queries(
+    name: str,
+    budget: QueryBudget | None = None,
+    extra_tags: dict[str, str] | None = None,
+    client: StatsDClientProxy | None = None,
+) -> Generator[QueryInspector, None, None]:
+    """A context manager inspecting the queries run by a handler invocation.
+
+    Repeated statement shapes and exceeded budgets are logged and counted in metrics when the
+    block exits. An enforced budget raises QueryBudgetExceeded from the query that breaks it.
+
+    Args:
+        name: The name of the block being inspected (added as a StatsD tag).
+        budget: The query budget for the block, if any.
+        extra_tags: A dict of extra tags to be added to all recorded metrics.
+        client: An optional alternate StatsD client.
+
+    Yields:
+        The inspector, for reading the counts gathered so far.
+    """
+    client = client or statsd_client
+    inspector = QueryInspector(budget)
+
+    try:
+        with ExitStack() as stack:
+            for db in connections.all():
+                stack.enter_context(db.execute_wrapper(inspector))
+            yield inspector
+    finally:
+        record = current_record()
+        if record is not None:
+            record.query_shapes.update(inspector.shapes)
+
+        tags = {"name": name, **(extra_tags or {})}
+        identifier = f"{tags['plugin']} ({name})" if "plugin" in tags else name
+
+        if inspector.repeated or inspector.exceeded():
+            pipeline = client.pipeline()
+
+            for shape, call_site in inspector.repeated.items():
+                count = inspector.shapes[shape]
+                log.warning(
+                    f"Possible N+1 queries: {count} queries of the same shape while running "
+                    f"{identifier}, from {call_site or 'an unknown call site'}: {shape}"
+                )
+                pipeline.incr(
+                    "plugins.n_plus_one",
+                    tags={**tags, "call_site": call_site or "unknown"},
+                )
+
+            for limit in inspector.exceeded():
+                log.warning(
+                    f"Query budget exceeded while running {identifier}: "
+                    f"{inspector.query_count} queries, {inspector.db_time_ms:.1f}ms ({limit})"
+                )
+                pipeline.incr("plugins.query_budget_exceeded", tags={**tags, "limit": limit})
+
+            pipeline.send()
+
+
+__exports__ = ()
@@ -0,0 +1,223 @@
+"""
+Span-based tracing of the events handled by the plugin runner.
+
+Each event is a trace: a root span with a child span for every handler step (instantiation,
+accept_event, compute and effect validation) and, within those, a span for every database
+query and HTTP call. When the root span ends, the spans of the trace are handed to the
+exporter. Without an exporter, spans aren't recorded at all.
+"""
+
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Generator
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Protocol
+
+from django.db import connections
+
+from logger import log
+
+# The most spans kept for one trace; later spans are counted as dropped on the root span.
+MAX_SPANS_PER_TRACE = 1000
+
+# The longest SQL statement recorded on a query span.
+MAX_STATEMENT_LENGTH = 2000
+
+
+@dataclass
+class Span:
+    """A timed operation in a trace."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    start_time_ns: int = field(default_factory=time.time_ns)
+    duration_ns: int = 0
+    status: str = "ok"
+    trace: list["Span"] = field(default_factory=list, repr=False)
+    dropped: int = field(default=0, repr=False)
+    _start_perf_ns: int = field(default_factory=time.perf_counter_ns, repr=False)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Add an attribute to the span."""
+        self.attributes[key] = value
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the span as a JSON-serializable dict."""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_time_ns,
+            "duration_ms": self.duration_ns / 1_000_000,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter(Protocol):
+    """Receives the spans of every finished trace."""
+
+    def export(self, spans: list[Span]) -> None:
+        """Export the spans of a trace, root span first."""
+        ...
+
+
+class JSONFileExporter:
+    """Appends each trace to a file as a line of JSON, for offline analysis."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[Span]) -> None:
+        """Write the spans of a trace as one JSON line."""
+        line = json.dumps([span.to_dict() for span in spans], default=str)
+        with self._lock, open(self.path, "a") as file:
+            file.write(line + "\n")
+
+
+_exporter: SpanExporter | None = None
+_min_duration_ns = 0
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def set_exporter(exporter: SpanExporter | None, min_duration_ms: float = 0) -> None:
+    """Set the exporter of finished traces, or turn tracing off with None.
+
+    Args:
+        exporter: The exporter receiving the spans of each trace.
+        min_duration_ms: Only traces whose root span took at least this long are exported.
+    """
+    global _exporter, _min_duration_ns
+    _exporter = exporter
+    _min_duration_ns = int(min_duration_ms * 1_000_000)
+
+
+def get_exporter() -> SpanExporter | None:
+    """Return the exporter of finished traces, if tracing is on."""
+    return _exporter
+
+
+def current_span() -> Span | None:
+    """Return the span of the operation in progress, if any."""
+    return _current_span.get()
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+@contextmanager
+def span(name: str, attributes: dict[str, Any] | None = None) -> Generator[Span | None, None, None]:
+    """A context manager recording a span, as a child of the span in progress.
+
+    A span started outside of any other starts a new trace, which is exported when it ends.
+    When tracing is off, nothing is recorded and None is yielded.
+
+    Args:
+        name: The name of the operation.
+        attributes: Attributes describing the operation, e.g. the plugin or event.
+
+    Yields:
+        The span, for adding attributes, or None when tracing is off.
+    """
+    if _exporter is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    if parent is None:
+        new = Span(name, trace_id=_new_id(16), span_id=_new_id(8), parent_id=None)
+        new.trace.append(new)
+    else:
+        new = Span(name, trace_id=parent.trace_id, span_id=_new_id(8), parent_id=parent.span_id)
+        # Children share their root's list of spans.
+        new.trace = parent.trace
+        if len(parent.trace) < MAX_SPANS_PER_TRACE:
+            parent.trace.append(new)
+        else:
+            parent.trace[0].dropped += 1
+
+    if attributes:
+        new.attributes.update(attributes)
+
+    # The previous span is restored by value rather than with a token, as event handlers are
+    # generators that may be resumed in another context.
+    _current_span.set(new)
+    try:
+        yield new
+    except BaseException as e:
+        new.status = "error"
+        new.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        new.duration_ns = time.perf_counter_ns() - new._start_perf_ns
+        _current_span.set(parent)
+
+        if parent is None:
+            _export(new)
+
+
+def _export(root: Span) -> None:
+    """Hand a finished trace to the exporter, if it took long enough."""
+    exporter = _exporter
+    if exporter is None or root.duration_ns < _min_duration_ns:
+        return
+
+    if root.dropped:
+        root.attributes["dropped_spans"] = root.dropped
+
+    try:
+        exporter.export(root.trace)
+    except Exception:
+        log.exception(f"Unable to export the trace of {root.name}")
+
+
+def trace_query(
+    execute: Callable[..., Any],
+    sql: str,
+    params: Any,
+    many: bool,
+    context: dict[str, Any],
+) -> Any:
+    """An execute wrapper recording a span for each query run during a trace.
+
+    Only the statement is recorded, never its parameters.
+    """
+    if _current_span.get() is None:
+        return execute(sql, params, many, context)
+
+    attributes = {
+        "db.alias": context["connection"].alias,
+        "db.statement": sql[:MAX_STATEMENT_LENGTH],
+    }
+    if many:
+        attributes["db.many"] = True
+
+    with span("db.query", attributes):
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def trace_queries() -> Generator[None, None, None]:
+    """A context manager recording the queries run in the block, when tracing is on."""
+    if _exporter is None:
+        yield
+        return
+
+    with ExitStack() as stack:
+        for db in connections.all():
+            stack.enter_context(db.execute_wrapper(trace_query))
+        yield
+
+
+__exports__ = ()
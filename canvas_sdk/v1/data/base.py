@@ -1,23 +1,47 @@
+import binascii
+import datetime
+import decimal
 import json
+import time
 import uuid
 from abc import abstractmethod
-from collections.abc import Container
-from typing import TYPE_CHECKING, Any, Protocol, Self, cast
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import (
+    Collection,
+    Container,
+    Generator,
+    Iterable,
+    Mapping,
+    Sequence,
+)
+from contextlib import contextmanager
+from functools import cache
+from itertools import islice
+from typing import TYPE_CHECKING, Any, NamedTuple, Protocol, Self, cast
 
 from django.contrib.postgres.fields import ArrayField
-from django.db import connection, models
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connection, connections, models, router, transaction
 from django.db.models import ForeignKey, OneToOneField, Q
 from django.db.models.base import ModelBase
 from django.db.models.constraints import UniqueConstraint
+from django.db.models.expressions import RawSQL
+from django.db.models.query import ModelIterable, ValuesIterable
+
+from logger import log
 
 if TYPE_CHECKING:
+    from django.db.backends.base.base import BaseDatabaseWrapper
+
     from canvas_sdk.protocols.timeframe import Timeframe
-    from canvas_sdk.value_set.value_set import ValueSet
+    from canvas_sdk.value_set.value_set import CombinedValueSet, ValueSet
 
 IS_SQLITE = connection.vendor == "sqlite"
 
 MAX_FIELD_SIZE = 1_048_576  # 1 MB
 MAX_BULK_SIZE = 10_000
+DEFAULT_STREAM_CHUNK_SIZE = 2_000
+DEFAULT_PAGE_SIZE = 50
 
 
 class BulkOperationTooLarge(ValueError):
@@ -59,6 +83,27 @@ class FieldValueTooLarge(ValueError):
     pass
 
 
+class BulkIngestResult(NamedTuple):
+    """The number of rows written by a bulk ingest and how long it took."""
+
+    rows: int
+    seconds: float
+    rows_per_second: float
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor is malformed or was issued for a different ordering."""
+
+    pass
+
+
+class KeysetPage(NamedTuple):
+    """A page of results and the cursor for the page after it, if there is one."""
+
+    items: list[Any]
+    next_cursor: str | None
+
+
 def _check_write_permission() -> None:
     """Check if write operations are allowed in the current plugin context.
 
@@ -309,31 +354,219 @@ class CustomModel(Model, metaclass=CustomModelMetaclass):
     def save(self, *args: Any, **kwargs: Any) -> None:
         """Save the model instance, checking write permissions and field sizes first."""
         self._check_write_permission()
-        self._check_field_sizes()
-        return super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        self._encoded_json = self._check_field_sizes(update_fields)
+        try:
+            return super().save(*args, **kwargs)
+        finally:
+            del self._encoded_json
+
+    def _encoded_json_expressions(self) -> dict[str, RawSQL]:
+        """Expressions writing the JSON that save() serialized while checking field sizes.
+
+        Values replaced since they were serialized are left out, and serialized again.
+        """
+        encoded: dict[str, tuple[Any, str]] = self.__dict__.get("_encoded_json") or {}
+        return {
+            attname: RawSQL("%s", [text])
+            for attname, (value, text) in encoded.items()
+            if self.__dict__.get(attname) is value
+        }
+
+    @staticmethod
+    @contextmanager
+    def _writing_encoded_json(objs: Iterable["CustomModel"]) -> Generator[None, None, None]:
+        """Put the JSON serialized while checking field sizes in place of the values of objs,
+        so it is written as-is, and put the values back afterwards.
+        """
+        replaced = []
+        try:
+            for obj in objs:
+                expressions = obj._encoded_json_expressions()
+                replaced.append((obj, {attname: obj.__dict__[attname] for attname in expressions}))
+                obj.__dict__.update(expressions)
+            yield
+        finally:
+            for obj, values in replaced:
+                obj.__dict__.update(values)
+
+    @classmethod
+    @contextmanager
+    def _checked_for_bulk_write(
+        cls, objs: Sequence[Self], field_names: Collection[str] | None = None
+    ) -> Generator[None, None, None]:
+        """Check the field sizes of objs, and write the JSON serialized by the check in the block.
+
+        Used by bulk_create() and bulk_update(), with the fields being updated as field_names.
+        """
+        try:
+            for obj in objs:
+                obj._encoded_json = obj._check_field_sizes(field_names)
+            with cls._writing_encoded_json(objs):
+                yield
+        finally:
+            for obj in objs:
+                obj.__dict__.pop("_encoded_json", None)
+
+    def _do_insert(
+        self,
+        manager: models.Manager,
+        using: str,
+        fields: Sequence[models.Field],
+        returning_fields: Sequence[models.Field],
+        raw: bool,
+    ) -> list[Any]:
+        with self._writing_encoded_json([self]):
+            return super()._do_insert(  # type: ignore[misc]
+                manager, using, fields, returning_fields, raw
+            )
+
+    def _do_update(
+        self,
+        base_qs: models.QuerySet[Self],
+        using: str | None,
+        pk_val: Any,
+        values: Collection[tuple[models.Field, type[models.Model] | None, Any]],
+        update_fields: Iterable[str] | None,
+        forced_update: bool,
+    ) -> bool:
+        expressions = self._encoded_json_expressions()
+        values = [
+            (field, model, expressions.get(field.attname, value)) for field, model, value in values
+        ]
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
 
     def delete(self, *args: Any, **kwargs: Any) -> tuple[int, dict[str, int]]:
         """Delete the model instance, checking write permissions first."""
         self._check_write_permission()
         return super().delete(*args, **kwargs)
 
-    def _check_field_sizes(self) -> None:
+    @classmethod
+    def bulk_ingest(
+        cls, objs: Iterable[Self | Mapping[str, Any]], chunk_size: int = MAX_BULK_SIZE
+    ) -> BulkIngestResult:
+        """Insert a large number of rows, chunk_size rows at a time.
+
+        Accepts model instances or mappings of field names to values, from any iterable
+        including generators, so the whole dataset never has to be held in memory. Write
+        permission is checked once and field sizes are checked for every row. On PostgreSQL
+        each chunk is written with COPY FROM STDIN; elsewhere with bulk_create().
+
+        Each chunk is committed on its own unless the call is wrapped in a transaction, and
+        primary keys are not set on the given instances.
+        """
+        if not 1 <= chunk_size <= MAX_BULK_SIZE:
+            raise ValueError(f"chunk_size must be between 1 and {MAX_BULK_SIZE:,}")
+
+        _check_write_permission()
+
+        db_connection = connections[router.db_for_write(cls)]
+        use_copy = db_connection.vendor == "postgresql"
+
+        rows = 0
+        started = time.perf_counter()
+        iterator = iter(objs)
+        while chunk := [
+            cls(**obj) if isinstance(obj, Mapping) else obj for obj in islice(iterator, chunk_size)
+        ]:
+            if use_copy:
+                encoded = [obj._check_field_sizes() for obj in chunk]
+                cls._copy_rows(db_connection, chunk, encoded)
+            else:
+                cls._default_manager.bulk_create(chunk)
+            rows += len(chunk)
+
+        seconds = time.perf_counter() - started
+        result = BulkIngestResult(rows, seconds, rows / seconds if seconds else 0.0)
+        log.info(
+            f"Ingested {rows:,} {cls.__name__} rows in {result.seconds:.2f}s "
+            f"({result.rows_per_second:,.0f} rows/s)"
+        )
+        return result
+
+    @classmethod
+    def _copy_rows(
+        cls,
+        db_connection: "BaseDatabaseWrapper",
+        objs: Sequence[Self],
+        encoded: Sequence[dict[str, tuple[Any, str]]],
+    ) -> None:
+        """Write the rows with a single COPY FROM STDIN statement.
+
+        JSON values serialized by _check_field_sizes() are written as-is.
+        """
+        from canvas_sdk.v1.plugin_database_context import _sync_search_path
+
+        # Fields whose values are returned by the database, such as dbid, are left to it.
+        fields = [
+            field
+            for field in cls._meta.concrete_fields
+            if not getattr(field, "db_returning", False)
+        ]
+        quote_name = db_connection.ops.quote_name
+        columns = ", ".join(quote_name(field.column) for field in fields)
+        statement = f"COPY {quote_name(cls._meta.db_table)} ({columns}) FROM STDIN"
+
+        # COPY runs on the DB-API cursor, which bypasses the search_path execute wrapper.
+        _sync_search_path(db_connection)
+        with (
+            transaction.atomic(using=db_connection.alias),
+            db_connection.cursor() as cursor,
+            cursor.cursor.copy(statement) as copy,
+        ):
+            for obj, obj_encoded in zip(objs, encoded, strict=True):
+                row = []
+                for field in fields:
+                    value = field.pre_save(obj, add=True)
+                    if field.attname in obj_encoded and obj_encoded[field.attname][0] is value:
+                        row.append(obj_encoded[field.attname][1])
+                    else:
+                        row.append(field.get_db_prep_save(value, db_connection))
+                copy.write_row(row)
+
+    @classmethod
+    @cache
+    def _sized_fields(cls) -> tuple[models.Field, ...]:
+        """The model's TextFields and JSONFields, whose values are subject to the size limit."""
+        return tuple(
+            field
+            for field in cls._meta.local_fields
+            if isinstance(field, models.TextField | models.JSONField)
+        )
+
+    def _check_field_sizes(
+        self, field_names: Collection[str] | None = None
+    ) -> dict[str, tuple[Any, str]]:
         """Check that TextField and JSONField values do not exceed the size limit.
 
+        Only the named fields are checked when field_names is given, as in bulk_update().
+
+        Returns:
+            The checked JSONField values and their JSON encoding, keyed by attname, so the
+            encoding can be written without serializing the values again.
+
         Raises:
             FieldValueTooLarge: If any field value exceeds MAX_FIELD_SIZE.
         """
-        for field in self._meta.local_fields:
-            if isinstance(field, (models.TextField, models.JSONField)):
-                value = getattr(self, field.attname, None)
-                if value is None:
-                    continue
-                size = len(json.dumps(value)) if isinstance(field, models.JSONField) else len(value)
-                if size > MAX_FIELD_SIZE:
-                    raise FieldValueTooLarge(
-                        f"Field '{field.name}' on {type(self).__name__} has size "
-                        f"{size:,} bytes, exceeding the {MAX_FIELD_SIZE:,} character limit."
-                    )
+        encoded = {}
+        for field in self._sized_fields():
+            if field_names is not None and field.name not in field_names:
+                continue
+            value = getattr(self, field.attname, None)
+            if value is None:
+                continue
+            if isinstance(field, models.JSONField):
+                text = json.dumps(value, cls=field.encoder)
+                encoded[field.attname] = (value, text)
+                size = len(text)
+            else:
+                size = len(value)
+            if size > MAX_FIELD_SIZE:
+                raise FieldValueTooLarge(
+                    f"Field '{field.name}' on {type(self).__name__} has size "
+                    f"{size:,} bytes, exceeding the {MAX_FIELD_SIZE:,} character limit."
+                )
+        return encoded
 
 
 class IdentifiableModel(Model):
@@ -469,7 +702,175 @@ class BaseModelManager(models.Manager):
 class BaseQuerySet(models.QuerySet):
     """A base QuerySet inherited from Django's model.Queryset."""
 
-    pass
+    def stream(self, chunk_size: int = DEFAULT_STREAM_CHUNK_SIZE) -> Generator[Any, None, None]:
+        """Iterate over the results in bounded memory, fetching chunk_size rows at a time.
+
+        Yields model instances, or rows when combined with values() or values_list(). On
+        PostgreSQL, outside a transaction, the rows are read page by page with keyset_page()
+        when the ordering allows it, so no cursor or transaction is held open while the
+        caller handles them; rows committed by others meanwhile may show up in later pages.
+        Otherwise this falls back to iterator(), whose server-side cursor, inside a
+        transaction, reads rows on demand.
+
+        The stream must be consumed inside the plugin_database_context it was created in.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+
+        db_connection = connections[self.db]
+        ordering = self._stream_ordering()
+        if (
+            db_connection.vendor != "postgresql"
+            or db_connection.settings_dict.get("DISABLE_SERVER_SIDE_CURSORS")
+            or db_connection.in_atomic_block
+            or ordering is None
+        ):
+            yield from self.iterator(chunk_size=chunk_size)
+            return
+
+        # Outside a transaction Django declares the cursor of iterator() WITH HOLD, which
+        # makes PostgreSQL materialize the whole result set up front, so each page is a query
+        # of its own instead.
+        cursor = None
+        while True:
+            page = self.keyset_page(cursor, page_size=chunk_size, ordering=ordering)
+            yield from page.items
+            if page.next_cursor is None:
+                return
+            cursor = page.next_cursor
+
+    def _stream_ordering(self) -> Sequence[str] | None:
+        """The ordering to read the results with keyset_page(), or None if they can't be."""
+        if self.query.is_sliced or self._iterable_class not in (ModelIterable, ValuesIterable):
+            return None
+
+        ordering = self.query.order_by or self.model._meta.ordering or ("pk",)
+        pk_name = self.model._meta.pk.name
+        names = {pk_name}
+        for column in ordering:
+            if not isinstance(column, str):
+                return None
+            name = column.removeprefix("-")
+            if name in ("pk", pk_name):
+                continue
+            try:
+                field = self.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            # Rows with NULLs in the ordering columns would be skipped by the seek.
+            if field.null or not field.concrete:
+                return None
+            names.add(name)
+
+        values_fields = cast(tuple[str, ...], getattr(self, "_fields", ()))
+        if self._iterable_class is ValuesIterable and values_fields:
+            fields = {pk_name if field == "pk" else field for field in values_fields}
+            if not names <= fields:
+                return None
+
+        return cast(Sequence[str], tuple(ordering))
+
+    def keyset_page(
+        self,
+        cursor: str | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        ordering: Sequence[str] | None = None,
+    ) -> KeysetPage:
+        """Return a page of results that follows the row the cursor points at.
+
+        Instead of an OFFSET, each page filters on the ordering columns of the last row of
+        the previous page, so deep pages cost the same as the first one when the columns are
+        indexed. The ordering defaults to the queryset's own, or to the primary key, and must
+        use non-null columns of the model (e.g. ("-created", "dbid")); the primary key is
+        appended when missing so that rows are ordered uniquely. Results may be model
+        instances or values() rows that include the ordering columns.
+
+        For example:
+
+        page = Patient.objects.filter(active=True).keyset_page(request.query_params.get("cursor"))
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+
+        columns = tuple(ordering or self.query.order_by or ("pk",))
+        if not all(isinstance(column, str) for column in columns):
+            raise ValueError("Keyset pagination requires an ordering by field names")
+
+        ordering = cast(tuple[str, ...], columns)
+
+        names = [name.removeprefix("-") for name in ordering]
+        pk_name = self.model._meta.pk.name
+        if not {"pk", pk_name} & set(names):
+            last_descending = ordering[-1].startswith("-")
+            ordering = (*ordering, "-pk" if last_descending else "pk")
+            names.append("pk")
+
+        fields = [
+            self.model._meta.pk if name == "pk" else self.model._meta.get_field(name)
+            for name in names
+        ]
+
+        queryset = self.order_by(*ordering)
+        if cursor is not None:
+            values = _decode_cursor(cursor, ordering, fields)
+            seek = Q()
+            for position, (column, value) in enumerate(zip(ordering, values, strict=True)):
+                lookup = "lt" if column.startswith("-") else "gt"
+                equal = dict(zip(names[:position], values, strict=False))
+                seek |= Q(**equal, **{f"{names[position]}__{lookup}": value})
+            queryset = queryset.filter(seek)
+
+        items = list(queryset[: page_size + 1])
+        if len(items) <= page_size:
+            return KeysetPage(items, None)
+
+        items = items[:page_size]
+        last = items[-1]
+        values = [
+            last[pk_name if name == "pk" else name]
+            if isinstance(last, dict)
+            else getattr(last, field.attname)
+            for name, field in zip(names, fields, strict=True)
+        ]
+        return KeysetPage(items, _encode_cursor(ordering, values))
+
+
+def _cursor_value(value: Any) -> Any:
+    """Convert an ordering column value to its JSON representation in a cursor."""
+    if isinstance(value, datetime.date | datetime.time):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID | decimal.Decimal):
+        return str(value)
+    return value
+
+
+def _encode_cursor(ordering: Sequence[str], values: Sequence[Any]) -> str:
+    """Encode the ordering and the last row's values into an opaque cursor."""
+    payload = json.dumps([list(ordering), [_cursor_value(value) for value in values]])
+    return urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(
+    cursor: str, ordering: Sequence[str], fields: Sequence[models.Field]
+) -> list[Any]:
+    """Decode a cursor into the values of the row it points at.
+
+    Raises:
+        InvalidCursor: If the cursor is malformed or was issued for a different ordering.
+    """
+    try:
+        payload = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_ordering, values = json.loads(payload)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise InvalidCursor("Malformed pagination cursor.") from e
+
+    if cursor_ordering != list(ordering) or len(values) != len(fields):
+        raise InvalidCursor("Pagination cursor does not match the ordering of the results.")
+
+    try:
+        return [field.to_python(value) for field, value in zip(fields, values, strict=True)]
+    except ValidationError as e:
+        raise InvalidCursor("Malformed pagination cursor.") from e
 
 
 if TYPE_CHECKING:
@@ -500,7 +901,7 @@ class ValueSetLookupQuerySetProtocol(QuerySetProtocol):
 
     @staticmethod
     @abstractmethod
-    def codings(value_set: type["ValueSet"]) -> tuple[tuple[str, set[str]]]:
+    def codings(value_set: "type[ValueSet] | CombinedValueSet") -> tuple[tuple[str, set[str]]]:
         """A protocol method for defining codings."""
         raise NotImplementedError
 
@@ -530,7 +931,7 @@ class ForPatientQuerySetMixin(QuerySetProtocol):
 class ValueSetLookupQuerySetMixin(ValueSetLookupQuerySetProtocol):
     """A QuerySet mixin that can filter objects based on a ValueSet."""
 
-    def find(self, value_set: type["ValueSet"]) -> Self:
+    def find(self, value_set: "type[ValueSet] | CombinedValueSet") -> Self:
         """
         Filters conditions, medications, etc. to those found in the inherited ValueSet class that is passed.
 
@@ -550,7 +951,7 @@ class ValueSetLookupQuerySetMixin(ValueSetLookupQuerySetProtocol):
         return self.filter(q_filter).distinct()
 
     @staticmethod
-    def codings(value_set: type["ValueSet"]) -> tuple[tuple[str, set[str]]]:
+    def codings(value_set: "type[ValueSet] | CombinedValueSet") -> tuple[tuple[str, set[str]]]:
         """Provide a sequence of tuples where each tuple is a code system URL and a set of codes."""
         values_dict = cast(dict, value_set.values)
         return cast(
@@ -579,7 +980,7 @@ class ValueSetLookupByNameQuerySetMixin(ValueSetLookupQuerySetMixin):
     """
 
     @staticmethod
-    def codings(value_set: type["ValueSet"]) -> tuple[tuple[str, set[str]]]:
+    def codings(value_set: "type[ValueSet] | CombinedValueSet") -> tuple[tuple[str, set[str]]]:
         """
         Provide a sequence of tuples where each tuple is a code system name and a set of codes.
         """
@@ -730,9 +1131,12 @@ class proxy_field:
 
 
 __exports__ = (
+    "BulkIngestResult",
     "BulkOperationTooLarge",
     "CustomModel",
     "FieldValueTooLarge",
+    "InvalidCursor",
+    "KeysetPage",
     "MAX_BULK_SIZE",
     "MAX_FIELD_SIZE",
     "ModelExtension",
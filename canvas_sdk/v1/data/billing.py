@@ -11,13 +11,13 @@ from canvas_sdk.v1.data.coding import Coding
 from canvas_sdk.value_set.value_set import CodeConstants
 
 if TYPE_CHECKING:
-    from canvas_sdk.value_set.value_set import ValueSet
+    from canvas_sdk.value_set.value_set import CombinedValueSet, ValueSet
 
 
 class BillingLineItemQuerySet(ValueSetTimeframeLookupQuerySet):
     """A class that adds functionality to filter BillingLineItem objects."""
 
-    def find(self, value_set: type["ValueSet"]) -> Self:
+    def find(self, value_set: "type[ValueSet] | CombinedValueSet") -> Self:
         """
         This method is overridden to use for BillingLineItem CPT codes.
         The codes are saved as string values in the BillingLineItem.cpt field,
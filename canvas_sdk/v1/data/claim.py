@@ -3,7 +3,13 @@ from typing import TYPE_CHECKING, Self
 
 from django.db import models
 
-from canvas_sdk.v1.data.base import AuditedModel, IdentifiableModel, MetadataModel, TimestampedModel
+from canvas_sdk.v1.data.base import (
+    AuditedModel,
+    BaseQuerySet,
+    IdentifiableModel,
+    MetadataModel,
+    TimestampedModel,
+)
 from canvas_sdk.v1.data.common import PersonSex, TaxIDType
 from canvas_sdk.v1.data.coverage import (
     CoverageRelationshipCode,
@@ -124,7 +130,7 @@ class ClaimComment(IdentifiableModel, AuditedModel):
     comment = models.TextField()
 
 
-class ClaimCoverageQuerySet(models.QuerySet):
+class ClaimCoverageQuerySet(BaseQuerySet):
     """ClaimCoverageQuerySet."""
 
     def active(self) -> Self:
@@ -310,7 +316,7 @@ class ClaimPatient(TimestampedModel):
     country = models.CharField(max_length=50)
 
 
-class ClaimQueryset(models.QuerySet):
+class ClaimQueryset(BaseQuerySet):
     """ClaimQueryset."""
 
     def active(self) -> Self:
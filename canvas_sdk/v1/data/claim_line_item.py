@@ -5,7 +5,7 @@ from django.db import models
 from django.db.models import Q, Sum
 from django.db.models.functions import Coalesce
 
-from canvas_sdk.v1.data.base import IdentifiableModel, TimestampedModel
+from canvas_sdk.v1.data.base import BaseQuerySet, IdentifiableModel, TimestampedModel
 from canvas_sdk.v1.data.note import PracticeLocationPOS
 
 
@@ -30,7 +30,7 @@ class FamilyPlanningOptions(models.TextChoices):
     NO = ("N", "No")
 
 
-class ClaimLineItemQuerySet(models.QuerySet):
+class ClaimLineItemQuerySet(BaseQuerySet):
     """ClaimLineItemQuerySet."""
 
     def filter(self, *args: Any, **kwargs: Any) -> Self:
@@ -10,11 +10,15 @@ import datetime
 import decimal
 import json
 import operator
+from collections.abc import Iterable
 from functools import reduce
-from typing import Any
+from typing import Any, Self, cast
 
 from django.db import models
-from django.db.models import Prefetch, Q, UniqueConstraint
+from django.db.models import F, OuterRef, Prefetch, Q, Subquery, UniqueConstraint
+from django.db.models.functions import Cast, JSONObject
+from django.db.models.query import ModelIterable
+from django.utils import timezone
 
 from .base import MAX_FIELD_SIZE, FieldValueTooLarge, Model
 
@@ -258,6 +262,56 @@ class CustomAttribute(Model):
             )
 
 
+def _attribute_value_subquery(name: str) -> Subquery:
+    """Build a subquery selecting one attribute's typed columns as a JSON object."""
+    columns: dict[str, Any] = {field: F(field) for field in VALUE_FIELDS}
+    # Decimals and JSON documents are read back as text so they round-trip exactly.
+    columns["decimal_value"] = Cast("decimal_value", models.TextField())
+    columns["json_value"] = Cast("json_value", models.TextField())
+
+    return Subquery(
+        CustomAttribute.objects.filter(hub=OuterRef("pk"), name=name).values(
+            attribute=JSONObject(**columns)
+        )[:1],
+        output_field=models.JSONField(),
+    )
+
+
+def _decode_attribute_value(columns: dict[str, Any] | None) -> Any:
+    """Convert the JSON object built by _attribute_value_subquery back into a value."""
+    if not columns:
+        return None
+
+    attr = CustomAttribute()
+    for field_name in VALUE_FIELDS:
+        raw = columns.get(field_name)
+        if raw is None:
+            continue
+        if field_name == "json_value":
+            setattr(attr, field_name, json.loads(raw))
+            continue
+        field = cast(models.Field, CustomAttribute._meta.get_field(field_name))
+        value = field.to_python(raw)
+        if isinstance(value, datetime.datetime) and timezone.is_naive(value):
+            value = timezone.make_aware(value, datetime.UTC)
+        setattr(attr, field_name, value)
+
+    return attr.value
+
+
+class CustomAttributeValuesIterable(ModelIterable):
+    """Model iterable that moves annotated attribute values onto each instance."""
+
+    def __iter__(self) -> Any:
+        aliases = getattr(self.queryset, "_attribute_value_aliases", {})
+        for obj in super().__iter__():
+            obj._annotated_attributes = {
+                name: _decode_attribute_value(obj.__dict__.pop(alias, None))
+                for name, alias in aliases.items()
+            }
+            yield obj
+
+
 class CustomAttributeAwareQuerySet(models.QuerySet):
     """QuerySet for models with custom attributes.
 
@@ -268,6 +322,13 @@ class CustomAttributeAwareQuerySet(models.QuerySet):
         StaffProxy.objects.filter(custom_attributes__value__gte=5)
     """
 
+    _attribute_value_aliases: dict[str, str] = {}
+
+    def _clone(self) -> Self:
+        clone = super()._clone()  # type: ignore[misc]
+        clone._attribute_value_aliases = self._attribute_value_aliases
+        return clone
+
     def filter(self, *args: Any, **kwargs: Any) -> "CustomAttributeAwareQuerySet":
         """Filter with automatic ``custom_attributes__value`` → typed-column rewriting."""
         args, kwargs = _rewrite_value_lookups(args, kwargs, match_key="custom_attributes__value")
@@ -278,40 +339,30 @@ class CustomAttributeAwareQuerySet(models.QuerySet):
         args, kwargs = _rewrite_value_lookups(args, kwargs, match_key="custom_attributes__value")
         return super().exclude(*args, **kwargs)
 
-
-class CustomAttributeAwareManager(models.Manager):
-    """Manager that automatically prefetches custom attributes and supports
-    ``custom_attributes__value`` lookups across the join.
-    """
-
-    def get_queryset(self) -> CustomAttributeAwareQuerySet:
-        """Prefetch all custom attributes for the queryset."""
-        return CustomAttributeAwareQuerySet(self.model, using=self._db).prefetch_related(
-            "custom_attributes"
+    def without_attributes(self) -> Self:
+        """Drop the ``custom_attributes`` prefetch, preserving any other prefetches."""
+        qs = self._chain()  # type: ignore[attr-defined]
+        qs._prefetch_related_lookups = tuple(
+            lookup
+            for lookup in qs._prefetch_related_lookups
+            if (lookup if isinstance(lookup, str) else lookup.prefetch_to) != "custom_attributes"
         )
+        return qs
 
-    def with_only(
-        self, attribute_names: str | list[str] | None = None
-    ) -> CustomAttributeAwareQuerySet:
-        """Prefetch only specific custom attributes by name.
+    def with_attributes(self, attribute_names: str | list[str] | None = None) -> Self:
+        """Prefetch custom attributes, or only those with the given names.
 
         attribute_names may be a single string or list of strings.
         If None, prefetches all attributes.
         """
+        qs = self.without_attributes()
+
         if attribute_names is None:
-            return self.get_queryset()
+            return qs.prefetch_related("custom_attributes")
 
         if isinstance(attribute_names, str):
             attribute_names = [attribute_names]
 
-        # Remove only the default "custom_attributes" prefetch, preserving any
-        # others the programmer may have added, then add the filtered one.
-        qs = self.get_queryset()
-        qs._prefetch_related_lookups = tuple(  # type: ignore[attr-defined]
-            lookup
-            for lookup in qs._prefetch_related_lookups  # type: ignore[attr-defined]
-            if (lookup if isinstance(lookup, str) else lookup.prefetch_to) != "custom_attributes"
-        )
         return qs.prefetch_related(
             Prefetch(
                 "custom_attributes",
@@ -319,6 +370,62 @@ class CustomAttributeAwareManager(models.Manager):
             )
         )
 
+    def with_attribute_values(self, attribute_names: str | list[str]) -> Self:
+        """Load the named attribute values as annotations on the main query.
+
+        Unlike with_attributes(), no second query is issued and no CustomAttribute
+        instances are built; each value is selected by a subquery. get_attribute()
+        reads these values first, and falls back to the database for other names.
+        """
+        if isinstance(attribute_names, str):
+            attribute_names = [attribute_names]
+
+        qs = self.without_attributes()
+        aliases = dict(qs._attribute_value_aliases)
+        annotations = {}
+        for name in attribute_names:
+            if name not in aliases:
+                aliases[name] = f"custom_attribute_value_{len(aliases)}"
+                annotations[aliases[name]] = _attribute_value_subquery(name)
+
+        qs = qs.annotate(**annotations)
+        qs._attribute_value_aliases = aliases
+        qs._iterable_class = CustomAttributeValuesIterable
+        return qs
+
+
+CustomAttributeAwareBaseManager = models.Manager.from_queryset(CustomAttributeAwareQuerySet)
+
+
+class CustomAttributeAwareManager(CustomAttributeAwareBaseManager):
+    """Manager that prefetches custom attributes and supports
+    ``custom_attributes__value`` lookups across the join.
+
+    Custom attributes are prefetched by default. Pass ``prefetch_attributes=False``
+    to make the prefetch opt-in through with_attributes()/with_only().
+    """
+
+    def __init__(self, prefetch_attributes: bool = True) -> None:
+        super().__init__()
+        self.prefetch_attributes = prefetch_attributes
+
+    def get_queryset(self) -> CustomAttributeAwareQuerySet:
+        """Return the queryset, prefetching all custom attributes unless disabled."""
+        qs = CustomAttributeAwareQuerySet(self.model, using=self._db)
+        if self.prefetch_attributes:
+            qs = qs.prefetch_related("custom_attributes")
+        return qs
+
+    def with_only(
+        self, attribute_names: str | list[str] | None = None
+    ) -> CustomAttributeAwareQuerySet:
+        """Prefetch only specific custom attributes by name.
+
+        attribute_names may be a single string or list of strings.
+        If None, prefetches all attributes.
+        """
+        return self.get_queryset().with_attributes(attribute_names)
+
 
 class AttributeHub(Model):
     """A standalone hub for custom attributes (key-value storage).
@@ -343,6 +450,10 @@ class AttributeHub(Model):
 
     def get_attribute(self, name: str) -> Any:
         """Get a custom attribute value by name."""
+        annotated = self.__dict__.get("_annotated_attributes", {})
+        if name in annotated:
+            return annotated[name]
+
         if (
             hasattr(self, "_prefetched_objects_cache")
             and "custom_attributes" in self._prefetched_objects_cache
@@ -362,6 +473,56 @@ class AttributeHub(Model):
         except CustomAttribute.DoesNotExist:
             return None
 
+    def get_attributes(self, names: Iterable[str]) -> dict[str, Any]:
+        """Get several custom attribute values by name.
+
+        Values are read from annotations or the prefetch cache where available; the
+        remaining names are fetched with a single query. Names that don't exist map to None.
+        """
+        names = list(dict.fromkeys(names))
+        annotated = self.__dict__.get("_annotated_attributes", {})
+        values: dict[str, Any] = {name: annotated[name] for name in names if name in annotated}
+
+        if (
+            hasattr(self, "_prefetched_objects_cache")
+            and "custom_attributes" in self._prefetched_objects_cache
+        ):
+            wanted = set(names) - values.keys()
+            for attr in self.custom_attributes.all():
+                if attr.name in wanted:
+                    values[attr.name] = attr.value
+
+        missing = [name for name in names if name not in values]
+        if missing:
+            for attr in CustomAttribute.objects.filter(hub=self, name__in=missing):
+                values[attr.name] = attr.value
+
+        return {name: values.get(name) for name in names}
+
+    @classmethod
+    def bulk_get_attributes(
+        cls, hubs: Iterable["AttributeHub"], names: Iterable[str] | None = None
+    ) -> dict["AttributeHub", dict[str, Any]]:
+        """Get custom attribute values for many hubs with a single query.
+
+        Returns a dict keyed by hub, mapping each requested name to its value (or None if
+        the hub doesn't have it). If names is None, every attribute of each hub is returned.
+        """
+        hubs = list(hubs)
+        queryset = CustomAttribute.objects.filter(hub__in=hubs)
+        if names is not None:
+            names = list(dict.fromkeys(names))
+            queryset = queryset.filter(name__in=names)
+
+        values: dict[int, dict[str, Any]] = {hub.pk: {} for hub in hubs}
+        for attr in queryset:
+            values[attr.hub_id][attr.name] = attr.value
+
+        if names is None:
+            return {hub: values[hub.pk] for hub in hubs}
+
+        return {hub: {name: values[hub.pk].get(name) for name in names} for hub in hubs}
+
     def set_attribute(self, name: str, value: Any) -> "CustomAttribute":
         """Set a custom attribute value.
 
@@ -404,11 +565,17 @@ class AttributeHub(Model):
     def delete_attribute(self, name: str) -> bool:
         """Delete a custom attribute by name. Returns True if deleted, False if not found."""
         self._check_write_permission()
-        try:
-            CustomAttribute.objects.get(hub=self, name=name).delete()
-            return True
-        except CustomAttribute.DoesNotExist:
-            return False
+        deleted, _ = CustomAttribute.objects.filter(hub=self, name=name).delete()
+        return deleted > 0
+
+    def delete_attributes(self, names: Iterable[str]) -> int:
+        """Delete several custom attributes by name with a single query.
+
+        Returns the number of attributes deleted.
+        """
+        self._check_write_permission()
+        deleted, _ = CustomAttribute.objects.filter(hub=self, name__in=list(names)).delete()
+        return deleted
 
 
 __exports__ = (
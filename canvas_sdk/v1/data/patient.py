@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Any
+from collections.abc import Iterable
+from typing import Any, Self, cast
 
 import arrow
 from django.contrib.postgres.fields import ArrayField
@@ -8,6 +9,7 @@ from django.db import models
 from django.db.models import TextChoices
 
 from canvas_sdk.v1.data.base import (
+    BaseQuerySet,
     IdentifiableModel,
     MetadataModel,
     Model,
@@ -46,12 +48,44 @@ class PatientSettingConstants:
     PREFERRED_SCHEDULING_TIMEZONE = "preferredSchedulingTimezone"
 
 
+class PatientQuerySet(BaseQuerySet):
+    """A queryset for patients."""
+
+    _settings_names: list[str] | None = None
+    _with_settings = False
+
+    def with_settings(self, names: Iterable[str] | None = None) -> Self:
+        """Load the patients' settings (all of them, or only those named) with one query.
+
+        The settings are attached to each fetched patient, so get_setting() and the
+        properties built on it don't query the database.
+        """
+        qs = self._chain()  # type: ignore[attr-defined]
+        qs._with_settings = True
+        qs._settings_names = None if names is None else list(names)
+        return cast(Self, qs)
+
+    def _clone(self) -> Self:
+        clone = super()._clone()  # type: ignore[misc]
+        clone._with_settings = self._with_settings
+        clone._settings_names = self._settings_names
+        return cast(Self, clone)
+
+    def _fetch_all(self) -> None:
+        fetched = self._result_cache is not None
+        super()._fetch_all()
+        if not fetched and self._with_settings and self._fields is None:  # type: ignore[attr-defined]
+            Patient.load_settings(self._result_cache or [], self._settings_names)
+
+
 class Patient(TimestampedModel):
     """A class representing a patient."""
 
     class Meta:
         db_table = "canvas_sdk_data_api_patient_001"
 
+    objects = PatientQuerySet.as_manager()
+
     id = models.CharField(
         max_length=32, db_column="key", unique=True, editable=False, default=create_key
     )
@@ -140,8 +174,43 @@ class Patient(TimestampedModel):
             age += (time.date() - current_year.date()) / (next_year.date() - current_year.date())
         return age
 
+    @classmethod
+    def load_settings(cls, patients: Iterable[Patient], names: Iterable[str] | None = None) -> None:
+        """Load settings for many patients with one query and attach them to the instances.
+
+        If names is None, every setting is loaded; otherwise only the named ones.
+        """
+        patients = list(patients)
+        if not patients:
+            return
+
+        settings = PatientSetting.objects.filter(patient__in=patients)
+        if names is not None:
+            names = list(names)
+            settings = settings.filter(name__in=names)
+
+        values: dict[int, dict[str, Any]] = {patient.pk: {} for patient in patients}
+        for patient_id, name, value in settings.values_list("patient_id", "name", "value"):
+            values[patient_id][name] = value
+
+        for patient in patients:
+            if names is None:
+                patient.__dict__["_settings_cache"] = values[patient.pk]
+                patient.__dict__["_settings_complete"] = True
+            else:
+                cache = patient.__dict__.setdefault("_settings_cache", {})
+                cache.update({name: values[patient.pk].get(name) for name in names})
+
     def get_setting(self, name: str) -> Any:
-        """Returns a patient setting value by name."""
+        """Returns a patient setting value by name.
+
+        Values loaded by load_settings() or with_settings() are used when present; other
+        values are fetched from the database on each call.
+        """
+        cache = self.__dict__.get("_settings_cache")
+        if cache is not None and (name in cache or self.__dict__.get("_settings_complete")):
+            return cache.get(name)
+
         try:
             return self.settings.get(name=name).value
         except PatientSetting.DoesNotExist:
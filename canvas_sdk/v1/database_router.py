@@ -0,0 +1,109 @@
+"""
+Routing of SDK database reads to read replicas.
+
+Reads of SDK data go to one of the replicas in settings.DATABASE_REPLICAS, chosen once per
+event so that an event sees a single replica. Writes, including writes to namespaced custom
+data, always go to the primary. With read-your-writes enabled, an event's reads move to the
+primary as soon as it writes, so a handler never reads data older than its own writes.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+from typing import Any
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Model as DjangoModel
+
+from canvas_sdk.v1.data.base import Model, ModelExtension
+
+# Thread-local storage for the routing state of the current event
+_routing_state = threading.local()
+
+
+def read_your_writes(enabled: bool = True) -> None:
+    """Set whether the current event's reads follow its writes to the primary database.
+
+    Each event starts with the CANVAS_SDK_DB_READ_YOUR_WRITES setting.
+    """
+    _routing_state.read_your_writes = enabled
+
+
+def use_primary() -> None:
+    """Send the rest of the current event's reads to the primary database."""
+    _routing_state.pinned = True
+
+
+def reset_routing_state(**kwargs: Any) -> None:
+    """Forget the replica, writes and read-your-writes flag of the current event."""
+    for attr in ("replica", "pinned", "read_your_writes"):
+        if hasattr(_routing_state, attr):
+            delattr(_routing_state, attr)
+
+
+request_started.connect(reset_routing_state)
+request_finished.connect(reset_routing_state)
+
+
+def _is_sdk_model(model: type[DjangoModel]) -> bool:
+    """Check if a model is SDK data, as opposed to e.g. the plugins cache table."""
+    return issubclass(model, (Model, ModelExtension))
+
+
+class ReplicaRouter:
+    """A database router sending SDK reads to the replicas and writes to the primary."""
+
+    def __init__(self) -> None:
+        self.replicas: list[str] = list(settings.DATABASE_REPLICAS)
+
+    def db_for_read(self, model: type[DjangoModel], **hints: Any) -> str | None:
+        """Return a replica for reads of SDK data, unless the event is pinned to the primary."""
+        if not self.replicas or not _is_sdk_model(model):
+            return None
+
+        # Reads inside a transaction on the primary belong to that transaction.
+        if (
+            getattr(_routing_state, "pinned", False)
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+
+        replica = getattr(_routing_state, "replica", None)
+        if replica is None:
+            replica = _routing_state.replica = random.choice(self.replicas)
+
+        return replica
+
+    def db_for_write(self, model: type[DjangoModel], **hints: Any) -> str | None:
+        """Return the primary for writes of SDK data, pinning the event's reads to it if needed."""
+        if not _is_sdk_model(model):
+            return None
+
+        if getattr(_routing_state, "read_your_writes", settings.CANVAS_SDK_DB_READ_YOUR_WRITES):
+            _routing_state.pinned = True
+
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: DjangoModel, obj2: DjangoModel, **hints: Any) -> bool | None:
+        """Allow relations between objects from the primary and its replicas."""
+        databases = {DEFAULT_DB_ALIAS, *self.replicas}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(
+        self, db: str, app_label: str, model_name: str | None = None, **hints: Any
+    ) -> bool | None:
+        """Never migrate the replicas, which follow the primary."""
+        if db in self.replicas:
+            return False
+        return None
+
+
+__exports__ = (
+    "read_your_writes",
+    "use_primary",
+)
@@ -7,9 +7,12 @@ Supports both plugin-specific schemas and shared data namespaces.
 from __future__ import annotations
 
 import threading
-from collections.abc import Generator
+from collections.abc import Callable, Generator
 from contextlib import contextmanager
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
+from weakref import WeakKeyDictionary
+
+from django.db.backends.signals import connection_created
 
 if TYPE_CHECKING:
     from django.db.backends.base.base import BaseDatabaseWrapper
@@ -18,6 +21,45 @@ if TYPE_CHECKING:
 _plugin_context = threading.local()
 
 
+class _TransactionalSearchPath:
+    """A search_path set inside a transaction, which a rollback of the transaction, or of the
+    savepoint it was set in, would undo.
+
+    It is trusted for as long as its on_commit callback is registered: Django discards the
+    callbacks of rolled back savepoints and transactions, and runs them once the outermost
+    transaction commits, which records the namespace for good.
+    """
+
+    def __init__(self, raw_connection: Any, namespace: str | None) -> None:
+        self.raw_connection = raw_connection
+        self.namespace = namespace
+
+    def __call__(self) -> None:
+        if _search_paths.get(self.raw_connection) is self:
+            _search_paths[self.raw_connection] = self.namespace
+
+    def is_pending(self, db: BaseDatabaseWrapper) -> bool:
+        """Whether the transaction and savepoints the search_path was set in are still open."""
+        return db.in_atomic_block and any(entry[1] is self for entry in db.run_on_commit)
+
+
+# The namespace last put on the search_path of each DB-API connection (None for public only).
+# Pooled connections keep their session state, so a search_path that is already in place is
+# not set again.
+_search_paths: WeakKeyDictionary[Any, str | None | _TransactionalSearchPath] = WeakKeyDictionary()
+
+# Returned for connections whose search_path was set in a transaction that was rolled back.
+_UNKNOWN = "<unknown>"
+
+
+def _known_search_path(db: BaseDatabaseWrapper, raw_connection: Any) -> str | None:
+    """The namespace on the search_path of a connection, or _UNKNOWN if it may be undone."""
+    search_path = _search_paths.get(raw_connection)
+    if isinstance(search_path, _TransactionalSearchPath):
+        return search_path.namespace if search_path.is_pending(db) else _UNKNOWN
+    return search_path
+
+
 def set_current_plugin(plugin_name: str) -> None:
     """Set the current plugin name for this thread."""
     _plugin_context.plugin_name = plugin_name
@@ -61,26 +103,78 @@ def _is_postgres() -> bool:
     return "postgresql" in settings.DATABASES["default"]["ENGINE"]
 
 
-def _set_search_path(schema: str) -> None:
-    """Set PostgreSQL search_path. No-op on SQLite."""
-    if not _is_postgres():
+def _sync_search_path(db: BaseDatabaseWrapper) -> None:
+    """Set the search_path for the current namespace on a connection, if it isn't already."""
+    db.ensure_connection()
+    raw_connection = db.connection
+    namespace = get_current_schema()
+
+    # Connections never given a namespace still have the default search_path.
+    if _known_search_path(db, raw_connection) == namespace:
         return
 
-    from django.db import connection
+    # Record the change before making it, as the statement itself goes through the wrapper.
+    previous = _search_paths.get(raw_connection)
+    if db.in_atomic_block:
+        search_path = _TransactionalSearchPath(raw_connection, namespace)
+        _search_paths[raw_connection] = search_path
+        db.on_commit(search_path)
+    else:
+        _search_paths[raw_connection] = namespace
+    try:
+        with db.cursor() as cursor:
+            if namespace:
+                cursor.execute("SET search_path = %s, public", [namespace])
+            else:
+                cursor.execute("SET search_path = public")
+    except Exception:
+        if previous is None:
+            _search_paths.pop(raw_connection, None)
+        else:
+            _search_paths[raw_connection] = previous
+        raise
+
 
-    with connection.cursor() as cursor:
-        cursor.execute("SET search_path = %s, public", [schema])
+def _search_path_wrapper(
+    execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict[str, Any]
+) -> Any:
+    """Execute wrapper that brings the search_path up to date before each query."""
+    _sync_search_path(context["connection"])
+    return execute(sql, params, many, context)
 
 
-def _reset_search_path() -> None:
-    """Reset PostgreSQL search_path to default. No-op on SQLite."""
+def _install_search_path_wrapper(db: BaseDatabaseWrapper) -> None:
+    """Install the search_path execute wrapper on a connection, once."""
+    if _search_path_wrapper not in db.execute_wrappers:
+        db.execute_wrappers.insert(0, _search_path_wrapper)
+
+
+def _on_connection_created(sender: Any, connection: BaseDatabaseWrapper, **kwargs: Any) -> None:
+    """Keep the search_path of every PostgreSQL connection in step with the current namespace.
+
+    Pooled connections may still have the namespace of the plugin that last used them, so this
+    applies to connections that never enter a namespace too.
+    """
+    if connection.vendor == "postgresql":
+        _install_search_path_wrapper(connection)
+
+
+connection_created.connect(_on_connection_created)
+
+
+def _set_search_path() -> None:
+    """Put the current namespace on the search_path. No-op on SQLite.
+
+    Later changes, such as leaving the namespace, are applied before the next query runs on
+    the connection, so consecutive handlers sharing a namespace don't reset it in between.
+    """
     if not _is_postgres():
         return
 
     from django.db import connection
 
-    with connection.cursor() as cursor:
-        cursor.execute("SET search_path = public")
+    _install_search_path_wrapper(connection)
+    _sync_search_path(connection)
 
 
 def _swap_to_writable_connection() -> BaseDatabaseWrapper | None:
@@ -141,7 +235,7 @@ def plugin_database_context(
 
     # Only change search_path if a namespace is declared
     if namespace:
-        _set_search_path(namespace)
+        _set_search_path()
 
     # In SQLite mode, the default connection is read-only. Swap to the
     # writable connection for plugins that have read_write access so that
@@ -157,22 +251,16 @@ def plugin_database_context(
         if original_connection is not None:
             _restore_connection(original_connection)
 
-        # Restore previous context
+        # Restore previous context. The search_path follows before the next query.
         if old_plugin:
             _plugin_context.plugin_name = old_plugin
             _plugin_context.schema = old_schema
             _plugin_context.access_level = old_access_level
-            if old_schema:
-                _set_search_path(old_schema)
-            elif namespace:
-                _reset_search_path()
         else:
             # Clear context entirely
             for attr in ("plugin_name", "schema", "access_level"):
                 if hasattr(_plugin_context, attr):
                     delattr(_plugin_context, attr)
-            if namespace:
-                _reset_search_path()
 
 
 __exports__ = (
@@ -1,8 +1,16 @@
-from typing import cast
+from collections.abc import Iterable, Mapping
+from typing import NamedTuple, cast
 
 from canvas_sdk.value_set.value_set import ValueSet
 
 
+class HCCScore(NamedTuple):
+    """The Community RAF total and contributing HCC categories for a set of ICD10 codes."""
+
+    raf: float
+    hccs: dict[str, float]
+
+
 class HCCConditions(ValueSet):
     """HCC Conditions."""
 
@@ -55368,5 +55376,140 @@ class HCCConditions(ValueSet):
             return cast(float, HCCConditions.LABELS[icd10]["CommunityRAF"])
         return 0
 
+    @staticmethod
+    def score_for(icd10s: Iterable[str]) -> HCCScore:
+        """Score a patient's ICD10 codes.
+
+        Each HCC category counts once towards the RAF total, using the highest Community RAF
+        among the codes that map to it, and categories outranked by a more severe one present
+        in the CMS-HCC hierarchy (e.g. diabetes without complication, when diabetes with
+        chronic complications is present) are left out.
+        """
+        hccs: dict[str, float] = {}
+        for icd10 in icd10s:
+            hcc = _HCC_BY_ICD10.get(icd10)
+            if hcc is not None:
+                raf = _RAF_BY_ICD10[icd10]
+                if raf > hccs.get(hcc, -1.0):
+                    hccs[hcc] = raf
+
+        for hcc in [hcc for hcc in hccs if hcc in HCC_HIERARCHY]:
+            for outranked in HCC_HIERARCHY[hcc]:
+                hccs.pop(outranked, None)
+
+        return HCCScore(raf=sum(hccs.values()), hccs=hccs)
+
+    @staticmethod
+    def score_panel(icd10s_by_patient: Mapping[str, Iterable[str]]) -> dict[str, HCCScore]:
+        """Score many patients at once, given a mapping of patient id to ICD10 codes."""
+        return {
+            patient_id: HCCConditions.score_for(icd10s)
+            for patient_id, icd10s in icd10s_by_patient.items()
+        }
+
+
+# The CMS-HCC (V22) hierarchy: when a patient has a category, the categories it outranks don't
+# count towards the RAF total.
+HCC_HIERARCHY: dict[str, tuple[str, ...]] = {
+    "Metastatic Cancer and Acute Leukemia": (
+        "Lung and Other Severe Cancers",
+        "Lymphoma and Other Cancers",
+        "Colorectal, Bladder, and Other Cancers",
+        "Breast, Prostate, and Other Cancers and Tumors",
+    ),
+    "Lung and Other Severe Cancers": (
+        "Lymphoma and Other Cancers",
+        "Colorectal, Bladder, and Other Cancers",
+        "Breast, Prostate, and Other Cancers and Tumors",
+    ),
+    "Lymphoma and Other Cancers": (
+        "Colorectal, Bladder, and Other Cancers",
+        "Breast, Prostate, and Other Cancers and Tumors",
+    ),
+    "Colorectal, Bladder, and Other Cancers": ("Breast, Prostate, and Other Cancers and Tumors",),
+    "Diabetes with Acute Complications": (
+        "Diabetes with Chronic Complications",
+        "Diabetes without Complication",
+    ),
+    "Diabetes with Chronic Complications": ("Diabetes without Complication",),
+    "End-Stage Liver Disease": ("Cirrhosis of Liver", "Chronic Hepatitis"),
+    "Cirrhosis of Liver": ("Chronic Hepatitis",),
+    "Severe Hematological Disorders": (
+        "Coagulation Defects and Other Specified Hematological Disorders",
+    ),
+    "Drug/Alcohol Psychosis": ("Drug/Alcohol Dependence",),
+    "Schizophrenia": ("Major Depressive, Bipolar, and Paranoid Disorders",),
+    "Quadriplegia": (
+        "Paraplegia",
+        "Spinal Cord Disorders/Injuries",
+        "Hemiplegia/Hemiparesis",
+        "Monoplegia, Other Paralytic Syndromes",
+        "Vertebral Fractures without Spinal Cord Injury",
+    ),
+    "Paraplegia": (
+        "Spinal Cord Disorders/Injuries",
+        "Monoplegia, Other Paralytic Syndromes",
+        "Vertebral Fractures without Spinal Cord Injury",
+    ),
+    "Spinal Cord Disorders/Injuries": ("Vertebral Fractures without Spinal Cord Injury",),
+    "Acute Myocardial Infarction": (
+        "Unstable Angina and Other Acute Ischemic Heart Disease",
+        "Angina Pectoris",
+    ),
+    "Unstable Angina and Other Acute Ischemic Heart Disease": ("Angina Pectoris",),
+    "Cerebral Hemorrhage": ("Ischemic or Unspecified Stroke",),
+    "Hemiplegia/Hemiparesis": ("Monoplegia, Other Paralytic Syndromes",),
+    "Atherosclerosis of the Extremities with Ulceration or Gangrene": (
+        "Vascular Disease with Complications",
+        "Vascular Disease",
+        "Chronic Ulcer of Skin, Except Pressure",
+        "Amputation Status, Lower Limb/Amputation Complications",
+    ),
+    "Vascular Disease with Complications": ("Vascular Disease",),
+    "Cystic Fibrosis": (
+        "Chronic Obstructive Pulmonary Disease",
+        "Fibrosis of Lung and Other Chronic Lung Disorder",
+    ),
+    "Chronic Obstructive Pulmonary Disease": ("Fibrosis of Lung and Other Chronic Lung Disorder",),
+    "Aspiration and Specified Bacterial Pneumonias": (
+        "Pneumococcal Pneumonia, Empyema, Lung Abscess",
+    ),
+    "Dialysis Status": (
+        "Acute Renal Failure",
+        "Chronic Kidney Disease (Stage 5)",
+        "Chronic Kidney Disease, Severe (Stage 4)",
+    ),
+    "Acute Renal Failure": (
+        "Chronic Kidney Disease (Stage 5)",
+        "Chronic Kidney Disease, Severe (Stage 4)",
+    ),
+    "Chronic Kidney Disease (Stage 5)": ("Chronic Kidney Disease, Severe (Stage 4)",),
+    "Pressure Ulcer of Skin with Necrosis Through to Muscle, Tendon, or Bone": (
+        "Pressure Ulcer of Skin with Full Thickness Skin Loss",
+        "Chronic Ulcer of Skin, Except Pressure",
+    ),
+    "Pressure Ulcer of Skin with Full Thickness Skin Loss": (
+        "Chronic Ulcer of Skin, Except Pressure",
+    ),
+    "Severe Head Injury": ("Major Head Injury",),
+    "Traumatic Amputations and Complications": (
+        "Amputation Status, Lower Limb/Amputation Complications",
+    ),
+}
+
+# Column lookups over LABELS, so batch scoring avoids nested dict access per code. Codes
+# without an HCC category don't score.
+_HCC_BY_ICD10: dict[str, str] = {
+    icd10: cast(str, label["HCC"]) for icd10, label in HCCConditions.LABELS.items() if label["HCC"]
+}
+_RAF_BY_ICD10: dict[str, float] = {
+    icd10: cast(float, label["CommunityRAF"])
+    for icd10, label in HCCConditions.LABELS.items()
+    if label["HCC"]
+}
+
 
-__exports__ = ("HCCConditions",)
+__exports__ = (
+    "HCCConditions",
+    "HCCScore",
+)
@@ -0,0 +1,133 @@
+import importlib
+import pkgutil
+import threading
+from collections import defaultdict
+from collections.abc import Iterable
+from types import ModuleType
+
+from canvas_sdk.value_set.value_set import CodeConstantsURLMappingMixin, ValueSet
+
+VALUE_SET_MODULES = (
+    "canvas_sdk.value_set.v2022",
+    "canvas_sdk.value_set.v2026",
+    "canvas_sdk.value_set.custom",
+    "canvas_sdk.value_set.hcc2018",
+)
+
+Coding = tuple[str, str]
+
+
+def _iter_modules(module_names: Iterable[str]) -> Iterable[ModuleType]:
+    """Yield the given modules and, for packages, every submodule they contain."""
+    for module_name in module_names:
+        module = importlib.import_module(module_name)
+        yield module
+
+        if hasattr(module, "__path__"):
+            for _, name, _ in pkgutil.walk_packages(module.__path__, prefix=f"{module_name}."):
+                yield importlib.import_module(name)
+
+
+def _iter_value_sets(module_names: Iterable[str]) -> Iterable[type[ValueSet]]:
+    """Yield every ValueSet exported by the given modules, in declaration order."""
+    for module in _iter_modules(module_names):
+        for name in getattr(module, "__exports__", ()):
+            value_set = getattr(module, name, None)
+            if isinstance(value_set, type) and issubclass(value_set, ValueSet):
+                yield value_set
+
+
+class ValueSetIndex:
+    """A reverse index mapping (code system, code) pairs to the value sets containing them.
+
+    Systems may be given either by name (e.g. "SNOMEDCT") or by URL (e.g.
+    "http://snomed.info/sct"). A URL shared by several systems, such as "ICD-10", matches
+    all of them.
+
+    The index may be limited to some of VALUE_SET_MODULES, but can't load any other module.
+    """
+
+    def __init__(self, modules: Iterable[str] = VALUE_SET_MODULES) -> None:
+        modules = tuple(modules)
+        unknown = [module for module in modules if module not in VALUE_SET_MODULES]
+        if unknown:
+            raise ValueError(
+                f"Unknown value set modules {unknown}, expected some of {VALUE_SET_MODULES}"
+            )
+
+        index: dict[Coding, list[type[ValueSet]]] = defaultdict(list)
+
+        for value_set in _iter_value_sets(modules):
+            for system, codes in value_set.values.items():
+                for code in codes:
+                    index[(system, code)].append(value_set)
+
+        self._index: dict[Coding, tuple[type[ValueSet], ...]] = {
+            key: tuple(value_sets) for key, value_sets in index.items()
+        }
+
+        systems_by_url: dict[str, list[str]] = defaultdict(list)
+        for system, url in CodeConstantsURLMappingMixin.CODE_SYSTEM_MAPPING.items():
+            systems_by_url[url].append(system)
+
+        self._systems: dict[str, tuple[str, ...]] = {
+            url: tuple(systems) for url, systems in systems_by_url.items()
+        }
+        for system in CodeConstantsURLMappingMixin.CODE_SYSTEM_MAPPING:
+            self._systems[system] = (system,)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def lookup(self, system: str, code: str) -> tuple[type[ValueSet], ...]:
+        """Return the value sets that contain the given code.
+
+        For example:
+
+        from canvas_sdk.value_set.index import get_value_set_index
+        get_value_set_index().lookup("SNOMEDCT", "44054006")
+        """
+        systems = self._systems.get(system, (system,))
+
+        if len(systems) == 1:
+            return self._index.get((systems[0], code), ())
+
+        value_sets: dict[type[ValueSet], None] = {}
+        for name in systems:
+            value_sets.update(dict.fromkeys(self._index.get((name, code), ())))
+
+        return tuple(value_sets)
+
+    def lookup_many(self, codings: Iterable[Coding]) -> dict[Coding, tuple[type[ValueSet], ...]]:
+        """Return a mapping of each given (system, code) pair to the value sets containing it."""
+        return {(system, code): self.lookup(system, code) for system, code in codings}
+
+    def value_sets_for(self, codings: Iterable[Coding]) -> set[type[ValueSet]]:
+        """Return the set of value sets that contain any of the given (system, code) pairs."""
+        return {
+            value_set
+            for value_sets in self.lookup_many(codings).values()
+            for value_set in value_sets
+        }
+
+
+_index: ValueSetIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_value_set_index() -> ValueSetIndex:
+    """Return the shared ValueSetIndex, building it on first use."""
+    global _index
+
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ValueSetIndex()
+
+    return _index
+
+
+__exports__ = (
+    "ValueSetIndex",
+    "get_value_set_index",
+)
@@ -1,7 +1,9 @@
 import logging
 import os
+import threading
+import time
 from collections.abc import Generator
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 from contextvars import ContextVar
 from typing import Any
 
@@ -56,6 +58,158 @@ class PluginNameFilter(logging.Filter):
         return True
 
 
+class TokenBucket:
+    """Allows `rate` events per second, after an initial burst of `capacity`."""
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+
+    def take(self, now: float) -> bool:
+        """Take a token if one is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class PluginRateLimitFilter(logging.Filter):
+    """Rate limit the log messages of each plugin, per level, with token buckets.
+
+    Must come after ``PluginNameFilter``, which sets the plugin of each record; messages
+    logged outside of a plugin aren't limited. While a plugin is being limited, a summary of
+    the messages suppressed is logged every ``summary_interval`` seconds, by a background
+    thread if no other message from the plugin arrives, and on ``close``.
+    """
+
+    def __init__(
+        self,
+        rate: float | None = None,
+        burst: int | None = None,
+        plugin_rates: dict[str, float] | None = None,
+        summary_interval: float | None = None,
+    ) -> None:
+        super().__init__()
+        self.rate = settings.PLUGIN_LOG_RATE_LIMIT if rate is None else rate
+        self.burst = settings.PLUGIN_LOG_BURST if burst is None else burst
+        self.plugin_rates = (
+            settings.PLUGIN_LOG_RATE_LIMITS if plugin_rates is None else plugin_rates
+        )
+        self.summary_interval = (
+            settings.PLUGIN_LOG_SUPPRESSION_SUMMARY_SECONDS
+            if summary_interval is None
+            else summary_interval
+        )
+        self._lock = threading.Lock()
+        self._buckets: dict[tuple[str, int], TokenBucket] = {}
+        self._suppressed: dict[tuple[str, int], int] = {}
+        self._summarized_at: dict[tuple[str, int], float] = {}
+        self._logger_names: dict[tuple[str, int], str] = {}
+        self._stopped = threading.Event()
+        self._summarizer_lock = threading.Lock()
+        self._summarizer_pid: int | None = None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Drop the record if its plugin is over its limit for the record's level."""
+        plugin_name = getattr(record, "plugin_name", None)
+        if not plugin_name or getattr(record, "rate_limit_summary", False):
+            return True
+
+        rate = self.plugin_rates.get(plugin_name, self.rate)
+        if rate <= 0:
+            return True
+
+        key = (plugin_name, record.levelno)
+        now = time.monotonic()
+        summary = None
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate, max(self.burst, 1), now)
+                self._summarized_at[key] = now
+
+            allowed = bucket.take(now)
+            if not allowed:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                self._logger_names[key] = record.name
+
+            if (
+                self._suppressed.get(key)
+                and now - self._summarized_at[key] >= self.summary_interval
+            ):
+                summary = self._suppressed.pop(key)
+                self._summarized_at[key] = now
+
+        if summary:
+            self._log_summary(key, summary)
+        elif not allowed:
+            self._ensure_summarizer()
+
+        return allowed
+
+    def flush(self, force: bool = False) -> None:
+        """Log the summaries that are due, or every pending summary if `force` is set."""
+        now = time.monotonic()
+        summaries = []
+        with self._lock:
+            for key in list(self._suppressed):
+                if force or now - self._summarized_at[key] >= self.summary_interval:
+                    summaries.append((key, self._suppressed.pop(key)))
+                    self._summarized_at[key] = now
+
+        for key, count in summaries:
+            self._log_summary(key, count)
+
+    def close(self) -> None:
+        """Stop the summarizer, logging the pending summaries."""
+        self._stopped.set()
+        self.flush(force=True)
+
+    def _log_summary(self, key: tuple[str, int], count: int) -> None:
+        plugin_name, levelno = key
+        rate = self.plugin_rates.get(plugin_name, self.rate)
+        # Summaries may be logged outside of the plugin's handler, e.g. by the summarizer, so
+        # bind the plugin for PluginNameFilter to label them like the messages suppressed.
+        context = (
+            nullcontext()
+            if _current_plugin_name.get() == plugin_name
+            else plugin_context(plugin_name)
+        )
+        with context:
+            logging.getLogger(self._logger_names[key]).log(
+                levelno,
+                f"Suppressed {count} {logging.getLevelName(levelno)} messages from {plugin_name} "
+                f"in the last {self.summary_interval:g}s (limit: {rate:g}/s)",
+                extra={"rate_limit_summary": True},
+            )
+
+    def _ensure_summarizer(self) -> None:
+        """Start the thread logging the summaries of this process, if it isn't running."""
+        pid = os.getpid()
+        if self._summarizer_pid == pid or self._stopped.is_set():
+            return
+
+        with self._summarizer_lock:
+            if self._summarizer_pid == pid:
+                return
+            self._summarizer_pid = pid
+
+        threading.Thread(
+            target=self._run_summarizer, name="log-rate-limit-summarizer", daemon=True
+        ).start()
+
+    def _run_summarizer(self) -> None:
+        while not self._stopped.wait(self.summary_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"PluginRateLimitFilter: failed to log suppression summaries: {e}")
+
+
 class PluginLogger:
     """A custom logger for plugins."""
 
@@ -63,6 +217,8 @@ class PluginLogger:
         self.logger = logging.getLogger("plugin_runner_logger")
         self.logger.setLevel(logging.INFO)
         self.logger.addFilter(PluginNameFilter())
+        self.rate_limit_filter = PluginRateLimitFilter()
+        self.logger.addFilter(self.rate_limit_filter)
 
         log_prefix = f"{os.getenv('HOSTNAME', '?')}: {os.getenv('APTIBLE_PROCESS_INDEX', '?')}"
 
@@ -94,6 +250,10 @@ class PluginLogger:
             logstash_handler.setFormatter(LogstashFormatterECS())
             self.logger.addHandler(logstash_handler)
 
+    def close(self) -> None:
+        """Logs the pending rate limit summaries, before shutting down."""
+        self.rate_limit_filter.close()
+
     def debug(self, message: Any, *args: Any, **kwargs: Any) -> None:
         """Logs a debug message."""
         self.logger.debug(message, *args, **kwargs)
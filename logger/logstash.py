@@ -1,10 +1,13 @@
 import contextlib
 import datetime
+import gzip
 import json
 import logging
 import re
 import sys
+import time
 import traceback
+from collections.abc import Iterator
 from logging import LogRecord
 from types import TracebackType
 from typing import Any
@@ -13,26 +16,102 @@ import requests
 from django.conf import settings
 
 
+def _encode(event: Any) -> bytes:
+    return event if isinstance(event, bytes) else str(event).encode()
+
+
 class HttpTransport:
     """
     Send messages to Logstash in V1 format.
+
+    Each event is POSTed as a JSON request. With LOGSTASH_BULK set, each batch of events is
+    POSTed as one newline-delimited JSON request instead, gzipped when LOGSTASH_GZIP is set;
+    the Logstash http input must then decode application/x-ndjson with the json_lines codec.
+    Failed requests are retried with exponential backoff, after which their events are
+    dropped and counted.
     """
 
+    # The largest request body, before compression; bigger batches are split.
+    max_request_bytes = 5 * 1024 * 1024
+
+    # Seconds to wait before the first retry, doubled for each one after.
+    backoff_seconds = 0.5
+
     def __init__(self, host: str, **kwargs: Any) -> None:
         self.url = host
+        self.bulk = settings.LOGSTASH_BULK
+        self.gzip = self.bulk and settings.LOGSTASH_GZIP
+        self.max_retries = settings.LOGSTASH_MAX_RETRIES
+        self.dropped = 0
 
         self.session = requests.Session()
-        self.session.headers.update({"Content-Type": "application/json"})
+        self.session.headers.update(
+            {"Content-Type": "application/x-ndjson" if self.bulk else "application/json"}
+        )
+        if self.gzip:
+            self.session.headers.update({"Content-Encoding": "gzip"})
 
     def send(self, events: list[Any], **kwargs: Any) -> None:
         """Send events to Logstash."""
+        for body, count in self._bodies(events):
+            if self.gzip:
+                body = gzip.compress(body)
+
+            if not self._post(body):
+                self.dropped += count
+                print(
+                    f"Logstash: dropped {count} events after {self.max_retries} retries "
+                    f"({self.dropped} dropped in total)"
+                )
+
+    def _bodies(self, events: list[Any]) -> Iterator[tuple[bytes, int]]:
+        """Yield the body of each request, with the number of events it holds."""
+        if not self.bulk:
+            for event in events:
+                yield _encode(event), 1
+            return
+
+        for chunk in self._chunks(events):
+            yield b"".join(chunk), len(chunk)
+
+    def _chunks(self, events: list[Any]) -> Iterator[list[bytes]]:
+        """Split events into lines of newline-delimited JSON, at most max_request_bytes each."""
+        chunk: list[bytes] = []
+        size = 0
         for event in events:
+            line = _encode(event).rstrip(b"\n") + b"\n"
+            if chunk and size + len(line) > self.max_request_bytes:
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(line)
+            size += len(line)
+
+        if chunk:
+            yield chunk
+
+    def _post(self, body: bytes) -> bool:
+        """POST a request body, retrying failures. Returns whether it was accepted."""
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff_seconds * 2 ** (attempt - 1))
+
             try:
-                self.session.post(self.url, data=event)
+                response = self.session.post(self.url, data=body)
             except (KeyboardInterrupt, SystemExit):
                 raise
-            except BaseException as e:
+            except requests.RequestException as e:
                 print("Logstash exception", e)
+                continue
+
+            if response.ok:
+                return True
+
+            print(f"Logstash responded with {response.status_code}")
+            # Other client errors would fail again.
+            if response.status_code < 500 and response.status_code not in (408, 429):
+                return False
+
+        return False
 
     def close(self) -> None:
         """Close the transport."""
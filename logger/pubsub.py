@@ -1,26 +1,153 @@
 import logging
-from typing import Any
+import os
+import queue
+import threading
+from typing import Any, Literal, cast, get_args
 
 import redis
+from django.conf import settings
 
 from pubsub.pubsub import Publisher
 
+DropPolicy = Literal["newest", "oldest"]
+
+DROP_POLICIES = get_args(DropPolicy)
+
 
 class PubSubLogHandler(logging.Handler):
-    """Custom logging handler that publishes logs to a pub/sub channel."""
+    """Custom logging handler that publishes logs to a pub/sub channel.
+
+    Records are formatted and queued by the logging thread, and published in batches by a
+    background sender, so logging never waits on Redis. When the queue is full, either the
+    new message or the oldest queued one is dropped, and the number of dropped messages is
+    published with the next batch.
+    """
+
+    def __init__(
+        self,
+        capacity: int | None = None,
+        batch_size: int | None = None,
+        flush_interval: float | None = None,
+        drop: DropPolicy | None = None,
+    ) -> None:
+        self.drop = cast(DropPolicy, settings.PUBSUB_LOG_DROP_POLICY if drop is None else drop)
+        if self.drop not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{self.drop}', expected one of {DROP_POLICIES}")
 
-    def __init__(self) -> None:
         self.publisher = Publisher()
+        self.batch_size = settings.PUBSUB_LOG_BATCH_SIZE if batch_size is None else batch_size
+        self.flush_interval = (
+            settings.PUBSUB_LOG_FLUSH_INTERVAL_SECONDS if flush_interval is None else flush_interval
+        )
+        self._capacity = settings.PUBSUB_LOG_QUEUE_SIZE if capacity is None else capacity
+        self._stopped = threading.Event()
+        self._sender_lock = threading.Lock()
+        self._sender_pid: int | None = None
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
         logging.Handler.__init__(self=self)
 
+    def _reset(self) -> None:
+        """Drop the queued messages, e.g. a forked child's copy of its parent's."""
+        self._queue: queue.Queue[str] = queue.Queue(maxsize=self._capacity)
+        self._dropped = 0
+        self._send_lock = threading.Lock()
+
     def emit(self, record: Any) -> None:
-        """Publishes the log message to the pub/sub channel."""
-        message = self.format(record)
+        """Queues the log message to be published to the pub/sub channel."""
+        try:
+            message = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        self._enqueue(message)
+        self._ensure_sender()
+
+    def _enqueue(self, message: str) -> None:
+        try:
+            self._queue.put_nowait(message)
+            return
+        except queue.Full:
+            pass
+
+        if self.drop == "oldest":
+            try:
+                self._queue.get_nowait()
+                self._queue.put_nowait(message)
+            except (queue.Empty, queue.Full):
+                pass
+
+        self._dropped += 1
+
+    def flush(self) -> None:
+        """Publishes every queued message."""
+        while self._send_batch():
+            pass
 
+    def close(self) -> None:
+        """Stops the sender, publishing the queued messages."""
+        self._stopped.set()
         try:
-            self.publisher.publish(message)
-        except redis.ConnectionError as e:
-            print(f"PubSubLogHandler: failed to log message due to redis error: {e}")
+            self.flush()
+        finally:
+            super().close()
+
+    def _send_batch(self, timeout: float | None = None) -> bool:
+        """Publish the next batch of messages, waiting for the first up to `timeout` seconds.
+
+        Returns:
+            Whether any messages were published.
+        """
+        try:
+            if timeout is None:
+                messages = [self._queue.get_nowait()]
+            else:
+                messages = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return False
+
+        while len(messages) < self.batch_size:
+            try:
+                messages.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        # Reading and resetting the count isn't atomic, so a drop may be reported late.
+        dropped, self._dropped = self._dropped, 0
+        if dropped:
+            messages.append(f"PubSubLogHandler: dropped {dropped} log messages")
+
+        with self._send_lock:
+            try:
+                self.publisher.publish_many(messages)
+            except redis.RedisError as e:
+                print(
+                    f"PubSubLogHandler: failed to log {len(messages)} messages due to "
+                    f"redis error: {e}"
+                )
+
+        return True
+
+    def _ensure_sender(self) -> None:
+        """Start the thread publishing the messages of this process, if it isn't running."""
+        pid = os.getpid()
+        if self._sender_pid == pid:
+            return
+
+        with self._sender_lock:
+            if self._sender_pid == pid:
+                return
+            self._sender_pid = pid
+
+        threading.Thread(target=self._run_sender, name="pubsub-log-sender", daemon=True).start()
+
+    def _run_sender(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._send_batch(timeout=self.flush_interval)
+            except Exception as e:
+                print(f"PubSubLogHandler: failed to log messages: {e}")
 
 
 __exports__ = ()
@@ -7,9 +7,12 @@ formatter's ``labels.plugin`` / ``labels.handler`` emission.
 
 import json
 import logging
+import time
+from unittest.mock import patch
 
 from logger.logger import (
     PluginNameFilter,
+    PluginRateLimitFilter,
     _current_handler_name,
     _current_plugin_name,
     plugin_context,
@@ -132,3 +135,170 @@ def test_logstash_formatter_omits_plugin_labels_when_no_plugin_context() -> None
 
     assert "plugin" not in output.get("labels", {})
     assert "handler" not in output.get("labels", {})
+
+
+def _plugin_record(plugin_name: str | None, level: int = logging.INFO) -> logging.LogRecord:
+    """Build a record as PluginNameFilter would leave it."""
+    record = _make_record()
+    record.levelno = level
+    record.levelname = logging.getLevelName(level)
+    record.plugin_name = plugin_name
+    return record
+
+
+def test_rate_limit_filter_allows_a_burst_then_the_rate() -> None:
+    """Each plugin gets a burst of messages, then tokens refill at the configured rate."""
+    rate_filter = PluginRateLimitFilter(rate=2, burst=3, plugin_rates={}, summary_interval=60)
+
+    with patch("logger.logger.time.monotonic", return_value=100.0):
+        assert [rate_filter.filter(_plugin_record("chatty")) for _ in range(4)] == [
+            True,
+            True,
+            True,
+            False,
+        ]
+
+    with patch("logger.logger.time.monotonic", return_value=101.0):
+        assert [rate_filter.filter(_plugin_record("chatty")) for _ in range(3)] == [
+            True,
+            True,
+            False,
+        ]
+
+
+def test_rate_limit_filter_is_per_plugin_and_level() -> None:
+    """One plugin or level being limited doesn't limit the others, or runner messages."""
+    rate_filter = PluginRateLimitFilter(rate=1, burst=1, plugin_rates={}, summary_interval=60)
+
+    assert rate_filter.filter(_plugin_record("chatty")) is True
+    assert rate_filter.filter(_plugin_record("chatty")) is False
+    assert rate_filter.filter(_plugin_record("chatty", logging.ERROR)) is True
+    assert rate_filter.filter(_plugin_record("quiet")) is True
+    assert all(rate_filter.filter(_plugin_record(None)) for _ in range(5))
+
+
+def test_rate_limit_filter_per_plugin_rates() -> None:
+    """Plugins can have their own rate, and 0 leaves them unlimited."""
+    rate_filter = PluginRateLimitFilter(
+        rate=0, burst=1, plugin_rates={"chatty": 1, "trusted": 0}, summary_interval=60
+    )
+
+    assert [rate_filter.filter(_plugin_record("chatty")) for _ in range(2)] == [True, False]
+    assert all(rate_filter.filter(_plugin_record("trusted")) for _ in range(5))
+    assert all(rate_filter.filter(_plugin_record("other")) for _ in range(5))
+
+
+def test_rate_limit_filter_logs_suppression_summaries() -> None:
+    """While a plugin is limited, the number of messages suppressed is logged periodically."""
+    rate_filter = PluginRateLimitFilter(rate=1, burst=1, plugin_rates={}, summary_interval=10)
+
+    with (
+        patch("logger.logger.time.monotonic") as mock_monotonic,
+        patch("logger.logger.logging.getLogger") as mock_get_logger,
+    ):
+        mock_monotonic.return_value = 0.0
+        for _ in range(4):
+            rate_filter.filter(_plugin_record("chatty"))
+        mock_get_logger.return_value.log.assert_not_called()
+
+        mock_monotonic.return_value = 10.0
+        rate_filter.filter(_plugin_record("chatty"))
+
+    mock_get_logger.return_value.log.assert_called_once_with(
+        logging.INFO,
+        "Suppressed 3 INFO messages from chatty in the last 10s (limit: 1/s)",
+        extra={"rate_limit_summary": True},
+    )
+
+    summary = _plugin_record("chatty")
+    summary.rate_limit_summary = True
+    assert rate_filter.filter(summary) is True
+
+
+def test_rate_limit_filter_flushes_summaries_without_more_messages() -> None:
+    """Summaries are logged when due, and on close, even if the plugin stops logging."""
+    rate_filter = PluginRateLimitFilter(rate=1, burst=1, plugin_rates={}, summary_interval=10)
+
+    with (
+        patch("logger.logger.time.monotonic") as mock_monotonic,
+        patch("logger.logger.logging.getLogger") as mock_get_logger,
+        patch.object(rate_filter, "_ensure_summarizer") as mock_ensure_summarizer,
+    ):
+        mock_monotonic.return_value = 0.0
+        for _ in range(3):
+            rate_filter.filter(_plugin_record("chatty"))
+        rate_filter.filter(_plugin_record("chatty", logging.ERROR))
+        rate_filter.filter(_plugin_record("chatty", logging.ERROR))
+        mock_ensure_summarizer.assert_called()
+
+        rate_filter.flush()
+        mock_get_logger.return_value.log.assert_not_called()
+
+        mock_monotonic.return_value = 10.0
+        rate_filter.flush()
+        assert mock_get_logger.return_value.log.call_count == 2
+        mock_get_logger.return_value.log.assert_any_call(
+            logging.INFO,
+            "Suppressed 2 INFO messages from chatty in the last 10s (limit: 1/s)",
+            extra={"rate_limit_summary": True},
+        )
+
+        mock_get_logger.return_value.log.reset_mock()
+        mock_monotonic.return_value = 11.0
+        assert [rate_filter.filter(_plugin_record("chatty")) for _ in range(2)] == [True, False]
+        rate_filter.close()
+
+    mock_get_logger.return_value.log.assert_called_once_with(
+        logging.INFO,
+        "Suppressed 1 INFO messages from chatty in the last 10s (limit: 1/s)",
+        extra={"rate_limit_summary": True},
+    )
+
+
+def test_rate_limit_filter_summarizer_flushes_periodically() -> None:
+    """The summarizer thread flushes every summary interval until the filter is closed."""
+    rate_filter = PluginRateLimitFilter(rate=1, burst=1, plugin_rates={}, summary_interval=0.01)
+
+    with patch.object(rate_filter, "flush") as mock_flush:
+        rate_filter._ensure_summarizer()
+        rate_filter._ensure_summarizer()
+        time.sleep(0.1)
+        rate_filter._stopped.set()
+
+    assert mock_flush.call_count >= 2
+
+
+def test_rate_limit_summaries_are_labelled_with_the_plugin() -> None:
+    """Summaries logged outside of the plugin's handler still carry the plugin's name."""
+    records: list[logging.LogRecord] = []
+
+    class ListHandler(logging.Handler):
+        def emit(self, record: logging.LogRecord) -> None:
+            records.append(record)
+
+    handler = ListHandler()
+    rate_filter = PluginRateLimitFilter(rate=1, burst=1, plugin_rates={}, summary_interval=60)
+    logger = logging.getLogger("test_rate_limit_summary_labels")
+    logger.addFilter(PluginNameFilter())
+    logger.addFilter(rate_filter)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+    try:
+        with (
+            patch.object(rate_filter, "_ensure_summarizer"),
+            plugin_context("chatty.handlers.Handler"),
+        ):
+            for _ in range(3):
+                logger.warning("hello")
+
+        rate_filter.close()
+    finally:
+        logger.removeHandler(handler)
+        logger.removeFilter(rate_filter)
+
+    [first, summary] = records
+    assert first.plugin_name == "chatty"  # type: ignore[attr-defined]
+    assert summary.getMessage().startswith("Suppressed 2 WARNING messages from chatty")
+    assert summary.plugin_name == "chatty"  # type: ignore[attr-defined]
+    assert summary.plugin_name_prefix == "[chatty] "  # type: ignore[attr-defined]
@@ -0,0 +1,130 @@
+"""Tests for the retrying, optionally bulk, Logstash ``HttpTransport``."""
+
+import gzip
+from collections.abc import Generator
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+from django.test import override_settings
+
+from logger.logstash import HttpTransport
+
+
+def _response(status_code: int) -> MagicMock:
+    response = MagicMock(status_code=status_code)
+    response.ok = status_code < 400
+    return response
+
+
+@pytest.fixture
+def mock_sleep() -> Generator[MagicMock, None, None]:
+    """Don't wait between retries."""
+    with patch("logger.logstash.time.sleep") as mock_sleep:
+        yield mock_sleep
+
+
+def _mock_session(transport: HttpTransport) -> HttpTransport:
+    transport.session = MagicMock()
+    transport.session.post.return_value = _response(200)
+    return transport
+
+
+@pytest.fixture
+def transport() -> HttpTransport:
+    """A transport with a mock session."""
+    return _mock_session(HttpTransport("https://logstash.example.com"))
+
+
+@pytest.fixture
+def bulk_transport() -> HttpTransport:
+    """A transport sending batches in bulk, with a mock session."""
+    with override_settings(LOGSTASH_BULK=True):
+        return _mock_session(HttpTransport("https://logstash.example.com"))
+
+
+@override_settings(LOGSTASH_GZIP=True)
+def test_events_are_sent_one_json_request_each_by_default() -> None:
+    """Without bulk sending, each event is POSTed as JSON, uncompressed."""
+    transport = HttpTransport("https://logstash.example.com")
+    assert transport.session.headers["Content-Type"] == "application/json"
+    assert "Content-Encoding" not in transport.session.headers
+
+    _mock_session(transport).send(['{"message": "a"}', '{"message": "b"}'])
+
+    bodies = [call.kwargs["data"] for call in transport.session.post.call_args_list]  # type: ignore[attr-defined]
+    assert bodies == [b'{"message": "a"}', b'{"message": "b"}']
+
+
+def test_batch_is_sent_as_one_ndjson_request(bulk_transport: HttpTransport) -> None:
+    """A batch of events is sent in a single newline-delimited request."""
+    bulk_transport.send(['{"message": "a"}', '{"message": "b"}\n'])
+
+    bulk_transport.session.post.assert_called_once_with(  # type: ignore[attr-defined]
+        "https://logstash.example.com", data=b'{"message": "a"}\n{"message": "b"}\n'
+    )
+
+
+def test_large_batches_are_split(bulk_transport: HttpTransport) -> None:
+    """Batches over the maximum request size are split across requests."""
+    bulk_transport.max_request_bytes = 10
+
+    bulk_transport.send(["aaaa", "bbbb", "cccc"])
+
+    bodies = [call.kwargs["data"] for call in bulk_transport.session.post.call_args_list]  # type: ignore[attr-defined]
+    assert bodies == [b"aaaa\nbbbb\n", b"cccc\n"]
+
+
+@override_settings(LOGSTASH_BULK=True, LOGSTASH_GZIP=True)
+def test_gzip() -> None:
+    """With gzip enabled, bulk request bodies are compressed."""
+    transport = HttpTransport("https://logstash.example.com")
+    assert transport.session.headers["Content-Type"] == "application/x-ndjson"
+    assert transport.session.headers["Content-Encoding"] == "gzip"
+
+    transport.session = MagicMock()
+    transport.session.post.return_value = _response(200)
+    transport.send(["a", "b"])
+
+    body = transport.session.post.call_args.kwargs["data"]
+    assert gzip.decompress(body) == b"a\nb\n"
+
+
+def test_failures_are_retried_with_backoff(transport: HttpTransport, mock_sleep: MagicMock) -> None:
+    """Connection errors and server errors are retried, waiting longer each time."""
+    transport.session.post.side_effect = [  # type: ignore[attr-defined]
+        requests.ConnectionError("down"),
+        _response(503),
+        _response(200),
+    ]
+
+    transport.send(["a"])
+
+    assert transport.session.post.call_count == 3  # type: ignore[attr-defined]
+    assert [call.args[0] for call in mock_sleep.call_args_list] == [0.5, 1.0]
+    assert transport.dropped == 0
+
+
+def test_events_are_dropped_after_the_retries(
+    bulk_transport: HttpTransport, mock_sleep: MagicMock, capsys: pytest.CaptureFixture
+) -> None:
+    """Events that can't be sent after the retries are dropped and counted."""
+    bulk_transport.session.post.return_value = _response(500)  # type: ignore[attr-defined]
+
+    bulk_transport.send(["a", "b"])
+
+    assert bulk_transport.session.post.call_count == bulk_transport.max_retries + 1  # type: ignore[attr-defined]
+    assert bulk_transport.dropped == 2
+    assert "Logstash: dropped 2 events after 3 retries (2 dropped in total)" in (
+        capsys.readouterr().out
+    )
+
+
+def test_client_errors_are_not_retried(transport: HttpTransport, mock_sleep: MagicMock) -> None:
+    """Requests rejected by Logstash aren't retried."""
+    transport.session.post.return_value = _response(400)  # type: ignore[attr-defined]
+
+    transport.send(["a"])
+
+    transport.session.post.assert_called_once()  # type: ignore[attr-defined]
+    assert transport.dropped == 1
@@ -0,0 +1,140 @@
+"""Tests for the queue-backed, batched ``PubSubLogHandler``."""
+
+import logging
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+import redis
+from django.test import override_settings
+
+from logger.pubsub import PubSubLogHandler
+
+
+def _record(message: str) -> logging.LogRecord:
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None)
+
+
+@pytest.fixture
+def handler() -> PubSubLogHandler:
+    """A handler with a mock publisher and a small queue, whose sender isn't started."""
+    with patch("logger.pubsub.Publisher"):
+        handler = PubSubLogHandler(capacity=3, batch_size=2)
+    handler._sender_pid = -1
+    handler._ensure_sender = MagicMock()  # type: ignore[method-assign]
+    return handler
+
+
+def _published(handler: PubSubLogHandler) -> list[list[str]]:
+    publish_many = handler.publisher.publish_many
+    return [call.args[0] for call in publish_many.call_args_list]  # type: ignore[attr-defined]
+
+
+def test_emit_queues_without_publishing(handler: PubSubLogHandler) -> None:
+    """Emitting a record doesn't publish it from the logging thread."""
+    handler.emit(_record("hello"))
+
+    assert _published(handler) == []
+    handler._ensure_sender.assert_called_once()  # type: ignore[attr-defined]
+
+
+def test_flush_publishes_in_batches(handler: PubSubLogHandler) -> None:
+    """Queued messages are published a batch per round-trip."""
+    for message in ("a", "b", "c"):
+        handler.emit(_record(message))
+
+    handler.flush()
+
+    assert _published(handler) == [["a", "b"], ["c"]]
+
+
+def test_full_queue_drops_newest_and_reports_it(handler: PubSubLogHandler) -> None:
+    """By default, messages that don't fit are dropped, and the drop is published."""
+    for message in ("a", "b", "c", "d", "e"):
+        handler.emit(_record(message))
+
+    handler.flush()
+
+    assert _published(handler) == [
+        ["a", "b", "PubSubLogHandler: dropped 2 log messages"],
+        ["c"],
+    ]
+
+
+def test_full_queue_can_drop_oldest(handler: PubSubLogHandler) -> None:
+    """With the "oldest" policy, the oldest queued messages make room for new ones."""
+    handler.drop = "oldest"
+    for message in ("a", "b", "c", "d", "e"):
+        handler.emit(_record(message))
+
+    handler.flush()
+
+    assert _published(handler) == [["c", "d", "PubSubLogHandler: dropped 2 log messages"], ["e"]]
+
+
+def test_redis_errors_are_reported(
+    handler: PubSubLogHandler, capsys: pytest.CaptureFixture
+) -> None:
+    """A Redis error drops the batch and is printed, rather than raised."""
+    handler.publisher.publish_many.side_effect = redis.ConnectionError("down")  # type: ignore[attr-defined]
+    handler.emit(_record("a"))
+
+    handler.flush()
+
+    assert "failed to log 1 messages due to redis error: down" in capsys.readouterr().out
+
+
+def test_sender_publishes_in_the_background() -> None:
+    """The sender thread publishes queued messages without waiting for a flush."""
+    with patch("logger.pubsub.Publisher"):
+        handler = PubSubLogHandler(flush_interval=0.01)
+    published = threading.Event()
+    handler.publisher.publish_many.side_effect = lambda messages: published.set()  # type: ignore[attr-defined]
+
+    try:
+        handler.emit(_record("hello"))
+        assert published.wait(timeout=5)
+    finally:
+        handler.close()
+
+
+def test_slow_redis_does_not_block_logging() -> None:
+    """Logging returns right away even while Redis is slow."""
+    with patch("logger.pubsub.Publisher"):
+        handler = PubSubLogHandler(flush_interval=0.01)
+    release = threading.Event()
+    handler.publisher.publish_many.side_effect = lambda messages: release.wait(5)  # type: ignore[attr-defined]
+
+    try:
+        start = time.monotonic()
+        for i in range(100):
+            handler.emit(_record(str(i)))
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
+        handler.close()
+
+
+@override_settings(
+    PUBSUB_LOG_QUEUE_SIZE=7,
+    PUBSUB_LOG_BATCH_SIZE=3,
+    PUBSUB_LOG_FLUSH_INTERVAL_SECONDS=0.5,
+    PUBSUB_LOG_DROP_POLICY="oldest",
+)
+def test_defaults_come_from_settings() -> None:
+    """The queue size, batching and drop policy are configured in settings."""
+    with patch("logger.pubsub.Publisher"):
+        handler = PubSubLogHandler()
+
+    assert handler._capacity == 7
+    assert handler.batch_size == 3
+    assert handler.flush_interval == 0.5
+    assert handler.drop == "oldest"
+
+
+@override_settings(PUBSUB_LOG_DROP_POLICY="random")
+def test_unknown_drop_policy_is_rejected() -> None:
+    """A misconfigured drop policy fails when the handler is created."""
+    with patch("logger.pubsub.Publisher"), pytest.raises(ValueError):
+        PubSubLogHandler()
@@ -45,8 +45,11 @@ from canvas_sdk.events import Event, EventRequest, EventResponse, EventType
 from canvas_sdk.handlers.simple_api.websocket import DenyConnection
 from canvas_sdk.protocols import ClinicalQualityMeasure
 from canvas_sdk.templates.utils import _engine_for_plugin
-from canvas_sdk.utils import metrics
+from canvas_sdk.utils import flight_recorder, metrics, tracing
 from canvas_sdk.utils.metrics import measured
+from canvas_sdk.utils.openmetrics import add_json_route, start_openmetrics_server
+from canvas_sdk.utils.openmetrics import registry as openmetrics_registry
+from canvas_sdk.utils.query_budget import QueryBudget, inspect_queries
 from canvas_sdk.v1.data.base import IS_SQLITE
 from canvas_sdk.v1.plugin_database_context import plugin_database_context
 from logger import log
@@ -65,6 +68,7 @@ from plugin_runner.installation import (
     register_plugin_app_config,
     uninstall_plugin,
 )
+from plugin_runner.profiler import PluginProfiler, ProfileMode
 from plugin_runner.sandbox import Sandbox, sandbox_from_module
 from settings import (
     CHANNEL_NAME,
@@ -118,6 +122,7 @@ Plugin = TypedDict(
         "handler": Any,
         "secrets": dict[str, str],
         "namespace_config": NotRequired[dict[str, str] | None],
+        "query_budget": NotRequired[QueryBudget | None],
     },
 )
 
@@ -133,6 +138,9 @@ ENVIRONMENT: dict = {
 # a global dictionary of events to handler class names
 EVENT_HANDLER_MAP: dict[str, list] = defaultdict(list)
 
+# the profiler of plugins' compute() calls, turned on for a plugin on demand
+PROFILER = PluginProfiler(settings.PLUGIN_RUNNER_PROFILE_DIR)
+
 
 class DataAccess(TypedDict):
     """DataAccess."""
@@ -180,6 +188,14 @@ class CustomData(TypedDict):
     access: str  # "read" or "read_write"
 
 
+class QueryBudgetConfig(TypedDict):
+    """The queries each handler invocation of a plugin may run."""
+
+    max_queries: NotRequired[int]
+    max_db_time_ms: NotRequired[float]
+    on_exceed: NotRequired[str]  # "warn" (default) or "fail"
+
+
 class PluginManifest(TypedDict):
     """PluginManifest."""
 
@@ -195,6 +211,7 @@ class PluginManifest(TypedDict):
     diagram: bool
     readme: str
     custom_data: NotRequired[CustomData]
+    query_budget: NotRequired[QueryBudgetConfig]
 
 
 _sqlite_schema_initialized = False
@@ -225,8 +242,20 @@ class PluginRunner(PluginRunnerServicer):
     def HandleEvent(self, request: EventRequest, context: Any) -> Iterable[EventResponse]:
         """This is invoked when an event comes in."""
         event = Event(request)
-        with metrics.measure(
-            metrics.get_qualified_name(self.HandleEvent), extra_tags={"event": event.name}
+        with (
+            metrics.measure(
+                metrics.get_qualified_name(self.HandleEvent), extra_tags={"event": event.name}
+            ),
+            tracing.span(
+                "HandleEvent",
+                {
+                    "event": event.name,
+                    "target": event.target.id,
+                    "target_type": request.target_type,
+                },
+            ),
+            tracing.trace_queries(),
+            flight_recorder.record_event(event.name, target=event.target.id),
         ):
             event_type = event.type
             event_name = event.name
@@ -296,10 +325,19 @@ class PluginRunner(PluginRunnerServicer):
                         {"graphql_jwt": token_for_plugin(plugin_name=plugin_name, audience="home")}
                     )
 
+                    span_attributes = {
+                        "plugin": base_plugin_name,
+                        "handler": f"{handler_path}.{handler_classname}",
+                    }
+
                     try:
-                        handler = handler_class(event, secrets, ENVIRONMENT)
+                        with tracing.span("instantiate", span_attributes):
+                            handler = handler_class(event, secrets, ENVIRONMENT)
+
+                        with tracing.span("accept_event", span_attributes):
+                            accepted = handler.accept_event()
 
-                        if not handler.accept_event():
+                        if not accepted:
                             continue
                         relevant_plugin_handlers.append(handler_class)
 
@@ -332,6 +370,13 @@ class PluginRunner(PluginRunnerServicer):
                                 namespace=db_namespace,
                                 access_level=db_access_level,
                             ),
+                            inspect_queries(
+                                name=handler_name,
+                                budget=plugin.get("query_budget"),
+                                extra_tags={"plugin": base_plugin_name, "event": event_name},
+                            ),
+                            tracing.span("compute", span_attributes),
+                            PROFILER.profile(base_plugin_name),
                         ):
                             _effects = handler.compute()
                             if _effects is None:
@@ -358,7 +403,8 @@ class PluginRunner(PluginRunnerServicer):
                                 )
                                 for effect in _effects
                             ]
-                            effects = validate_effects(effects)
+                            with tracing.span("validate_effects", {"effects": len(effects)}):
+                                effects = validate_effects(effects)
 
                             apply_effects_to_context(effects, event=event)
 
@@ -526,6 +572,14 @@ def synchronize_plugins(run_once: bool = False) -> None:
                 log.info(f'synchronize_plugins: uninstalling plugin "{plugin_name}"')
                 unload_plugin(plugin_name)
                 uninstall_plugin(plugin_name)
+            elif data["action"] == "profile" and plugin_name:
+                PROFILER.start(
+                    plugin_name,
+                    invocations=data.get("invocations", settings.PLUGIN_RUNNER_PROFILE_INVOCATIONS),
+                    mode=data.get("mode", settings.PLUGIN_RUNNER_PROFILE_MODE),
+                )
+            elif data["action"] == "stop_profile" and plugin_name:
+                PROFILER.stop(plugin_name)
         except Exception as e:
             if isinstance(e, PluginInstallationError):
                 message = "install_plugins failed"
@@ -938,6 +992,8 @@ def load_or_reload_plugin(path: pathlib.Path) -> bool:
                     f"with '{namespace_config['access_level']}' access"
                 )
 
+        query_budget = QueryBudget.from_manifest(cast(dict, manifest_json.get("query_budget")))
+
         # TODO add existing schema validation from Michela here
         try:
             components = manifest_json["components"]
@@ -987,6 +1043,7 @@ def load_or_reload_plugin(path: pathlib.Path) -> bool:
                 LOADED_PLUGINS[name_and_class]["sandbox"] = result
                 LOADED_PLUGINS[name_and_class]["secrets"] = secrets_json
                 LOADED_PLUGINS[name_and_class]["namespace_config"] = namespace_config
+                LOADED_PLUGINS[name_and_class]["query_budget"] = query_budget
             else:
                 log.info(f'Loading handler "{name_and_class}"')
 
@@ -997,6 +1054,7 @@ def load_or_reload_plugin(path: pathlib.Path) -> bool:
                     "handler": r.handler,
                     "secrets": secrets_json,
                     "namespace_config": namespace_config,
+                    "query_budget": query_budget,
                 }
 
             loaded_handler_count += 1
@@ -1122,6 +1180,32 @@ def load_plugin(path: pathlib.Path) -> None:
     refresh_event_type_map()
 
 
+def runner_gauges(executor: ThreadPoolExecutor) -> list[tuple[str, dict[str, Any], float]]:
+    """Return the runner's queue depth and loaded plugin counts, for OpenMetrics scrapes."""
+    active = [name for name, plugin in LOADED_PLUGINS.items() if plugin["active"]]
+    return [
+        # Requests accepted by the gRPC server that are waiting for a worker thread.
+        ("plugin_runner.queue_depth", {}, executor._work_queue.qsize()),
+        ("plugin_runner.loaded_plugins", {}, len({name.split(":")[0] for name in active})),
+        ("plugin_runner.loaded_handlers", {}, len(active)),
+    ]
+
+
+def toggle_profiling() -> None:
+    """Start profiling the plugins in PLUGIN_RUNNER_PROFILE_PLUGINS, or stop if they are."""
+    plugins = settings.PLUGIN_RUNNER_PROFILE_PLUGINS
+    if any(PROFILER.is_profiling(plugin) for plugin in plugins):
+        for plugin in plugins:
+            PROFILER.stop(plugin)
+    else:
+        for plugin in plugins:
+            PROFILER.start(
+                plugin,
+                invocations=settings.PLUGIN_RUNNER_PROFILE_INVOCATIONS,
+                mode=cast(ProfileMode, settings.PLUGIN_RUNNER_PROFILE_MODE),
+            )
+
+
 # NOTE: specified_plugin_paths powers the `canvas run-plugins` command
 def main(specified_plugin_paths: list[str] | None = None) -> None:
     """Run the server and the synchronize_plugins loop."""
@@ -1140,6 +1224,32 @@ def main(specified_plugin_paths: list[str] | None = None) -> None:
 
     add_PluginRunnerServicer_to_server(PluginRunner(), server)
 
+    flight_recorder.configure(
+        size=settings.FLIGHT_RECORDER_SIZE,
+        min_duration_ms=settings.FLIGHT_RECORDER_MIN_DURATION_MS,
+        dump_threshold_ms=settings.FLIGHT_RECORDER_DUMP_THRESHOLD_MS,
+    )
+
+    if settings.OPENMETRICS_PORT:
+        openmetrics_registry.add_collector(lambda: runner_gauges(executor))
+        if settings.FLIGHT_RECORDER_HTTP_ROUTE:
+            # Served without authentication, so the IDs of event targets are left out.
+            add_json_route(
+                "/debug/slow-events",
+                lambda: flight_recorder.recorder.records(include_target=False),
+            )
+        start_openmetrics_server(
+            settings.OPENMETRICS_PORT,
+            host=settings.OPENMETRICS_HOST,
+            buckets=settings.OPENMETRICS_BUCKETS,
+        )
+
+    if settings.PLUGIN_RUNNER_TRACE_FILE:
+        tracing.set_exporter(
+            tracing.JSONFileExporter(settings.PLUGIN_RUNNER_TRACE_FILE),
+            min_duration_ms=settings.PLUGIN_RUNNER_TRACE_MIN_DURATION_MS,
+        )
+
     log.info(f"Starting server, listening on port {port}")
 
     # Only install plugins and start the synchronizer thread if the plugin runner was not started
@@ -1161,8 +1271,17 @@ def main(specified_plugin_paths: list[str] | None = None) -> None:
         shutdown_reason = signal.Signals(signum).name
         server.stop(grace=0)
 
+    def dump_flight_recorder(_signum: int, _frame: object) -> None:
+        # Dump from a thread, rather than logging from within the signal handler.
+        threading.Thread(target=flight_recorder.recorder.dump, daemon=True).start()
+
+    def handle_profiling_signal(_signum: int, _frame: object) -> None:
+        threading.Thread(target=toggle_profiling, daemon=True).start()
+
     signal.signal(signal.SIGTERM, handle_signal)
     signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGUSR1, dump_flight_recorder)
+    signal.signal(signal.SIGUSR2, handle_profiling_signal)
 
     try:
         server.wait_for_termination()
@@ -1177,6 +1296,7 @@ def main(specified_plugin_paths: list[str] | None = None) -> None:
             STOP_SYNCHRONIZER.set()
             synchronizer_thread.join()
         log.info("Server stopped")
+        log.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,305 @@
+"""
+On-demand profiling of a plugin's compute() calls.
+
+Profiling is turned on for one plugin at a time and a number of invocations, through the
+runner's pubsub channel or a signal. Each profiled invocation has every call on its thread
+timed, or is sampled from a background thread, and the results are written out once enough
+invocations have been profiled: as a pstats file for the former, or as collapsed stacks, the
+input of flamegraph tools, for sampling.
+"""
+
+import pathlib
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Generator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import CodeType, FrameType
+from typing import Any, Literal
+
+from logger import log
+
+ProfileMode = Literal["cprofile", "sample"]
+
+PROFILE_MODES = ("cprofile", "sample")
+
+# How often the stack of a sampled invocation is captured.
+SAMPLE_INTERVAL_SECONDS = 0.005
+
+
+# A function as identified by pstats: its file, first line and name.
+FunctionKey = tuple[str, int, str]
+
+
+@dataclass
+class ProfileSession:
+    """The profiling requested for a plugin, and the results gathered so far."""
+
+    plugin: str
+    mode: ProfileMode
+    remaining: int
+    profiled: int = 0
+    stats: pstats.Stats | None = None
+    stacks: Counter[str] = field(default_factory=Counter)
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({code.co_filename}:{code.co_firstlineno})"
+
+
+def _code_key(code: CodeType) -> FunctionKey:
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+def _builtin_key(function: Any) -> FunctionKey:
+    module = getattr(function, "__module__", None)
+    name = getattr(function, "__qualname__", None) or repr(function)
+    return ("~", 0, f"<built-in method {module}.{name}>" if module else f"<built-in method {name}>")
+
+
+@dataclass
+class _Call:
+    """A call in progress on the profiled thread."""
+
+    key: FunctionKey
+    frame: FrameType | None
+    started_at: float
+    subcall_time: float = 0.0
+
+
+class ThreadProfile:
+    """A deterministic profiler of the calls made on the thread that enables it.
+
+    From Python 3.12, cProfile is built on sys.monitoring and records the calls of every
+    thread, including the other handlers running on the executor. This profiler hooks
+    sys.setprofile instead, which is per thread, and keeps its stats in the format of cProfile
+    so that pstats can load them.
+    """
+
+    def __init__(self) -> None:
+        self.stats: dict[FunctionKey, tuple] = {}
+        # Per function: primitive calls, calls, own time, cumulative time, and the same
+        # figures per caller.
+        self._timings: dict[FunctionKey, list] = {}
+        self._stack: list[_Call] = []
+        self._depth: Counter[FunctionKey] = Counter()
+
+    def enable(self) -> None:
+        """Start profiling the current thread."""
+        if sys.getprofile() is not None:
+            raise ValueError("Another profiling tool is already active")
+        sys.setprofile(self._dispatch)
+
+    def disable(self) -> None:
+        """Stop profiling, dropping the calls still in progress, i.e. the profiler's own."""
+        sys.setprofile(None)
+        self._stack.clear()
+        self._depth.clear()
+
+    def create_stats(self) -> None:
+        """Gather the stats, as pstats.Stats expects of a profiler."""
+        self.stats = {
+            key: (cc, nc, tt, ct, {caller: tuple(t) for caller, t in callers.items()})
+            for key, (cc, nc, tt, ct, callers) in self._timings.items()
+        }
+
+    def _dispatch(self, frame: FrameType, event: str, arg: Any) -> None:
+        now = time.perf_counter()
+        if event == "call":
+            self._push(_code_key(frame.f_code), frame, now)
+        elif event == "c_call":
+            self._push(_builtin_key(arg), None, now)
+        elif event == "return":
+            # Returns from the frames that were running when profiling started are ignored.
+            if self._stack and self._stack[-1].frame is frame:
+                self._pop(now)
+        elif event in ("c_return", "c_exception") and self._stack and self._stack[-1].frame is None:
+            self._pop(now)
+
+    def _push(self, key: FunctionKey, frame: FrameType | None, now: float) -> None:
+        self._depth[key] += 1
+        self._stack.append(_Call(key, frame, now))
+
+    def _pop(self, now: float) -> None:
+        call = self._stack.pop()
+        elapsed = now - call.started_at
+        own_time = elapsed - call.subcall_time
+        self._depth[call.key] -= 1
+        # The time of recursive calls is already part of the outermost call's.
+        primitive = self._depth[call.key] == 0
+        cumulative = elapsed if primitive else 0.0
+
+        timings = self._timings.setdefault(call.key, [0, 0, 0.0, 0.0, {}])
+        timings[0] += primitive
+        timings[1] += 1
+        timings[2] += own_time
+        timings[3] += cumulative
+
+        if self._stack:
+            caller = self._stack[-1]
+            caller.subcall_time += elapsed
+            by_caller = timings[4].setdefault(caller.key, [0, 0, 0.0, 0.0])
+            by_caller[0] += primitive
+            by_caller[1] += 1
+            by_caller[2] += own_time
+            by_caller[3] += cumulative
+
+
+class StackSampler:
+    """Samples the stack of a thread below a base frame, from a background thread."""
+
+    def __init__(self, thread_id: int, base: FrameType | None, interval: float) -> None:
+        self.thread_id = thread_id
+        self.base = base
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def start(self) -> None:
+        """Start sampling."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling, and wait for the last sample."""
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None and frame is not self.base:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+
+class PluginProfiler:
+    """Profiles the compute() calls of the plugins it is asked to."""
+
+    def __init__(self, output_dir: str) -> None:
+        self.output_dir = output_dir
+        self._sessions: dict[str, ProfileSession] = {}
+        self._lock = threading.Lock()
+        # Invocations are profiled one by one, and others running meanwhile are left alone, so
+        # that the profiling overhead falls on a single worker at a time.
+        self._profiling = threading.Lock()
+
+    def start(self, plugin: str, invocations: int = 10, mode: ProfileMode = "cprofile") -> None:
+        """Profile the next invocations of a plugin's handlers."""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profiling mode {mode!r}")
+
+        with self._lock:
+            self._sessions[plugin] = ProfileSession(plugin, mode, remaining=invocations)
+
+        log.info(f"Profiling {invocations} invocations of {plugin} ({mode})")
+
+    def stop(self, plugin: str) -> pathlib.Path | None:
+        """Stop profiling a plugin, writing out what was gathered so far."""
+        with self._lock:
+            session = self._sessions.pop(plugin, None)
+
+        if session is None:
+            return None
+
+        return self._write(session)
+
+    def is_profiling(self, plugin: str) -> bool:
+        """Check if a plugin is being profiled."""
+        return plugin in self._sessions
+
+    @contextmanager
+    def profile(self, plugin: str) -> Generator[None, None, None]:
+        """A context manager profiling the block, if the plugin is being profiled."""
+        session = self._sessions.get(plugin)
+        if session is None or not self._profiling.acquire(blocking=False):
+            yield
+            return
+
+        profile = None
+        sampler = None
+        try:
+            if session.mode == "cprofile":
+                profile = ThreadProfile()
+                try:
+                    profile.enable()
+                except ValueError:
+                    # Another profiler is already running on this thread.
+                    log.warning(f"Unable to profile {plugin}: another profiler is running")
+                    profile = None
+            else:
+                # Frame 0 is this generator and 1 is the context manager's __enter__, so the
+                # stacks are sampled below the frame with the `with` statement.
+                sampler = StackSampler(
+                    threading.get_ident(), sys._getframe(2), SAMPLE_INTERVAL_SECONDS
+                )
+                sampler.start()
+
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            if sampler is not None:
+                sampler.stop()
+            self._profiling.release()
+            self._add(session, profile, sampler)
+
+    def _add(
+        self,
+        session: ProfileSession,
+        profile: ThreadProfile | None,
+        sampler: StackSampler | None,
+    ) -> None:
+        """Add the results of an invocation to its session, and end the session if done."""
+        with self._lock:
+            if self._sessions.get(session.plugin) is not session or (
+                profile is None and sampler is None
+            ):
+                return
+
+            if profile is not None:
+                # pstats loads the stats of any profiler with a create_stats() method.
+                if session.stats is None:
+                    session.stats = pstats.Stats(profile)  # type: ignore[arg-type]
+                else:
+                    session.stats.add(profile)  # type: ignore[arg-type]
+            if sampler is not None:
+                session.stacks.update(sampler.stacks)
+
+            session.profiled += 1
+            session.remaining -= 1
+            if session.remaining > 0:
+                return
+
+            del self._sessions[session.plugin]
+
+        self._write(session)
+
+    def _write(self, session: ProfileSession) -> pathlib.Path | None:
+        """Write the results of a session to the output directory."""
+        if session.profiled == 0:
+            log.info(f"Stopped profiling {session.plugin}, no invocations were profiled")
+            return None
+
+        output_dir = pathlib.Path(self.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{session.plugin}-{time.strftime('%Y%m%d-%H%M%S')}"
+
+        if session.stats is not None:
+            path = output_dir / f"{name}.pstats"
+            session.stats.dump_stats(path)
+        else:
+            path = output_dir / f"{name}.collapsed"
+            path.write_text(
+                "".join(f"{stack} {count}\n" for stack, count in session.stacks.items())
+            )
+
+        log.info(f"Profiled {session.profiled} invocations of {session.plugin}, wrote {path}")
+        return path
@@ -29,6 +29,7 @@ from canvas_sdk.effects.payment_processor import (
 )
 from canvas_sdk.effects.simple_api import AcceptConnection, DenyConnection, Response
 from canvas_sdk.events import Event, EventRequest, EventType
+from canvas_sdk.utils import flight_recorder, tracing
 from plugin_runner.plugin_runner import (
     ENVIRONMENT,
     EVENT_HANDLER_MAP,
@@ -40,6 +41,7 @@ from plugin_runner.plugin_runner import (
     load_plugin,
     load_plugin_handlers,
     load_plugins,
+    runner_gauges,
     synchronize_plugins,
     synchronize_plugins_and_report_errors,
     unload_plugin,
@@ -737,6 +739,34 @@ def _stop_after(n: int) -> Callable[[], bool]:
     return _is_set
 
 
+@pytest.mark.parametrize(
+    "data,expected_call",
+    [
+        (
+            {"action": "profile", "plugin": "my_plugin", "invocations": 5, "mode": "sample"},
+            ("start", ("my_plugin",), {"invocations": 5, "mode": "sample"}),
+        ),
+        ({"action": "stop_profile", "plugin": "my_plugin"}, ("stop", ("my_plugin",), {})),
+    ],
+)
+def test_synchronize_plugins_controls_profiling(
+    data: dict, expected_call: tuple[str, tuple, dict]
+) -> None:
+    """Test that synchronize_plugins starts and stops profiling a plugin."""
+    with (
+        patch("plugin_runner.plugin_runner.get_client") as mock_get_client,
+        patch("plugin_runner.plugin_runner.PROFILER") as mock_profiler,
+    ):
+        mock_pubsub = Mock()
+        mock_get_client.return_value = (Mock(), mock_pubsub)
+        mock_pubsub.get_message.return_value = {"type": "pmessage", "data": pickle.dumps(data)}
+
+        synchronize_plugins(run_once=True)
+
+        method, args, kwargs = expected_call
+        getattr(mock_profiler, method).assert_called_once_with(*args, **kwargs)
+
+
 def test_synchronize_plugins_and_report_errors_suppresses_sentry_during_startup_grace(
     _reset_synchronizer_state: None,
 ) -> None:
@@ -1269,3 +1299,66 @@ def test_main_logs_keyboard_interrupt(
 
     assert any("Server shutting down (reason: SIGINT)" in r.message for r in caplog.records)
     assert any("Server stopped" in r.message for r in caplog.records)
+
+
+@pytest.mark.parametrize("install_test_plugin", ["example_plugin"], indirect=True)
+def test_runner_gauges(install_test_plugin: Path, load_test_plugins: None) -> None:
+    """The OpenMetrics gauges report the executor's queue depth and the active plugins."""
+    executor = MagicMock()
+    executor._work_queue.qsize.return_value = 3
+    active = [name for name, plugin in LOADED_PLUGINS.items() if plugin["active"]]
+
+    gauges = {name: value for name, _, value in runner_gauges(executor)}
+
+    assert gauges == {
+        "plugin_runner.queue_depth": 3,
+        "plugin_runner.loaded_plugins": len({name.split(":")[0] for name in active}),
+        "plugin_runner.loaded_handlers": len(active),
+    }
+    assert gauges["plugin_runner.loaded_handlers"] >= 1
+
+
+@pytest.mark.parametrize("install_test_plugin", ["example_plugin"], indirect=True)
+def test_handle_event_records_spans(
+    install_test_plugin: Path,
+    plugin_runner: PluginRunner,
+    load_test_plugins: None,
+    db: None,
+) -> None:
+    """With tracing on, an event is traced through each step of its handlers."""
+    exporter = MagicMock()
+    tracing.set_exporter(exporter)
+    try:
+        list(plugin_runner.HandleEvent(EventRequest(type=EventType.UNKNOWN), None))
+    finally:
+        tracing.set_exporter(None)
+
+    [spans] = exporter.export.call_args.args
+    root = spans[0]
+    assert root.name == "HandleEvent"
+    assert root.attributes["event"] == "UNKNOWN"
+
+    steps = [s for s in spans if s.parent_id == root.span_id]
+    assert [s.name for s in steps] == ["instantiate", "accept_event", "compute"]
+    assert all(s.attributes["plugin"] == "example_plugin" for s in steps)
+    assert [s.name for s in spans if s.parent_id == steps[2].span_id] == ["validate_effects"]
+
+
+@pytest.mark.parametrize("install_test_plugin", ["example_plugin"], indirect=True)
+def test_handle_event_is_recorded(
+    install_test_plugin: Path,
+    plugin_runner: PluginRunner,
+    load_test_plugins: None,
+    db: None,
+) -> None:
+    """With the flight recorder on, an event's handlers are recorded."""
+    previous = flight_recorder.recorder
+    flight_recorder.configure(size=1, min_duration_ms=0, dump_threshold_ms=0)
+    try:
+        list(plugin_runner.HandleEvent(EventRequest(type=EventType.UNKNOWN), None))
+        [record] = flight_recorder.recorder.records()
+    finally:
+        flight_recorder.recorder = previous
+
+    assert record["event"] == "UNKNOWN"
+    assert [handler["plugin"] for handler in record["handlers"]] == ["example_plugin"]
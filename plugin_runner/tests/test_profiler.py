@@ -0,0 +1,146 @@
+"""Tests for the on-demand plugin profiler in plugin_runner.profiler."""
+
+import pstats
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from plugin_runner.profiler import PluginProfiler
+
+
+def compute() -> int:
+    """Stand in for a handler's compute method."""
+    return sum(range(1000))
+
+
+def recursive_compute(depth: int) -> int:
+    """A compute() calling itself."""
+    return compute() if depth == 0 else recursive_compute(depth - 1)
+
+
+def busy_work(stop: threading.Event) -> None:
+    """Keep a thread busy until told to stop."""
+    while not stop.is_set():
+        compute()
+
+
+def slow_compute() -> None:
+    """A compute() slow enough to be sampled."""
+    time.sleep(0.05)
+
+
+@pytest.fixture
+def profiler(tmp_path: Path) -> PluginProfiler:
+    """A profiler writing to a temporary directory."""
+    return PluginProfiler(str(tmp_path))
+
+
+def test_plugins_not_profiled_are_left_alone(profiler: PluginProfiler, tmp_path: Path) -> None:
+    """Without a request to profile a plugin, nothing is profiled or written."""
+    with profiler.profile("my_plugin"):
+        compute()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cprofile_writes_pstats_after_the_invocations(
+    profiler: PluginProfiler, tmp_path: Path
+) -> None:
+    """The stats of the requested number of invocations are written as a pstats file."""
+    profiler.start("my_plugin", invocations=2)
+
+    for _ in range(3):
+        with profiler.profile("my_plugin"), profiler.profile("other_plugin"):
+            compute()
+
+    assert not profiler.is_profiling("my_plugin")
+    [path] = tmp_path.iterdir()
+    assert path.name.startswith("my_plugin-")
+    assert path.suffix == ".pstats"
+
+    stats = pstats.Stats(str(path))
+    [calls] = [
+        stat[1]
+        for func, stat in stats.stats.items()  # type: ignore[attr-defined]
+        if func[2] == "compute"
+    ]
+    assert calls == 2
+
+
+def test_cprofile_only_profiles_the_invocation_thread(
+    profiler: PluginProfiler, tmp_path: Path
+) -> None:
+    """Calls made on other threads meanwhile, e.g. by other handlers, aren't profiled."""
+    profiler.start("my_plugin", invocations=1)
+    stop = threading.Event()
+    other_thread = threading.Thread(target=busy_work, args=(stop,))
+    other_thread.start()
+
+    try:
+        with profiler.profile("my_plugin"):
+            recursive_compute(3)
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        other_thread.join()
+
+    [path] = tmp_path.iterdir()
+    stats = pstats.Stats(str(path)).stats  # type: ignore[attr-defined]
+    names = {func[2]: stat for func, stat in stats.items()}
+
+    assert "busy_work" not in names
+    assert names["compute"][:2] == (1, 1)
+    assert names["recursive_compute"][:2] == (1, 4)
+    assert [caller[2] for caller in names["compute"][4]] == ["recursive_compute"]
+
+
+def test_sampling_writes_collapsed_stacks(profiler: PluginProfiler, tmp_path: Path) -> None:
+    """Sampled stacks are written in the collapsed format, starting below the caller."""
+    profiler.start("my_plugin", invocations=1, mode="sample")
+
+    with profiler.profile("my_plugin"):
+        slow_compute()
+
+    [path] = tmp_path.iterdir()
+    assert path.suffix == ".collapsed"
+
+    lines = path.read_text().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert stack.startswith("slow_compute (")
+
+
+def test_stop_writes_what_was_gathered(profiler: PluginProfiler, tmp_path: Path) -> None:
+    """Stopping early writes the invocations profiled so far, if any."""
+    profiler.start("my_plugin", invocations=10)
+    assert profiler.stop("my_plugin") is None
+
+    profiler.start("my_plugin", invocations=10)
+    with profiler.profile("my_plugin"):
+        compute()
+
+    path = profiler.stop("my_plugin")
+    assert path is not None and path.exists()
+    assert not profiler.is_profiling("my_plugin")
+
+
+def test_concurrent_invocations_are_not_profiled(profiler: PluginProfiler) -> None:
+    """While one invocation is profiled, others run unprofiled."""
+    profiler.start("my_plugin", invocations=10)
+
+    with patch("plugin_runner.profiler.ThreadProfile") as mock_profile:
+        with profiler.profile("my_plugin"), profiler.profile("my_plugin"):
+            compute()
+
+        mock_profile.assert_called_once()
+
+
+def test_unknown_mode(profiler: PluginProfiler) -> None:
+    """Only the known profiling modes can be requested."""
+    with pytest.raises(ValueError, match="Unknown profiling mode"):
+        profiler.start("my_plugin", mode="perf")  # type: ignore[arg-type]
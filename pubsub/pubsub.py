@@ -14,6 +14,8 @@ CHANNEL_SUFFIX = "plugin-logging-stream"
 class PubSubBase:
     """Base class for pub/sub."""
 
+    channel_suffix = CHANNEL_SUFFIX
+
     def __init__(self) -> None:
         self.redis_endpoint = REDIS_ENDPOINT
         self.channel = self._get_channel_name()
@@ -21,7 +23,7 @@ class PubSubBase:
 
     def _get_channel_name(self) -> str | None:
         if CUSTOMER_IDENTIFIER:
-            return f"{CUSTOMER_IDENTIFIER}:{CHANNEL_SUFFIX}"
+            return f"{CUSTOMER_IDENTIFIER}:{self.channel_suffix}"
 
         return None
 
@@ -46,3 +48,11 @@ class Publisher(PubSubBase):
         """Publishes a message to the channel."""
         if self.client and self.channel:
             self.client.publish(self.channel, message)
+
+    def publish_many(self, messages: list[Any]) -> None:
+        """Publishes messages to the channel, in one round-trip."""
+        if self.client and self.channel:
+            pipeline = self.client.pipeline(transaction=False)
+            for message in messages:
+                pipeline.publish(self.channel, message)
+            pipeline.execute()
@@ -1,6 +1,7 @@
 import logging
 import os
 import sys
+import tempfile
 from pathlib import Path
 from typing import Any, cast
 from urllib import parse
@@ -46,9 +47,61 @@ CANVAS_SDK_PLUGINS_CACHE_LOCATION = os.getenv(
     "CANVAS_SDK_PLUGINS_CACHE_LOCATION", "plugin_io_plugins_cache"
 )
 CANVAS_SDK_CACHE_TIMEOUT_SECONDS = int(os.getenv("CANVAS_SDK_CACHE_TIMEOUT", FOURTEEN_DAYS))
+# An in-process LRU of this many entries in front of the plugins cache; 0 disables it. Entries
+# are kept for CANVAS_SDK_CACHE_LOCAL_TIMEOUT seconds at most, so writes by other processes are
+# seen within that time, or right away if they are broadcast over Redis pub/sub.
+CANVAS_SDK_CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CANVAS_SDK_CACHE_LOCAL_MAX_ENTRIES", 0))
+CANVAS_SDK_CACHE_LOCAL_TIMEOUT_SECONDS = float(os.getenv("CANVAS_SDK_CACHE_LOCAL_TIMEOUT", 5))
+CANVAS_SDK_CACHE_INVALIDATION = env_to_bool("CANVAS_SDK_CACHE_INVALIDATION", False)
 
 
 METRICS_ENABLED = env_to_bool("PLUGINS_METRICS_ENABLED", not IS_SCRIPT)
+# Metrics are aggregated in process and sent to StatsD at this interval; 0 sends them right away.
+METRICS_FLUSH_INTERVAL_SECONDS = float(os.getenv("PLUGINS_METRICS_FLUSH_INTERVAL", 1))
+# Percentiles of each timing, computed in process and sent as gauges (e.g. "50,95,99").
+METRICS_PERCENTILES = [
+    int(percentile)
+    for percentile in os.getenv("PLUGINS_METRICS_PERCENTILES", "").split(",")
+    if percentile.strip()
+]
+# Port of the plugin runner's OpenMetrics endpoint (/metrics), off when 0.
+OPENMETRICS_PORT = int(os.getenv("PLUGIN_RUNNER_OPENMETRICS_PORT", 0))
+OPENMETRICS_HOST = os.getenv("PLUGIN_RUNNER_OPENMETRICS_HOST", "0.0.0.0")
+# Histogram buckets of the OpenMetrics timings, in milliseconds (e.g. "10,50,100,500,1000").
+OPENMETRICS_BUCKETS = [
+    float(bucket)
+    for bucket in os.getenv("PLUGIN_RUNNER_OPENMETRICS_BUCKETS", "").split(",")
+    if bucket.strip()
+]
+
+# File that the spans of each event are appended to, as JSON lines; tracing is off when unset.
+PLUGIN_RUNNER_TRACE_FILE = os.getenv("PLUGIN_RUNNER_TRACE_FILE", "")
+# Only events taking at least this long are written to the trace file.
+PLUGIN_RUNNER_TRACE_MIN_DURATION_MS = float(os.getenv("PLUGIN_RUNNER_TRACE_MIN_DURATION_MS", 0))
+
+# Profiles of plugins are written to this directory. SIGUSR2 starts (or stops) profiling the
+# plugins listed in PLUGIN_RUNNER_PROFILE_PLUGINS, for the given number of invocations each.
+PLUGIN_RUNNER_PROFILE_DIR = os.getenv(
+    "PLUGIN_RUNNER_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "plugin-profiles")
+)
+PLUGIN_RUNNER_PROFILE_PLUGINS = [
+    plugin.strip()
+    for plugin in os.getenv("PLUGIN_RUNNER_PROFILE_PLUGINS", "").split(",")
+    if plugin.strip()
+]
+PLUGIN_RUNNER_PROFILE_INVOCATIONS = int(os.getenv("PLUGIN_RUNNER_PROFILE_INVOCATIONS", 10))
+# "cprofile" writes pstats files, "sample" writes collapsed stacks for flamegraphs.
+PLUGIN_RUNNER_PROFILE_MODE = os.getenv("PLUGIN_RUNNER_PROFILE_MODE", "cprofile")
+
+# The flight recorder keeps the records of this many recent events slower than the minimum
+# duration, dumped on SIGUSR1; 0 turns it off.
+FLIGHT_RECORDER_SIZE = int(os.getenv("PLUGIN_RUNNER_FLIGHT_RECORDER_SIZE", 50))
+FLIGHT_RECORDER_MIN_DURATION_MS = float(os.getenv("PLUGIN_RUNNER_FLIGHT_RECORDER_MIN_MS", 100))
+# Events with a handler slower than this are dumped to the log right away; 0 turns it off.
+FLIGHT_RECORDER_DUMP_THRESHOLD_MS = float(os.getenv("PLUGIN_RUNNER_FLIGHT_RECORDER_DUMP_MS", 5000))
+# Also serve the records, without the IDs of event targets, from /debug/slow-events on the
+# OpenMetrics listener, which has no authentication.
+FLIGHT_RECORDER_HTTP_ROUTE = env_to_bool("PLUGIN_RUNNER_FLIGHT_RECORDER_HTTP_ROUTE", False)
 
 INSTALLED_APPS = [
     "django.contrib.contenttypes",
@@ -126,6 +179,21 @@ if CANVAS_SDK_DB_BACKEND == "postgres":
 
     DATABASES = {"default": db_config}
 
+    # Read replicas of the home-app database, as a comma-separated list of database URLs.
+    # Reads of SDK data are spread across them by canvas_sdk.v1.database_router.ReplicaRouter.
+    for index, replica_url in enumerate(
+        url for url in os.getenv("CANVAS_SDK_DB_REPLICA_URLS", "").split(",") if url.strip()
+    ):
+        parsed_replica_url = parse.urlparse(replica_url.strip())
+        DATABASES[f"replica_{index}"] = {
+            **db_config,
+            "NAME": parsed_replica_url.path[1:] or db_config["NAME"],
+            "USER": parsed_replica_url.username or db_config["USER"],
+            "PASSWORD": parsed_replica_url.password or db_config["PASSWORD"],
+            "HOST": parsed_replica_url.hostname,
+            "PORT": parsed_replica_url.port or db_config["PORT"],
+        }
+
 elif CANVAS_SDK_DB_BACKEND == "sqlite3":
     SQLITE_DB_PATH = BASE_DIR / "canvas_db.sqlite3"
     SQLITE_WRITE_MODE_DATABASE = {
@@ -148,6 +216,12 @@ else:
         "Supported values are 'postgres' and 'sqlite3'."
     )
 
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith("replica_")]
+DATABASE_ROUTERS = ["canvas_sdk.v1.database_router.ReplicaRouter"] if DATABASE_REPLICAS else []
+
+# Send an event's reads to the primary once it has written, so handlers see their own writes.
+CANVAS_SDK_DB_READ_YOUR_WRITES = env_to_bool("CANVAS_SDK_DB_READ_YOUR_WRITES", True)
+
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID", "")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY", "")
 AWS_REGION = os.getenv("AWS_REGION", "us-west-2")
@@ -205,3 +279,35 @@ LOGSTASH_PORT = (
     else None
 )
 LOGSTASH_PROTOCOL = os.getenv("PLUGINS_LOGSTASH_PROTOCOL", "logger.logstash.HttpTransport")
+# Log events are sent to Logstash one per request, or with LOGSTASH_BULK a batch per request as
+# newline-delimited JSON, gzipped if enabled; bulk requests need the Logstash http input to
+# decode application/x-ndjson with the json_lines codec. Failed requests are retried with
+# exponential backoff this many times before their events are dropped.
+LOGSTASH_BULK = env_to_bool("PLUGINS_LOGSTASH_BULK", False)
+LOGSTASH_GZIP = env_to_bool("PLUGINS_LOGSTASH_GZIP", False)
+LOGSTASH_MAX_RETRIES = int(os.getenv("PLUGINS_LOGSTASH_MAX_RETRIES", 3))
+
+# Log messages are published to pub/sub in batches of up to PUBSUB_LOG_BATCH_SIZE, or after
+# waiting PUBSUB_LOG_FLUSH_INTERVAL_SECONDS for more. Past PUBSUB_LOG_QUEUE_SIZE messages waiting
+# to be published, the "newest" message or the "oldest" queued one is dropped.
+PUBSUB_LOG_QUEUE_SIZE = int(os.getenv("PLUGIN_RUNNER_PUBSUB_LOG_QUEUE_SIZE", 10000))
+PUBSUB_LOG_BATCH_SIZE = int(os.getenv("PLUGIN_RUNNER_PUBSUB_LOG_BATCH_SIZE", 500))
+PUBSUB_LOG_FLUSH_INTERVAL_SECONDS = float(os.getenv("PLUGIN_RUNNER_PUBSUB_LOG_FLUSH_INTERVAL", 0.1))
+PUBSUB_LOG_DROP_POLICY = os.getenv("PLUGIN_RUNNER_PUBSUB_LOG_DROP_POLICY", "newest")
+
+# Log messages per second allowed for each plugin and level, past a burst of PLUGIN_LOG_BURST;
+# 0 turns rate limiting off. PLUGIN_LOG_RATE_LIMITS sets the rate of individual plugins,
+# 0 meaning unlimited (e.g. "chatty_plugin=1,trusted_plugin=0").
+PLUGIN_LOG_RATE_LIMIT = float(os.getenv("PLUGIN_LOG_RATE_LIMIT", 0))
+PLUGIN_LOG_BURST = int(os.getenv("PLUGIN_LOG_BURST", 50))
+PLUGIN_LOG_RATE_LIMITS = {
+    plugin.strip(): float(rate)
+    for plugin, _, rate in (
+        limit.partition("=") for limit in os.getenv("PLUGIN_LOG_RATE_LIMITS", "").split(",")
+    )
+    if plugin.strip() and rate.strip()
+}
+# How often a plugin that is being rate limited logs how many messages were suppressed.
+PLUGIN_LOG_SUPPRESSION_SUMMARY_SECONDS = float(
+    os.getenv("PLUGIN_LOG_SUPPRESSION_SUMMARY_SECONDS", 60)
+)